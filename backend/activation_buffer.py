@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from db_connect import neo4j_driver
+from graph_projection import projection
+
+# Ativacoes de memoria (ajustes de confianca_intrinseca vindos do NQR) sao
+# acumuladas em memoria, por no, e gravadas numa unica transacao UNWIND a cada
+# FLUSH_INTERVAL segundos, fora do caminho da requisicao.
+FLUSH_INTERVAL = float(os.getenv("NEXUS_ACTIVATION_FLUSH_INTERVAL", 2.0))
+MAX_PENDING_NODES = 500
+MAX_WRITE_ATTEMPTS = 3
+# Labels que recebem ativacoes (nos devolvidos pelas pernas do RAG e mensagens
+# de chat penalizadas pelo NQR), todos indexados por id em ensure_indexes.
+ACTIVATION_LABELS = (
+    "Conceito",
+    "Entity",
+    "Consciousness",
+    "Fato",
+    "ChatMessage",
+    "Ideia",
+    "Objetivo",
+    "Acao",
+    "Recurso",
+    "DevProject",
+)
+
+# Os deltas de cada no sao aplicados em ordem, com clamp [0, 1] a cada passo,
+# exatamente como chamadas individuais fariam. A busca por id usa um ramo por
+# label em vez de um MATCH sem label; ids de outros labels caem no
+# FALLBACK_ACTIVATIONS_QUERY.
+_APPLY_DELTAS = """
+WITH n, row, reduce(
+    current = coalesce(n.confianca_intrinseca, $default_confidence),
+    delta IN row.deltas |
+    CASE
+        WHEN current + delta > 1.0 THEN 1.0
+        WHEN current + delta < 0.0 THEN 0.0
+        ELSE current + delta
+    END
+) AS updated
+SET n.confianca_intrinseca = updated,
+    n.ultima_ativacao = datetime(row.timestamp)
+RETURN row.id AS id, updated AS confianca_intrinseca
+"""
+FLUSH_ACTIVATIONS_QUERY = (
+    "UNWIND $rows AS row\nCALL {\n"
+    + "\n    UNION\n".join(
+        f"    WITH row\n    MATCH (n:{label} {{id: row.id}}) RETURN n"
+        for label in ACTIVATION_LABELS
+    )
+    + "\n}"
+    + _APPLY_DELTAS
+)
+FALLBACK_ACTIVATIONS_QUERY = (
+    "UNWIND $rows AS row\nMATCH (n {id: row.id})" + _APPLY_DELTAS
+)
+
+
+class ActivationBuffer:
+    """Acumula deltas de confianca por no e os grava em lote."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._received = 0
+        self._written = 0
+        self._batches = 0
+        self._dropped = 0
+
+    def add(self, node_id: str, boost: float) -> None:
+        """Registra um ajuste de confianca para o no (gravado no proximo flush)."""
+        if not node_id or boost is None:
+            return
+        timestamp = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            entry = self._pending.setdefault(node_id, {"id": node_id, "deltas": []})
+            entry["deltas"].append(float(boost))
+            entry["timestamp"] = timestamp
+            self._received += 1
+            full = len(self._pending) >= MAX_PENDING_NODES
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """Grava imediatamente os deltas pendentes."""
+        with self._flush_lock:
+            with self._lock:
+                rows: List[Dict[str, Any]] = list(self._pending.values())
+                self._pending = {}
+            if rows:
+                self._write(rows)
+
+    def stop(self) -> None:
+        thread = self._thread
+        self._stop.set()
+        self._wakeup.set()
+        if thread is not None:
+            thread.join(self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending_nodes": pending,
+            "received": self._received,
+            "written_nodes": self._written,
+            "batches": self._batches,
+            "dropped_nodes": self._dropped,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self._stop.is_set():
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name="nexus-activation-buffer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as error:  # noqa: BLE001
+                print(f"[Activation Buffer] Falha no flush: {error}")
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        # Import tardio: database importa este modulo.
+        from database import DEFAULT_INTRINSIC_CONFIDENCE
+
+        def apply(tx) -> List[Any]:
+            records = list(
+                tx.run(
+                    FLUSH_ACTIVATIONS_QUERY,
+                    rows=rows,
+                    default_confidence=DEFAULT_INTRINSIC_CONFIDENCE,
+                )
+            )
+            found = {record["id"] for record in records}
+            missing = [row for row in rows if row["id"] not in found]
+            if missing:
+                records.extend(
+                    tx.run(
+                        FALLBACK_ACTIVATIONS_QUERY,
+                        rows=missing,
+                        default_confidence=DEFAULT_INTRINSIC_CONFIDENCE,
+                    )
+                )
+                found = {record["id"] for record in records}
+                unknown = [row["id"] for row in missing if row["id"] not in found]
+                if unknown:
+                    print(
+                        f"[Activation Buffer] {len(unknown)} ativacoes para nos inexistentes "
+                        f"descartadas: {', '.join(unknown[:5])}"
+                    )
+            return records
+
+        for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+            try:
+                with neo4j_driver.session() as session:
+                    records = session.execute_write(apply)
+                for record in records:
+                    projection.update_node(
+                        record["id"],
+                        confianca_intrinseca=record["confianca_intrinseca"],
+                    )
+                self._written += len(rows)
+                self._batches += 1
+                return
+            except Exception as error:  # noqa: BLE001
+                print(
+                    f"[Activation Buffer] Falha ao gravar {len(rows)} ativacoes "
+                    f"(tentativa {attempt}/{MAX_WRITE_ATTEMPTS}): {error}"
+                )
+                time.sleep(0.2 * attempt)
+        self._dropped += len(rows)
+
+
+activation_buffer = ActivationBuffer()
+atexit.register(activation_buffer.stop)
@@ -1,18 +1,24 @@
 import json
 import os
+from datetime import datetime
 from typing import Dict, List
 
 from openai import OpenAI
 from pydantic import BaseModel, Field
 
+import chroma_eviction
 import database
-from db_connect import chroma_client
+import job_queue
+from models import SystemLog
 
 client = OpenAI(
     api_key=os.getenv("DEEPSEEK_API_KEY"),
     base_url="https://api.deepseek.com",
 )
 
+NARRATIVE_JOB = "narrativa_memoria"
+EVICTION_NARRATIVE = os.getenv("NEXUS_EVICTION_NARRATIVE", "1") == "1"
+
 
 class ProjectStructure(BaseModel):
     name: str = Field(..., description="Nome curto e técnico para o projeto")
@@ -70,63 +76,65 @@ def structure_idea(raw_idea: str) -> ProjectStructure:
 def manage_chroma_memory(max_documents: int = 1000) -> str:
     """
     Evita que a memoria de curto prazo do ChromaDB cresça indefinidamente.
+    O despejo usa o indice local (chroma_eviction); a narrativa do plano via
+    LLM e opcional e roda depois, na fila em segundo plano.
     """
     try:
-        total_documents = 0
-        collections = chroma_client.list_collections()
-        for collection_info in collections:
-            try:
-                collection = chroma_client.get_collection(collection_info.name)
-            except TypeError:
-                collection = chroma_client.get_collection(
-                    name=collection_info.name,
-                )
-            total_documents += collection.count()
-    except Exception as error:
+        report = chroma_eviction.evict(max_documents)
+    except Exception as error:  # noqa: BLE001
         return f"[GMH] Falha ao consultar o ChromaDB: {error}"
 
-    if total_documents <= max_documents:
-        return f"[GMH] Memoria atual ({total_documents} documentos) dentro do limite ({max_documents})."
+    if not report["evicted"]:
+        return (
+            f"[GMH] Memoria atual ({report['total_before']} documentos) dentro do limite "
+            f"({max_documents})."
+        )
+
+    action = "arquivados na camada fria" if report["mode"] == "archive" else "removidos"
+    summary = (
+        f"[GMH] {report['evicted']} documentos {action} de {len(report['collections'])} colecoes "
+        f"({report['total_before']} -> {report['total_after']}, limite {max_documents})."
+    )
+    if EVICTION_NARRATIVE:
+        job_queue.background_queue.enqueue(NARRATIVE_JOB, report)
+    return summary
 
-    candidates = database.get_least_activated_documents(limit=100)
-    if not candidates:
-        return "[GMH] Nenhum documento com baixa ativacao encontrado para arquivar."
 
-    preview_ids = ", ".join(candidates[:5]) + ("..." if len(candidates) > 5 else "")
+def _narrate_eviction(report: Dict) -> None:
+    """Registra no log uma explicacao (LLM) do despejo ja executado."""
     system_prompt = (
         "Você é o gestor de memória hierárquica do Nexus. "
-        "Explique de forma objetiva qual ação será tomada para otimizar o ChromaDB."
+        "Explique de forma objetiva qual ação foi tomada para otimizar o ChromaDB."
     )
     user_prompt = (
-        f"Documentos atuais: {total_documents}\n"
-        f"Limite configurado: {max_documents}\n"
-        f"Quantidade selecionada para arquivamento: {len(candidates)}\n"
-        f"IDs (amostra): {preview_ids}\n"
-        "Descreva o plano de arquivamento em 2 frases."
+        f"Documentos antes: {report.get('total_before')}\n"
+        f"Documentos depois: {report.get('total_after')}\n"
+        f"Limite configurado: {report.get('limit')}\n"
+        f"Modo: {report.get('mode')}\n"
+        f"Coleções afetadas: {', '.join(report.get('collections') or [])}\n"
+        "Descreva o que foi feito em 2 frases."
     )
-
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.3,
-        )
-        plan = response.choices[0].message.content.strip()
-    except Exception as error:  # noqa: BLE001
-        plan = (
-            f"[GMH] Arquivando {len(candidates)} documentos para reduzir o uso do ChromaDB. "
-            f"(Falha ao gerar plano detalhado: {error})"
+    response = client.chat.completions.create(
+        model="deepseek-chat",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=0.3,
+    )
+    plan = response.choices[0].message.content.strip()
+    database.create_log(
+        SystemLog(
+            timestamp=datetime.now().isoformat(),
+            type="audit",
+            title="Gestao de memoria (ChromaDB)",
+            description=plan,
+            agent="Agente Arquiteto",
         )
+    )
 
-    try:
-        database.delete_chroma_documents(candidates)
-    except Exception as error:  # noqa: BLE001
-        return f"{plan} Contudo, houve erro ao remover documentos: {error}"
 
-    return plan
+job_queue.background_queue.register_handler(NARRATIVE_JOB, _narrate_eviction)
 
 
 def incubate_idea(idea_content: str) -> Dict[str, str]:
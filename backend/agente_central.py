@@ -2,15 +2,19 @@ from __future__ import annotations
 
 import json
 import os
+import re
 import socket
 from datetime import datetime
 from typing import Any, Dict, List, Tuple
 
 from openai import OpenAI
 
-import agente_guardiao
 import ferramentas
 import database
+from intent_classifier import CONFIDENCE_THRESHOLD as LOCAL_CONFIDENCE_THRESHOLD
+from intent_classifier import local_classifier
+from meta_prompt_store import meta_prompt_store
+from prompt_budget import fold_accents
 from models import AISettings, OperationMode, SystemLog
 
 # Clientes pre-configurados
@@ -20,6 +24,22 @@ deepseek_client = OpenAI(
 )
 
 META_PROMPT_TASK = "CLASSIFICACAO_INTENCAO"
+# Intencoes que passam pelo OFBD (orquestrador de ferramentas).
+TOOL_ROUTED_INTENTS = ("Pesquisa Profunda", "Chat Pessoal")
+CLASSIFIER_MAX_TOKENS = 50
+# Mensagens curtas ou com referencias ao que ja foi dito dependem do historico:
+# cache e classificador local (que so veem o texto) nao decidem nem aprendem com elas.
+CONTEXT_FREE_MIN_WORDS = 6
+CONTEXT_REFERENCES = {
+    "isso", "isto", "disso", "disto", "nisso", "nisto", "aquilo", "daquilo",
+    "esse", "essa", "desse", "dessa", "nesse", "nessa", "ele", "ela", "eles",
+    "elas", "dele", "dela", "mesmo", "mesma", "anterior", "acima", "tambem",
+    "continue", "continua", "outro", "outra",
+}
+# Roteador combinado: intencao, complexidade, confianca e chamada de ferramenta
+# numa unica resposta. Com "0", volta ao fluxo em duas etapas.
+COMBINED_ROUTER = os.getenv("NEXUS_COMBINED_ROUTER", "1") == "1"
+COMBINED_ROUTER_MAX_TOKENS = 300
 DEFAULT_CLASSIFIER_PROMPT_TEMPLATE = (
     "Voce e o Cerebro Central do Nexus. Analise o historico e determine a intencao, "
     "a complexidade e a confianca do pedido atual.\n"
@@ -132,16 +152,25 @@ def _apply_prompt_template(
     return prompt
 
 
-def _handle_prompt_failure(template_used: str, failure_result: str) -> None:
-    if not template_used or not failure_result:
-        return
+def _handle_prompt_failure(version: int, template_used: str, failure_result: str) -> None:
+    # A otimizacao (LLM) roda em segundo plano, com debounce e limite de frequencia.
     try:
-        optimized_prompt = agente_guardiao.optimize_prompt(template_used, failure_result)
-        optimized_prompt = optimized_prompt.strip()
-        if optimized_prompt and optimized_prompt != template_used.strip():
-            database.save_meta_prompt(META_PROMPT_TASK, optimized_prompt)
+        meta_prompt_store.record(
+            META_PROMPT_TASK,
+            version,
+            success=False,
+            template=template_used,
+            failure=failure_result,
+        )
+    except Exception as error:  # noqa: BLE001
+        print(f"[Agente Central] Falha ao registrar erro do prompt: {error}")
+
+
+def _handle_prompt_success(version: int) -> None:
+    try:
+        meta_prompt_store.record(META_PROMPT_TASK, version, success=True)
     except Exception as error:  # noqa: BLE001
-        print(f"[Agente Central] Falha ao otimizar prompt: {error}")
+        print(f"[Agente Central] Falha ao registrar uso do prompt: {error}")
 
 
 def _load_ai_settings() -> AISettings:
@@ -156,6 +185,7 @@ def _classify_with_deepseek(
     user_content: str,
     model_name: str | None,
     system_prompt: str,
+    max_tokens: int = CLASSIFIER_MAX_TOKENS,
 ) -> str:
     response = deepseek_client.chat.completions.create(
         model=model_name or "deepseek-chat",
@@ -163,7 +193,7 @@ def _classify_with_deepseek(
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_content},
         ],
-        max_tokens=50,
+        max_tokens=max_tokens,
         temperature=0.3,
         response_format={"type": "json_object"},
     )
@@ -175,6 +205,7 @@ def _classify_with_openai(
     model_name: str | None,
     api_key: str | None,
     system_prompt: str,
+    max_tokens: int = CLASSIFIER_MAX_TOKENS,
 ) -> str | None:
     key = api_key or os.getenv("OPENAI_API_KEY")
     if not key:
@@ -188,7 +219,7 @@ def _classify_with_openai(
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_content},
         ],
-        max_tokens=50,
+        max_tokens=max_tokens,
         temperature=0.3,
         response_format={"type": "json_object"},
     )
@@ -299,6 +330,138 @@ def orchestrate_tool_use(
         return {"tool_needed": False, "tool_name": None, "arguments": {}}
 
 
+_tool_instructions_cache: Tuple[int, str] = (-1, "")
+
+
+def _append_tool_instructions(system_prompt: str) -> str:
+    """Estende o prompt do classificador com a decisao de ferramenta (roteador combinado)."""
+    global _tool_instructions_cache
+    version, instructions = _tool_instructions_cache
+    if version != ferramentas.REGISTRY_VERSION:
+        descriptions = ferramentas.get_tool_descriptions()
+        instructions = ""
+        if descriptions:
+            tool_lines = "\n".join(
+                f"- {name}: {description}" for name, description in descriptions.items()
+            )
+            intents = " ou ".join(f"'{intent}'" for intent in TOOL_ROUTED_INTENTS)
+            instructions = (
+                "Inclua tambem no JSON o campo \"tool_call\". Se a intencao for "
+                f"{intents} e alguma ferramenta precisar ser acionada, use "
+                '{"name": "nome_da_ferramenta", "arguments": {"param": "valor"}}; '
+                "caso contrario, use null.\n"
+                "Ferramentas disponiveis:\n"
+                f"{tool_lines}"
+            )
+        _tool_instructions_cache = (ferramentas.REGISTRY_VERSION, instructions)
+    if not instructions:
+        return system_prompt
+    return f"{system_prompt}\n\n{instructions}"
+
+
+def _plan_from_tool_call(tool_call: Any) -> Dict[str, Any]:
+    if not isinstance(tool_call, dict) or not tool_call.get("name"):
+        return {"tool_needed": False, "tool_name": None, "arguments": {}}
+    arguments = tool_call.get("arguments")
+    return {
+        "tool_needed": True,
+        "tool_name": tool_call.get("name"),
+        "arguments": arguments if isinstance(arguments, dict) else {},
+    }
+
+
+def _plan_tool_use(
+    user_content: str,
+    plan: Dict[str, Any] | None = None,
+) -> Tuple[bool, Dict[str, Any] | None]:
+    """
+    Valida o plano de ferramenta (vindo do roteador combinado) ou, sem plano,
+    pede um ao OFBD. Retorna (aprovado, plano).
+    """
+    try:
+        if plan is None:
+            descriptions = ferramentas.get_tool_descriptions()
+            plan = orchestrate_tool_use(user_content, descriptions)
+        if plan.get("tool_needed"):
+            tool_name = plan.get("tool_name")
+            if tool_name not in ferramentas.AVAILABLE_TOOLS:
+                _log_ofbd_decision(
+                    status="rejeitado",
+                    user_query=user_content,
+                    tool_plan=plan,
+                    detail="Ferramenta inexistente.",
+                )
+            else:
+                try:
+                    validated_args = ferramentas.validate_tool_arguments(
+                        tool_name,
+                        plan.get("arguments") or {},
+                    )
+                    plan["arguments"] = validated_args
+                    _log_ofbd_decision("aprovado", user_content, plan)
+                    return True, plan
+                except ValueError as error:
+                    _log_ofbd_decision(
+                        status="rejeitado",
+                        user_query=user_content,
+                        tool_plan=plan,
+                        detail=str(error),
+                    )
+        return False, plan
+    except Exception as error:  # noqa: BLE001
+        print(f"[Agente Central] Falha ao orquestrar ferramenta: {error}")
+        return False, None
+
+
+def _depends_on_history(
+    user_content: str,
+    conversation_history: List[Dict[str, str]] | None,
+) -> bool:
+    """
+    True quando ha conversa anterior e a mensagem e curta ou se refere a ela
+    ("pode fazer isso agora"): a intencao vem do historico, nao do texto.
+    """
+    previous = list(conversation_history or [])
+    if previous and previous[-1].get("content") == user_content:
+        previous = previous[:-1]
+    if not previous:
+        return False
+    words = re.findall(r"[a-z0-9]+", fold_accents(user_content))
+    return len(words) < CONTEXT_FREE_MIN_WORDS or any(word in CONTEXT_REFERENCES for word in words)
+
+
+def _classify_locally(user_content: str) -> Tuple[str, float, str] | None:
+    """
+    Primeiro nivel da classificacao: cache por mensagem normalizada e o
+    classificador local. Retorna None quando e preciso consultar o LLM.
+    """
+    cached = local_classifier.cached(user_content)
+    if cached:
+        return cached, 1.0, "cache"
+    try:
+        intent, confidence = local_classifier.predict(
+            user_content,
+            seed_labeler=_heuristic_classification,
+        )
+    except Exception as error:  # noqa: BLE001
+        print(f"[Agente Central] Classificador local indisponivel: {error}")
+        return None
+    if intent and confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+        local_classifier.count("local_hits")
+        local_classifier.remember(user_content, intent)
+        return intent, confidence, "local"
+    local_classifier.count("escalations")
+    return None
+
+
+def _learn_intent(user_content: str, intent: str) -> None:
+    local_classifier.remember(user_content, intent)
+    try:
+        local_classifier.learn(user_content, intent)
+    except Exception as error:  # noqa: BLE001
+        print(f"[Agente Central] Falha ao registrar exemplo de intencao: {error}")
+
+
 def _heuristic_classification(
     user_content: str,
     conversation_history: List[Dict[str, str]] | None = None,
@@ -403,15 +566,40 @@ def classify_intent(
     conversation_history: List[Dict[str, str]] | None,
 ) -> Tuple[str, Dict[str, Any] | None]:
     print(f"[Agente Central] Analisando intencao: '{user_content}'")
+    contextual = _depends_on_history(user_content, conversation_history)
+    if contextual:
+        local_classifier.count("contextual")
+        local_result = None
+    else:
+        local_result = _classify_locally(user_content)
+    if local_result is not None:
+        intent, confidence, origin = local_result
+        print(f"[Agente Central] Intencao detectada ({origin}): {intent} (conf: {confidence:.2f})")
+        if intent in TOOL_ROUTED_INTENTS:
+            approved, plan = _plan_tool_use(user_content)
+            return ("Executar Ferramenta" if approved else intent), plan
+        return intent, None
+
     settings = _load_ai_settings()
     provider, model_name = get_best_model_for_task("reasoning", settings)
     print(f"[Roteador] Provider selecionado: {provider} (modelo: {model_name})")
 
     conversation_history = conversation_history or []
     history_text = _build_history_prompt(conversation_history)
-    meta_prompt_template = database.get_meta_prompt(META_PROMPT_TASK)
-    prompt_template = meta_prompt_template or DEFAULT_CLASSIFIER_PROMPT_TEMPLATE
+    prompt_version, prompt_template = meta_prompt_store.select(
+        META_PROMPT_TASK,
+        DEFAULT_CLASSIFIER_PROMPT_TEMPLATE,
+    )
     system_prompt = _apply_prompt_template(prompt_template, history_text, user_content)
+    combined = COMBINED_ROUTER and provider != "ollama"
+    max_tokens = CLASSIFIER_MAX_TOKENS
+    if combined:
+        try:
+            system_prompt = _append_tool_instructions(system_prompt)
+            max_tokens = COMBINED_ROUTER_MAX_TOKENS
+        except Exception as error:  # noqa: BLE001
+            print(f"[Agente Central] Roteador combinado indisponivel: {error}")
+            combined = False
 
     try:
         classification_payload: str | None
@@ -420,6 +608,7 @@ def classify_intent(
                 user_content,
                 model_name,
                 system_prompt,
+                max_tokens,
             )
         elif provider == "openai":
             classification_payload = _classify_with_openai(
@@ -427,12 +616,14 @@ def classify_intent(
                 model_name,
                 settings.openai.api_key,
                 system_prompt,
+                max_tokens,
             )
             if classification_payload is None:
                 classification_payload = _classify_with_deepseek(
                     user_content,
                     settings.deepseek.model_name,
                     system_prompt,
+                    max_tokens,
                 )
         elif provider == "ollama":
             print("[Agente Central] Utilizando heuristica local (modo offline/economico).")
@@ -449,6 +640,7 @@ def classify_intent(
                 user_content,
                 settings.deepseek.model_name,
                 system_prompt,
+                max_tokens,
             )
 
         if not classification_payload:
@@ -458,7 +650,7 @@ def classify_intent(
             result = json.loads(classification_payload)
         except json.JSONDecodeError as error:
             print(f"[Agente Central] JSON invalido recebido: {error}. Fallback heuristico.")
-            _handle_prompt_failure(prompt_template, f"JSON invalido: {error}")
+            _handle_prompt_failure(prompt_version, prompt_template, f"JSON invalido: {error}")
             heuristic_intent = _heuristic_classification(user_content, conversation_history)
             return heuristic_intent, None
 
@@ -485,38 +677,18 @@ def classify_intent(
 
         tool_payload: Dict[str, Any] | None = None
 
-        if classified_intent in ("Pesquisa Profunda", "Chat Pessoal"):
-            try:
-                descriptions = ferramentas.get_tool_descriptions()
-                plan = orchestrate_tool_use(user_content, descriptions)
-                tool_payload = plan
-                if plan.get("tool_needed"):
-                    tool_name = plan.get("tool_name")
-                    if tool_name not in ferramentas.AVAILABLE_TOOLS:
-                        _log_ofbd_decision(
-                            status="rejeitado",
-                            user_query=user_content,
-                            tool_plan=plan,
-                            detail="Ferramenta inexistente.",
-                        )
-                    else:
-                        try:
-                            validated_args = ferramentas.validate_tool_arguments(
-                                tool_name,
-                                plan.get("arguments") or {},
-                            )
-                            plan["arguments"] = validated_args
-                            _log_ofbd_decision("aprovado", user_content, plan)
-                            return "Executar Ferramenta", plan
-                        except ValueError as error:
-                            _log_ofbd_decision(
-                                status="rejeitado",
-                                user_query=user_content,
-                                tool_plan=plan,
-                                detail=str(error),
-                            )
-            except Exception as error:  # noqa: BLE001
-                print(f"[Agente Central] Falha ao orquestrar ferramenta: {error}")
+        if classified_intent in TOOL_ROUTED_INTENTS:
+            if combined and "tool_call" in result:
+                # A decisao de ferramenta veio na mesma resposta: so valida.
+                approved, tool_payload = _plan_tool_use(
+                    user_content,
+                    _plan_from_tool_call(result.get("tool_call")),
+                )
+            else:
+                approved, tool_payload = _plan_tool_use(user_content)
+            if approved:
+                _handle_prompt_success(prompt_version)
+                return "Executar Ferramenta", tool_payload
 
         if confidence < 0.6:
             classified_intent = "Introspecção"
@@ -542,18 +714,22 @@ def classify_intent(
                     f"[Agente Central] Intencao detectada: {intent} "
                     f"(conf: {confidence:.2f}, complexidade: {complexity})"
                 )
+                _handle_prompt_success(prompt_version)
+                if intent != "Introspecção" and not contextual:
+                    _learn_intent(user_content, intent)
                 return intent, tool_payload
 
         print(
             f"[Agente Central] Resultado fora do padrao ('{classified_intent}'). Retornando 'Nota Simples'."
         )
         _handle_prompt_failure(
+            prompt_version,
             prompt_template,
             f"Classificacao invalida recebida: {classified_intent}",
         )
         return "Nota Simples", tool_payload
     except Exception as error:  # noqa: BLE001
         print(f"[Agente Central] ERRO: {error}. Fallback heuristico.")
-        _handle_prompt_failure(prompt_template, str(error))
+        _handle_prompt_failure(prompt_version, prompt_template, str(error))
         heuristic_intent = _heuristic_classification(user_content, conversation_history)
         return heuristic_intent, None
@@ -1,6 +1,7 @@
 import json
 import os
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
 from openai import OpenAI
 
@@ -9,38 +10,199 @@ client = OpenAI(
     base_url="https://api.deepseek.com",
 )
 
+# Orcamento (aproximado, em tokens) de texto por chamada ao LLM. Textos longos,
+# como respostas de pesquisa, sao quebrados em trechos menores que este limite.
+EXTRACTION_TOKEN_BUDGET = int(os.getenv("NEXUS_EXTRACTION_TOKEN_BUDGET", 3000))
+EXTRACTION_CHUNK_TOKENS = int(os.getenv("NEXUS_EXTRACTION_CHUNK_TOKENS", 1200))
+EXTRACTION_MAX_PARALLEL = 4
+CHARS_PER_TOKEN = 4
+
+EXTRACTION_RULES = (
+    "Voce e um Extrator de Conhecimento do Nexus. Leia atentamente o texto e identifique fatos relevantes.\n"
+    "Retorne os fatos como triplas: Sujeito, Predicado (relacao), Objeto.\n"
+    "Regras importantes:\n"
+    "1. Use relacoes curtas, em CAIXA_ALTA e snake_case (ex: CRIADO_POR, LOCALIZADO_EM, EH_UM, TEM_NOME).\n"
+    "2. Se o texto trouxer informacoes em primeira pessoa (\"eu\", \"meu\"), associe-as ao no CREATOR\n"
+    "   (exemplo: \"Meu peixe se chama Banguela\" -> {source: 'CREATOR', relationship: 'TEM_PET', target: 'Banguela'}).\n"
+    "3. Prefira conceitos concisos para os alvos (ex: 'tecnico de enfermagem', 'Banguela').\n"
+    "4. Ignore opinioes ou frases sem conteudo factual.\n"
+)
+BATCH_RESPONSE_FORMAT = (
+    "Voce recebera varios textos independentes, cada um marcado com um identificador [T<n>].\n"
+    "Extraia os fatos de cada texto separadamente e atribua cada tripla ao texto de origem.\n"
+    "Responda APENAS com um JSON no formato:\n"
+    '{ "results": [{"id": "T1", "triples": [{"source": "Python", "relationship": "CRIADO_POR", '
+    '"target": "Guido van Rossum"}]}] }\n'
+    "Inclua todos os identificadores recebidos, mesmo que sem fatos (triples vazio).\n"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata de tokens (aprox. 4 caracteres por token)."""
+    return max(1, len(text or "") // CHARS_PER_TOKEN)
 
-def extract_knowledge(text: str) -> List[Dict[str, str]]:
-    """Usa o LLM para extrair fatos do texto no formato de triplas: (Sujeito)-[RELACAO]->(Objeto)."""
-    print("[Agente Consolidacao] Lendo e extraindo conhecimento...")
 
-    system_prompt = (
-        "Voce e um Extrator de Conhecimento do Nexus. Leia atentamente o texto e identifique fatos relevantes.\n"
-        "Retorne os fatos como triplas: Sujeito, Predicado (relacao), Objeto.\n"
-        "Regras importantes:\n"
-        "1. Use relacoes curtas, em CAIXA_ALTA e snake_case (ex: CRIADO_POR, LOCALIZADO_EM, EH_UM, TEM_NOME).\n"
-        "2. Se o texto trouxer informacoes em primeira pessoa (\"eu\", \"meu\"), associe-as ao no CREATOR\n"
-        "   (exemplo: \"Meu peixe se chama Banguela\" -> {source: 'CREATOR', relationship: 'TEM_PET', target: 'Banguela'}).\n"
-        "3. Prefira conceitos concisos para os alvos (ex: 'tecnico de enfermagem', 'Banguela').\n"
-        "4. Ignore opinioes ou frases sem conteudo factual.\n"
-        "Responda APENAS com um JSON no formato:\n"
-        '{ "triples": [{"source": "Python", "relationship": "CRIADO_POR", "target": "Guido van Rossum"}] }\n'
+def chunk_text(text: str, max_tokens: int = EXTRACTION_CHUNK_TOKENS) -> List[str]:
+    """Quebra o texto em trechos de ate max_tokens, preferindo limites de paragrafo/frase."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks: List[str] = []
+    remaining = text
+    while len(remaining) > max_chars:
+        window = remaining[:max_chars]
+        cut = max(window.rfind("\n\n"), window.rfind("\n"), window.rfind(". "))
+        if cut < max_chars // 2:
+            cut = window.rfind(" ")
+        if cut <= 0:
+            cut = max_chars - 1
+        chunks.append(remaining[: cut + 1].strip())
+        remaining = remaining[cut + 1 :].strip()
+    if remaining:
+        chunks.append(remaining)
+    return chunks
+
+
+def _group_chunks(
+    chunks: List[Tuple[int, str]], token_budget: int
+) -> List[List[Tuple[int, str]]]:
+    """Agrupa trechos em requisicoes respeitando o orcamento de tokens."""
+    groups: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    current_tokens = 0
+    for text_index, chunk in chunks:
+        chunk_tokens = estimate_tokens(chunk)
+        if current and current_tokens + chunk_tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append((text_index, chunk))
+        current_tokens += chunk_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _extract_group(group: List[Tuple[int, str]]) -> Dict[int, List[Dict[str, str]]]:
+    """Uma chamada ao LLM para um grupo de trechos; devolve triplas por texto de origem."""
+    labels = {f"T{position}": text_index for position, (text_index, _) in enumerate(group, start=1)}
+    user_prompt = "\n\n".join(
+        f"[T{position}]\n{chunk}" for position, (_, chunk) in enumerate(group, start=1)
     )
+    attributed: Dict[int, List[Dict[str, str]]] = {}
     try:
         response = client.chat.completions.create(
             model="deepseek-chat",
             messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"TEXTO PARA APRENDER:\n{text}"},
+                {"role": "system", "content": EXTRACTION_RULES + BATCH_RESPONSE_FORMAT},
+                {"role": "user", "content": f"TEXTOS PARA APRENDER:\n{user_prompt}"},
             ],
             response_format={"type": "json_object"},
             temperature=0.1,
         )
-        content = response.choices[0].message.content
-        data = json.loads(content)
-        triples = data.get("triples", []) if isinstance(data, dict) else []
-        print(f"[Agente Consolidacao] Extraiu {len(triples)} novos fatos.")
-        return triples
+        data = json.loads(response.choices[0].message.content)
+    except Exception as error:
+        print(f"[Agente Consolidacao] ERRO ao extrair conhecimento em lote: {error}")
+        # Propaga para o lote marcar como falhos so os textos deste grupo.
+        raise
+    results = data.get("results", []) if isinstance(data, dict) else []
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        text_index = labels.get(str(result.get("id", "")).strip().strip("[]"))
+        if text_index is None:
+            continue
+        triples = [
+            triple for triple in result.get("triples") or [] if isinstance(triple, dict)
+        ]
+        attributed.setdefault(text_index, []).extend(triples)
+    return attributed
+
+
+def extract_knowledge_by_text(
+    texts: List[str],
+) -> Tuple[List[List[Dict[str, str]]], Dict[int, Exception]]:
+    """
+    Extrai triplas de varios textos com o minimo de chamadas ao LLM.
+    Textos curtos sao coalescidos numa mesma requisicao e textos longos sao
+    fatiados; as requisicoes rodam em paralelo. Retorna as triplas por texto,
+    na mesma ordem da entrada, e as falhas por indice de texto: uma chamada
+    que falha (rede, JSON) invalida so os textos do seu grupo.
+    """
+    chunks = [
+        (text_index, chunk)
+        for text_index, text in enumerate(texts)
+        for chunk in chunk_text(text)
+    ]
+    results: List[List[Dict[str, str]]] = [[] for _ in texts]
+    failures: Dict[int, Exception] = {}
+    if not chunks:
+        return results, failures
+
+    groups = _group_chunks(chunks, EXTRACTION_TOKEN_BUDGET)
+    print(
+        f"[Agente Consolidacao] Extraindo conhecimento de {len(texts)} textos "
+        f"({len(chunks)} trechos, {len(groups)} chamadas)..."
+    )
+    with ThreadPoolExecutor(
+        max_workers=min(EXTRACTION_MAX_PARALLEL, len(groups))
+    ) as executor:
+        futures = [(group, executor.submit(_extract_group, group)) for group in groups]
+        for group, future in futures:
+            try:
+                attributed = future.result()
+            except Exception as error:  # noqa: BLE001
+                for text_index, _ in group:
+                    failures.setdefault(text_index, error)
+                continue
+            for text_index, triples in attributed.items():
+                results[text_index].extend(triples)
+
+    for text_index, triples in enumerate(results):
+        if text_index in failures:
+            # Texto com algum trecho perdido e refeito por inteiro pelo chamador.
+            results[text_index] = []
+            continue
+        seen = set()
+        unique: List[Dict[str, str]] = []
+        for triple in triples:
+            key = (
+                str(triple.get("source", "")).strip().lower(),
+                str(triple.get("relationship", "")).strip().upper(),
+                str(triple.get("target", "")).strip().lower(),
+            )
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(triple)
+        results[text_index] = unique
+
+    print(
+        f"[Agente Consolidacao] Extraiu {sum(len(item) for item in results)} novos fatos"
+        f" ({len(failures)} textos com falha)."
+    )
+    return results, failures
+
+
+def extract_knowledge_batch(texts: List[str]) -> List[List[Dict[str, str]]]:
+    """
+    Como `extract_knowledge_by_text`, mas tudo ou nada: qualquer falha do LLM
+    e propagada para o chamador poder tentar de novo.
+    """
+    results, failures = extract_knowledge_by_text(texts)
+    if failures:
+        raise next(iter(failures.values()))
+    return results
+
+
+def extract_knowledge(text: str) -> List[Dict[str, str]]:
+    """Usa o LLM para extrair fatos do texto no formato de triplas: (Sujeito)-[RELACAO]->(Objeto)."""
+    print("[Agente Consolidacao] Lendo e extraindo conhecimento...")
+    try:
+        return extract_knowledge_batch([text])[0]
     except Exception as error:
         print(f"[Agente Consolidacao] ERRO ao extrair conhecimento: {error}")
         return []
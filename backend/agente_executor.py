@@ -8,6 +8,7 @@ from openai import OpenAI
 
 import ferramentas
 from agente_nqr import NexusQuantumReasoning
+from tool_runtime import tool_runtime
 
 llm_client = OpenAI(
     api_key=os.getenv("DEEPSEEK_API_KEY"),
@@ -230,12 +231,11 @@ def execute_dynamic_tool(tool_name: str, arguments: Dict[str, Any] | None = None
 
     arguments = arguments or {}
 
-    tool_function = getattr(ferramentas, tool_name, None)
-    if not callable(tool_function):
-        tool_info = ferramentas.AVAILABLE_TOOLS.get(tool_name)
-        if tool_info:
-            tool_function = tool_info.get("function")
+    if tool_name in ferramentas.AVAILABLE_TOOLS:
+        # Timeout, cache de resultados e pool de conexoes ficam no runtime.
+        return tool_runtime.run(tool_name, arguments)
 
+    tool_function = getattr(ferramentas, tool_name, None)
     if not callable(tool_function):
         raise ValueError(f"A ferramenta '{tool_name}' não está disponível.")
 
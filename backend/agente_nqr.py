@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Sequence
 
 from openai import OpenAI
 
+import confidence_scorer
 import database
 from models import SystemSettings
 
@@ -103,7 +104,8 @@ class NexusQuantumReasoning:
             return []
 
         self._low_confidence_alert = False
-        scored_docs: List[Any] = []
+        externals: List[float | None] = []
+        to_estimate: List[Any] = []
         for document in documents:
             intrinsic = self._get_numeric_attr(
                 document, "confianca_intrinseca", default=0.0
@@ -116,9 +118,40 @@ class NexusQuantumReasoning:
 
             if external is None:
                 if intrinsic <= 0.0:
-                    external = self._estimate_external_confidence(document)
+                    to_estimate.append(document)
                 else:
                     external = 0.0
+            externals.append(external)
+
+        # Modelo local em lote; o LLM so desempata os casos ambiguos.
+        if to_estimate:
+            estimated = iter(
+                confidence_scorer.score_documents(
+                    [
+                        {
+                            "text": self._extract_document_text(document),
+                            "url": self._get_attr(document, "url", default="") or "",
+                            "published": self._get_attr(
+                                document, "published_date", default=None
+                            )
+                            or self._get_attr(document, "published", default=None),
+                        }
+                        for document in to_estimate
+                    ],
+                    llm_estimator=lambda index: self._estimate_external_confidence(
+                        to_estimate[index]
+                    ),
+                )
+            )
+            externals = [
+                value if value is not None else next(estimated) for value in externals
+            ]
+
+        scored_docs: List[Any] = []
+        for document, external in zip(documents, externals):
+            intrinsic = self._get_numeric_attr(
+                document, "confianca_intrinseca", default=0.0
+            )
 
             external = max(0.0, min(float(external), 1.0))
             intrinsic = max(0.0, min(float(intrinsic), 1.0))
@@ -283,43 +316,49 @@ class NexusQuantumReasoning:
         self,
         session_id: str,
         history: List[Dict[str, str]],
-    ) -> None:
+        previous_summary: str = "",
+        covered_until: str | None = None,
+    ) -> str:
         """
-        Resumo sinaptico do historico de conversa para armazenamento no Neo4j.
+        Resumo sinaptico incremental do historico de conversa: funde o resumo
+        anterior com os novos turnos e persiste o resultado no Neo4j.
         """
         if not session_id or not history:
-            return
+            return previous_summary
 
         transcript = "\n".join(
             f"{item.get('role', 'desconhecido').upper()}: {item.get('content', '')}"
             for item in history
         )
-        if len(transcript) <= 4000:
-            return
 
         system_prompt = (
-            "Você é o compressor sináptico do Nexus. Resuma o histórico de conversas a seguir "
-            "em um parágrafo conciso, focando em fatos, decisões e tópicos importantes."
+            "Você é o compressor sináptico do Nexus. Atualize o RESUMO ATUAL da conversa "
+            "incorporando os NOVOS TURNOS, em um parágrafo conciso (no máximo 200 palavras), "
+            "focando em fatos, decisões e tópicos importantes. Responda apenas com o resumo."
+        )
+        user_prompt = (
+            f"RESUMO ATUAL:\n{previous_summary or 'Nenhum.'}\n\n"
+            f"NOVOS TURNOS:\n{transcript}"
         )
 
         try:
             summary = self._run_chat_completion(
                 system_prompt=system_prompt,
-                user_prompt=transcript,
+                user_prompt=user_prompt,
                 temperature=0.2,
             )
         except Exception as error:  # noqa: BLE001
             print(f"[NQR] Falha ao comprimir histórico da sessão {session_id}: {error}")
-            return
+            raise
 
         summary_text = summary.strip()
         if not summary_text:
-            return
+            return previous_summary
 
-        try:
-            database.save_context_summary(session_id, summary_text)
-        except Exception as error:  # noqa: BLE001
-            print(f"[NQR] Falha ao persistir resumo da sessão {session_id}: {error}")
+        database.save_context_summary(
+            session_id, summary_text, covered_until=covered_until
+        )
+        return summary_text
 
     # ------------------------------------------------------------------
     # Helpers internos
@@ -421,16 +460,13 @@ class NexusQuantumReasoning:
         )
         user_prompt = f"DOCUMENTO:\n{content}\n\nFONTE: {url}"
 
-        try:
-            raw = self._run_chat_completion(
-                system_prompt=system_prompt,
-                user_prompt=user_prompt,
-                temperature=0.2,
-            )
-            return self._parse_confidence_value(raw)
-        except Exception as error:  # noqa: BLE001
-            print(f"[NQR] Falha ao estimar confianca externa: {error}")
-            return 0.0
+        # Erros sobem para o confidence_scorer, que mantem a nota local.
+        raw = self._run_chat_completion(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            temperature=0.2,
+        )
+        return self._parse_confidence_value(raw)
 
     def _parse_confidence_value(self, value: str) -> float:
         try:
@@ -8,12 +8,24 @@ from openai import OpenAI
 
 import ferramentas
 from agente_nqr import NexusQuantumReasoning
+from prompt_budget import PromptAssembler, fold_accents
+from tool_runtime import tool_runtime
 
 try:  # pragma: no cover
     from nexus_graph import NexusGraph  # type: ignore
 except Exception:  # pragma: no cover
     NexusGraph = None  # type: ignore[assignment]
 
+try:  # pragma: no cover
+    import hybrid_retriever  # type: ignore
+except Exception:  # pragma: no cover
+    hybrid_retriever = None  # type: ignore[assignment]
+
+try:  # pragma: no cover
+    from local_search import local_index  # type: ignore
+except Exception:  # pragma: no cover
+    local_index = None  # type: ignore[assignment]
+
 
 llm_client = OpenAI(
     api_key=os.getenv("DEEPSEEK_API_KEY"),
@@ -22,6 +34,24 @@ llm_client = OpenAI(
 
 nqr = NexusQuantumReasoning()
 
+# Orcamentos (tokens) do contexto enviado ao sintetizador e ao verificador.
+SYNTHESIS_CONTEXT_TOKENS = int(os.getenv("NEXUS_SYNTHESIS_CONTEXT_TOKENS", 4000))
+SOURCE_BLOCK_TOKENS = 800
+
+# Base local (plugin local_search): com trechos fortes suficientes, a pesquisa
+# responde sem decompor a pergunta nem chamar ferramentas externas. Forte =
+# similaridade vetorial acima do limiar (um termo BM25 em comum nao basta).
+# Perguntas sobre noticias e atualidades sempre consultam as ferramentas.
+LOCAL_SEARCH_TOOL = "local_search"
+LOCAL_SEARCH_RESULTS = 5
+LOCAL_MIN_STRONG_HITS = 2
+LOCAL_STRONG_SIMILARITY = 0.5
+NEWS_TOOL = "news_search"
+TIME_SENSITIVE_TERMS = (
+    "noticia", "manchete", "ultimas", "novidade", "aconteceu", "hoje", "ontem",
+    "agora", "recente", "atual", "esta semana", "este mes", "tempo real",
+)
+
 
 def _safe_get(document: Any, key: str, default: Any = None) -> Any:
     if isinstance(document, dict):
@@ -49,12 +79,18 @@ def _attempt_quantum_search(context_of_use: str, search_query: str) -> List[Any]
         return []
 
     try:
+        if hybrid_retriever is not None:
+            # Caminhos ponderados + indice full-text em paralelo, fundidos por RRF.
+            return hybrid_retriever.retrieve(
+                search_query,
+                context_of_use=context_of_use,
+            )
         return NexusGraph.quantum_search(
             query=search_query,
             context_of_use=context_of_use,
         )
     except Exception as error:  # noqa: BLE001
-        print(f"[Orquestrador] Erro ao consultar NexusGraph.quantum_search: {error}")
+        print(f"[Orquestrador] Erro ao consultar a memoria do grafo: {error}")
         return []
 
 
@@ -112,17 +148,20 @@ def _decompose_query(user_query: str) -> List[str]:
 def _synthesize_multi_source(
     user_query: str,
     all_results: List[Dict[str, Any]],
-) -> Tuple[str, List[Dict[str, str]]]:
+) -> Tuple[str, List[Dict[str, str]], str]:
+    """Sintetiza a resposta; devolve tambem o contexto ja compactado que foi enviado."""
     consolidated_sources: List[Dict[str, str]] = []
     seen_sources = set()
-    context_blocks: List[str] = []
+    contexts: List[str] = []
+    labels: List[str] = []
 
     for index, result in enumerate(all_results, start=1):
         context = result.get("context")
         if not context:
             continue
         label = result.get("label") or result.get("sub_query") or f"Fonte {index}"
-        context_blocks.append(f"[{label}]\n{context}")
+        contexts.append(context)
+        labels.append(f"[{label}]")
         for source in result.get("sources", []):
             if not source:
                 continue
@@ -132,11 +171,21 @@ def _synthesize_multi_source(
             seen_sources.add(key)
             consolidated_sources.append(source)
 
-    combined_context = "\n\n".join(context_blocks)
+    assembler = PromptAssembler("Sintese de pesquisa", query=user_query)
+    combined_context = assembler.section(
+        "fontes",
+        contexts,
+        max_tokens=SYNTHESIS_CONTEXT_TOKENS,
+        snippet_max_tokens=SOURCE_BLOCK_TOKENS,
+        separator="\n\n",
+        labels=labels,
+    )
+    assembler.log()
     if not combined_context:
         return (
             "Não consegui reunir contexto suficiente para responder com confiança.",
             consolidated_sources,
+            "",
         )
 
     system_prompt = (
@@ -158,7 +207,7 @@ def _synthesize_multi_source(
         temperature=0.3,
     )
     answer = response.choices[0].message.content.strip()
-    return answer, consolidated_sources
+    return answer, consolidated_sources, combined_context
 
 
 def _check_for_hallucination(answer: str, context: str) -> Tuple[bool, str]:
@@ -237,52 +286,101 @@ def _normalize_tool_output(raw_result: Any) -> Dict[str, Any]:
 def _choose_fallback_tool() -> str:
     if "tavily_search" in ferramentas.AVAILABLE_TOOLS:
         return "tavily_search"
-    if ferramentas.AVAILABLE_TOOLS:
-        return next(iter(ferramentas.AVAILABLE_TOOLS.keys()))
-    return ""
+    external = [name for name in ferramentas.AVAILABLE_TOOLS if name != LOCAL_SEARCH_TOOL]
+    return external[0] if external else ""
+
+
+def _is_time_sensitive(user_query: str, tool_name: str, context_of_use: str) -> bool:
+    """Noticias/atualidades: a base local pode estar desatualizada."""
+    if tool_name == NEWS_TOOL:
+        return True
+    text = fold_accents(f"{user_query} {context_of_use}")
+    return any(term in text for term in TIME_SENSITIVE_TERMS)
+
+
+def _search_local_corpus(search_query: str) -> Tuple[Dict[str, Any] | None, bool]:
+    """Consulta a base local. Retorna (resultado, cobre_a_pergunta)."""
+    if local_index is None:
+        return None, False
+    try:
+        documents = local_index.search(search_query, k=LOCAL_SEARCH_RESULTS)
+    except Exception as error:  # noqa: BLE001
+        print(f"[Orquestrador] Falha na busca local: {error}")
+        return None, False
+    if not documents:
+        return None, False
+
+    strong_hits = sum(
+        1
+        for document in documents
+        if _safe_float(document.get("similarity")) >= LOCAL_STRONG_SIMILARITY
+    )
+    normalized = _normalize_tool_output(
+        [
+            {
+                "title": document.get("title") or document.get("source"),
+                "url": document.get("source"),
+                "content": document.get("content"),
+            }
+            for document in documents
+        ]
+    )
+    result = {
+        "context": normalized["context"],
+        "sources": normalized["sources"],
+        "label": "Base Local",
+    }
+    return result, strong_hits >= LOCAL_MIN_STRONG_HITS
 
 
-def _execute_tool_strategy(
+def _execute_tool_strategies(
     *,
     tool_name: str,
-    search_query: str,
+    search_queries: List[str],
     user_query: str,
     context_of_use: str,
-) -> Dict[str, Any]:
-    tool_info = ferramentas.AVAILABLE_TOOLS.get(tool_name)
-    if not tool_info:
-        fallback_tool = _choose_fallback_tool()
+) -> List[Dict[str, Any]]:
+    """Executa a ferramenta para todas as subconsultas em paralelo (tool_runtime)."""
+    resolved_tool = tool_name
+    if resolved_tool not in ferramentas.AVAILABLE_TOOLS:
+        resolved_tool = _choose_fallback_tool()
         print(
-            f"[Orquestrador] Ferramenta '{tool_name}' nao encontrada. Usando fallback: {fallback_tool}."
+            f"[Orquestrador] Ferramenta '{tool_name}' nao encontrada. Usando fallback: {resolved_tool}."
         )
-        if not fallback_tool:
-            return {
-                "context": "Nenhuma ferramenta disponivel para executar a pesquisa.",
-                "sources": [],
-                "label": tool_name,
-                "sub_query": search_query,
-            }
-        tool_info = ferramentas.AVAILABLE_TOOLS[fallback_tool]
-
-    raw_result = tool_info["function"](search_query)
-    normalized = _normalize_tool_output(raw_result)
-    context = normalized["context"]
-    sources = normalized["sources"]
+        if not resolved_tool:
+            return [
+                {
+                    "context": "Nenhuma ferramenta disponivel para executar a pesquisa.",
+                    "sources": [],
+                    "label": tool_name,
+                    "sub_query": search_query,
+                }
+                for search_query in search_queries
+            ]
 
-    if not context or context.startswith("ERRO"):
-        return {
-            "context": context or "Nao encontrei informacoes suficientes.",
-            "sources": sources,
-            "label": f"{tool_name} :: {search_query}",
-            "sub_query": search_query,
-        }
+    parameters = ferramentas.AVAILABLE_TOOLS[resolved_tool].get("parameters") or {}
+    query_parameter = next(iter(parameters), "query")
+    raw_results = tool_runtime.run_many(
+        [(resolved_tool, {query_parameter: search_query}) for search_query in search_queries]
+    )
 
-    return {
-        "context": context,
-        "sources": sources,
-        "label": f"{tool_name} :: {search_query}",
-        "sub_query": search_query,
-    }
+    results: List[Dict[str, Any]] = []
+    for search_query, raw_result in zip(search_queries, raw_results):
+        if isinstance(raw_result, Exception):
+            raw_result = f"ERRO {resolved_tool}: {raw_result}"
+        normalized = _normalize_tool_output(raw_result)
+        context = normalized["context"]
+        if not context or context.startswith("ERRO"):
+            context = context or "Nao encontrei informacoes suficientes."
+        results.append(
+            {
+                "context": context,
+                "sources": normalized["sources"],
+                "label": f"{tool_name} :: {search_query}",
+                "sub_query": search_query,
+            }
+        )
+    return results
 
 
 def search(user_query: str) -> Dict[str, Any]:
@@ -320,21 +418,32 @@ def search(user_query: str) -> Dict[str, Any]:
         else:
             print("[Orquestrador] Contexto vazio apos reordenacao. Fallback para ferramentas classicas.")
 
-    sub_queries = _decompose_query(user_query)
-    if optimized_query not in sub_queries:
-        sub_queries = [optimized_query] + sub_queries
+    local_result, local_sufficient = _search_local_corpus(optimized_query)
+    if local_result:
+        all_results.append(local_result)
 
     tool_results: List[Dict[str, Any]] = []
-    for sub_query in sub_queries:
-        tool_result = _execute_tool_strategy(
+    if local_sufficient and _is_time_sensitive(user_query, tool_name, context_of_use):
+        print("[Orquestrador] Pergunta sobre atualidades: ferramentas externas mantidas.")
+        local_sufficient = False
+    if local_sufficient:
+        print("[Orquestrador] Base local cobre a pergunta. Ferramentas externas dispensadas.")
+    else:
+        if tool_name == LOCAL_SEARCH_TOOL:
+            tool_name = _choose_fallback_tool()
+        sub_queries = _decompose_query(user_query)
+        if optimized_query not in sub_queries:
+            sub_queries = [optimized_query] + sub_queries
+
+        tool_results = _execute_tool_strategies(
             tool_name=tool_name,
-            search_query=sub_query,
+            search_queries=sub_queries,
             user_query=user_query,
             context_of_use=context_of_use,
         )
+    for tool_result in tool_results:
         if not tool_result.get("label"):
-            tool_result["label"] = f"Subconsulta: {sub_query}"
-        tool_results.append(tool_result)
+            tool_result["label"] = f"Subconsulta: {tool_result['sub_query']}"
         if tool_result.get("context"):
             all_results.append(
                 {
@@ -357,17 +466,18 @@ def search(user_query: str) -> Dict[str, Any]:
             "sources": [],
         }
 
-    answer, consolidated_sources = _synthesize_multi_source(user_query, all_results)
-    combined_context_text = "\n\n".join(
-        entry["context"] for entry in all_results if entry.get("context")
+    answer, consolidated_sources, combined_context_text = _synthesize_multi_source(
+        user_query, all_results
     )
+    # Reaproveita o contexto ja compactado em vez de reenviar todas as fontes.
     consistent, reason = _check_for_hallucination(answer, combined_context_text)
     if not consistent:
         print(f"[Orquestrador][VCP] Ajustando resposta consolidada: {reason}")
-        augmented_results = all_results + [
+        # Alerta na frente para nao ser cortado pelo orcamento de contexto.
+        augmented_results = [
             {"context": f"[ALERTA VCP] {reason}", "sources": [], "label": "VCP"}
-        ]
-        answer, consolidated_sources = _synthesize_multi_source(user_query, augmented_results)
+        ] + all_results
+        answer, consolidated_sources, _ = _synthesize_multi_source(user_query, augmented_results)
 
     if reranked_docs:
         answer = nqr.self_correct_rag(answer, reranked_docs)
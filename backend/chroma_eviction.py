@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from cold_archive import cold_archive
+from db_connect import chroma_client
+
+# Indice local (SQLite) dos documentos do ChromaDB: em qual colecao cada id
+# mora e quantas vezes foi ativado pelo RAG. Contar, escolher vitimas e
+# remover passam a custar consultas locais e uma chamada por colecao afetada.
+INDEX_PATH = os.getenv(
+    "NEXUS_CHROMA_INDEX_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "nexus_chroma_index.sqlite3"
+    ),
+)
+# "archive" move os documentos despejados para a camada fria; "delete" descarta.
+EVICTION_MODE = os.getenv("NEXUS_CHROMA_EVICTION_MODE", "archive").lower()
+LOW_WATERMARK = 0.9  # Fracao do limite que sobra apos um despejo
+DELETE_BATCH_SIZE = 100
+
+
+class ChromaEvictionIndex:
+    """Indice doc-id -> colecao e fila de despejo ordenada por ativacao."""
+
+    def __init__(self, path: str = INDEX_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _ensure_schema(self) -> None:
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            connection = self._connect()
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS documents (
+                        id TEXT PRIMARY KEY,
+                        collection TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        activations INTEGER NOT NULL DEFAULT 0,
+                        last_activation REAL NOT NULL
+                    )
+                    """
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS documents_eviction "
+                    "ON documents (activations, last_activation)"
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS documents_collection ON documents (collection)"
+                )
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+                )
+            finally:
+                connection.close()
+            self._initialized = True
+
+    def record(
+        self, document_id: str, collection: str, created_at: float | None = None
+    ) -> None:
+        """Registra um documento recem-gravado no ChromaDB."""
+        self._ensure_schema()
+        moment = created_at or time.time()
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR IGNORE INTO documents (id, collection, created_at, last_activation) "
+                "VALUES (?, ?, ?, ?)",
+                (document_id, collection, moment, moment),
+            )
+        finally:
+            connection.close()
+
+    def touch(self, document_ids: Iterable[str]) -> None:
+        """Conta uma ativacao (uso no RAG) para cada documento."""
+        ids = [document_id for document_id in document_ids if document_id]
+        if not ids:
+            return
+        self._ensure_schema()
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.executemany(
+                "UPDATE documents SET activations = activations + 1, last_activation = ? "
+                "WHERE id = ?",
+                [(now, document_id) for document_id in ids],
+            )
+        finally:
+            connection.close()
+
+    def count(self) -> int:
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            return int(
+                connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            )
+        finally:
+            connection.close()
+
+    def victims(self, limit: int) -> List[Tuple[str, str]]:
+        """Documentos menos ativados (e mais antigos) primeiro: (id, colecao)."""
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT id, collection FROM documents "
+                "ORDER BY activations ASC, last_activation ASC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        finally:
+            connection.close()
+        return [(row["id"], row["collection"]) for row in rows]
+
+    def locate(self, document_ids: Sequence[str]) -> Dict[str, List[str]]:
+        """Agrupa ids por colecao; ids desconhecidos ficam sob a chave ''."""
+        self._ensure_schema()
+        grouped: Dict[str, List[str]] = {}
+        connection = self._connect()
+        try:
+            for start in range(0, len(document_ids), 500):
+                chunk = list(document_ids[start : start + 500])
+                placeholders = ",".join("?" for _ in chunk)
+                rows = connection.execute(
+                    f"SELECT id, collection FROM documents WHERE id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                known = {row["id"]: row["collection"] for row in rows}
+                for document_id in chunk:
+                    grouped.setdefault(known.get(document_id, ""), []).append(
+                        document_id
+                    )
+        finally:
+            connection.close()
+        return grouped
+
+    def forget(self, document_ids: Sequence[str]) -> None:
+        if not document_ids:
+            return
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            connection.executemany(
+                "DELETE FROM documents WHERE id = ?",
+                [(document_id,) for document_id in document_ids],
+            )
+        finally:
+            connection.close()
+
+    def bootstrap(self) -> int:
+        """
+        Popula o indice a partir do ChromaDB uma unica vez (documentos gravados
+        antes do indice existir). Retorna quantos documentos foram registrados.
+        """
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            if connection.execute(
+                "SELECT 1 FROM meta WHERE key = 'bootstrapped'"
+            ).fetchone():
+                return 0
+        finally:
+            connection.close()
+
+        registered = 0
+        for info in chroma_client.list_collections():
+            name = getattr(info, "name", info)
+            if not str(name).startswith("chat_"):
+                continue  # So a memoria de chat entra no despejo
+            collection = chroma_client.get_collection(name=name)
+            result = collection.get(include=["metadatas"])
+            rows = []
+            metadatas = result.get("metadatas") or []
+            for index, document_id in enumerate(result.get("ids") or []):
+                metadata = metadatas[index] if index < len(metadatas) else None
+                moment = float((metadata or {}).get("ts") or 0.0) or time.time()
+                rows.append((document_id, name, moment, moment))
+            connection = self._connect()
+            try:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO documents (id, collection, created_at, last_activation) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            finally:
+                connection.close()
+            registered += len(rows)
+
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('bootstrapped', ?)",
+                (str(time.time()),),
+            )
+        finally:
+            connection.close()
+        print(f"[Chroma Eviction] Indice inicializado com {registered} documentos.")
+        return registered
+
+
+def remove_documents(grouped: Dict[str, List[str]], archive: bool) -> int:
+    """
+    Remove (arquivando, se pedido) os documentos agrupados por colecao, em
+    lotes, so nas colecoes onde eles moram. Retorna quantos foram removidos.
+    """
+    removed = 0
+    for collection_name, ids in grouped.items():
+        try:
+            collection = chroma_client.get_collection(name=collection_name)
+        except Exception as error:  # noqa: BLE001
+            print(
+                f"[Chroma Eviction] Colecao '{collection_name}' indisponivel: {error}"
+            )
+            continue
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[start : start + DELETE_BATCH_SIZE]
+            to_delete = batch
+            try:
+                if archive:
+                    result = collection.get(
+                        ids=batch, include=["documents", "metadatas", "embeddings"]
+                    )
+                    to_delete = list(result.get("ids") or [])
+                    if not to_delete:
+                        # Ja nao estao no ChromaDB: so limpa o indice.
+                        eviction_index.forget(batch)
+                        continue
+                    # So apaga o que foi de fato gravado na camada fria.
+                    if cold_archive.append(collection_name, result) is None:
+                        print(
+                            f"[Chroma Eviction] Lote de {len(to_delete)} documentos de "
+                            f"'{collection_name}' nao arquivado (embeddings ausentes ou "
+                            "incompletos); remocao ignorada."
+                        )
+                        continue
+                collection.delete(ids=to_delete)
+            except Exception as error:  # noqa: BLE001
+                print(
+                    f"[Chroma Eviction] Falha ao remover {len(batch)} documentos de "
+                    f"'{collection_name}': {error}"
+                )
+                continue
+            eviction_index.forget(batch)
+            removed += len(to_delete)
+    return removed
+
+
+def evict(max_documents: int) -> Dict[str, Any]:
+    """
+    Mantem o ChromaDB abaixo de `max_documents`: ao passar do limite, despeja
+    os documentos menos ativados ate LOW_WATERMARK do limite.
+    """
+    eviction_index.bootstrap()
+    total = eviction_index.count()
+    report: Dict[str, Any] = {
+        "total_before": total,
+        "limit": max_documents,
+        "evicted": 0,
+        "collections": [],
+        "mode": EVICTION_MODE,
+    }
+    if total <= max_documents:
+        report["total_after"] = total
+        return report
+
+    excess = total - int(max_documents * LOW_WATERMARK)
+    grouped: Dict[str, List[str]] = {}
+    for document_id, collection_name in eviction_index.victims(excess):
+        grouped.setdefault(collection_name, []).append(document_id)
+    report["evicted"] = remove_documents(grouped, archive=EVICTION_MODE == "archive")
+    report["collections"] = sorted(grouped)
+    report["total_after"] = eviction_index.count()
+    return report
+
+
+eviction_index = ChromaEvictionIndex()
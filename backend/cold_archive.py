@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+try:  # pragma: no cover - dependencia opcional
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover
+    pa = None
+    pq = None
+
+# Camada fria da memoria de chat: documentos despejados do ChromaDB viram
+# segmentos imutaveis em disco. Cada segmento tem os registros (Parquet zstd
+# quando o pyarrow esta instalado, senao JSONL gzip) e um indice vetorial
+# plano (.vec.npy, float32 normalizado) lido por memory map.
+ARCHIVE_DIR = os.getenv(
+    "NEXUS_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "memoria_fria"),
+)
+VECTOR_SUFFIX = ".vec.npy"
+RECORD_SUFFIXES = (".parquet", ".jsonl.gz")
+RECORD_CACHE_SIZE = 16  # Segmentos com registros mantidos em memoria
+REFRESH_INTERVAL = 10.0  # Segundos entre releituras do diretorio
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _write_records(base: str, records: List[Dict[str, Any]]) -> None:
+    if pq is not None:
+        table = pa.table(
+            {
+                "id": [record["id"] for record in records],
+                "collection": [record["collection"] for record in records],
+                "document": [record["document"] for record in records],
+                "metadata": [
+                    json.dumps(record["metadata"] or {}) for record in records
+                ],
+            }
+        )
+        pq.write_table(table, base + ".parquet", compression="zstd")
+        return
+    with gzip.open(base + ".jsonl.gz", "wt", encoding="utf-8") as handle:
+        for record in records:
+            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _read_records(path: str) -> List[Dict[str, Any]]:
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError("pyarrow nao instalado para ler segmentos Parquet.")
+        rows = pq.read_table(path).to_pylist()
+        for row in rows:
+            row["metadata"] = json.loads(row.get("metadata") or "{}")
+        return rows
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+class ColdArchive:
+    """Segmentos arquivados com busca vetorial por forca bruta sobre memory maps."""
+
+    def __init__(self, directory: str = ARCHIVE_DIR) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._records: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._scanned_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def append(self, collection: str, result: Dict[str, Any]) -> str | None:
+        """
+        Arquiva um lote no formato de `collection.get(include=[documents,
+        metadatas, embeddings])`. Retorna o nome do segmento criado.
+        """
+        ids = list(result.get("ids") or [])
+        embeddings = result.get("embeddings")
+        if not ids or embeddings is None or len(embeddings) != len(ids):
+            return None
+        documents = list(result.get("documents") or [None] * len(ids))
+        metadatas = list(result.get("metadatas") or [None] * len(ids))
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(
+            self.directory, f"{int(time.time())}_{collection}_{uuid.uuid4().hex[:8]}"
+        )
+        records = [
+            {
+                "id": document_id,
+                "collection": collection,
+                "document": documents[index],
+                "metadata": metadatas[index],
+            }
+            for index, document_id in enumerate(ids)
+        ]
+        _write_records(base, records)
+        # O indice vetorial e gravado por ultimo: so segmentos completos sao lidos.
+        np.save(base + ".tmp.npy", _normalize(np.asarray(embeddings)))
+        os.replace(base + ".tmp.npy", base + VECTOR_SUFFIX)
+        with self._lock:
+            self._vectors[base] = np.load(base + VECTOR_SUFFIX, mmap_mode="r")
+        return os.path.basename(base)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def _refresh(self) -> None:
+        if time.time() - self._scanned_at < REFRESH_INTERVAL:
+            return
+        if not os.path.isdir(self.directory):
+            return
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".jsonl.gz"):
+                    base = os.path.join(self.directory, name[: -len(".jsonl.gz")])
+                    if not os.path.exists(base + VECTOR_SUFFIX):
+                        try:
+                            self._index_legacy_segment(base)
+                        except Exception as error:  # noqa: BLE001
+                            print(f"[Cold Archive] Segmento ignorado ({name}): {error}")
+            for name in os.listdir(self.directory):
+                if name.endswith(VECTOR_SUFFIX):
+                    base = os.path.join(self.directory, name[: -len(VECTOR_SUFFIX)])
+                    if base not in self._vectors:
+                        self._vectors[base] = np.load(
+                            base + VECTOR_SUFFIX, mmap_mode="r"
+                        )
+            self._scanned_at = time.time()
+
+    def _index_legacy_segment(self, base: str) -> None:
+        # Segmentos antigos guardavam o embedding dentro de cada registro.
+        records = _read_records(base + ".jsonl.gz")
+        embeddings = [record.pop("embedding", None) for record in records]
+        if not records or any(embedding is None for embedding in embeddings):
+            return
+        with gzip.open(base + ".jsonl.gz", "wt", encoding="utf-8") as handle:
+            for record in records:
+                handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        np.save(base + ".tmp.npy", _normalize(np.asarray(embeddings)))
+        os.replace(base + ".tmp.npy", base + VECTOR_SUFFIX)
+
+    def _segment_records(self, base: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            cached = self._records.get(base)
+            if cached is not None:
+                self._records.move_to_end(base)
+                return cached
+        path = next(
+            (
+                base + suffix
+                for suffix in RECORD_SUFFIXES
+                if os.path.exists(base + suffix)
+            ),
+            None,
+        )
+        records = _read_records(path) if path else []
+        with self._lock:
+            self._records[base] = records
+            while len(self._records) > RECORD_CACHE_SIZE:
+                self._records.popitem(last=False)
+        return records
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        k: int = 5,
+        collection: str | None = None,
+        min_score: float = 0.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Os k registros arquivados mais proximos (cosseno) da consulta, do mais
+        ao menos similar. `collection` restringe aos segmentos da colecao.
+        """
+        self._refresh()
+        query = _normalize(np.asarray(query_embedding))[0]
+        marker = f"_{collection}_" if collection else None
+        candidates: List[tuple] = []
+        with self._lock:
+            segments = list(self._vectors.items())
+        for base, vectors in segments:
+            if marker and marker not in os.path.basename(base):
+                continue
+            if len(vectors) == 0 or vectors.shape[1] != query.shape[0]:
+                continue
+            scores = np.asarray(vectors @ query)
+            top = min(k, len(scores))
+            for row in np.argpartition(-scores, top - 1)[:top]:
+                if scores[row] >= min_score:
+                    candidates.append((float(scores[row]), base, int(row)))
+
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        found: List[Dict[str, Any]] = []
+        for score, base, row in candidates[:k]:
+            records = self._segment_records(base)
+            if row < len(records):
+                found.append({**records[row], "score": score})
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        with self._lock:
+            return {
+                "segments": len(self._vectors),
+                "documents": int(
+                    sum(len(vectors) for vectors in self._vectors.values())
+                ),
+                "format": "parquet" if pq is not None else "jsonl.gz",
+            }
+
+
+cold_archive = ColdArchive()
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Sequence
+from urllib.parse import urlparse
+
+import numpy as np
+
+import database
+
+# Confianca externa estimada localmente a partir de sinais baratos; o LLM so
+# e consultado quando a nota cai na faixa ambigua. Sinais ausentes (dominio
+# desconhecido, sem data, item unico) nao entram na media: preenchidos com
+# 0.5 eles puxavam quase toda nota para o meio da faixa.
+FEATURE_WEIGHTS = np.array(
+    [0.45, 0.15, 0.15, 0.25]
+)  # dominio, recencia, tamanho, concordancia
+AMBIGUOUS_LOW = 0.47
+AMBIGUOUS_HIGH = 0.53
+MAX_LLM_ESCALATIONS = 2
+MEMO_SIZE = 2048
+NEUTRAL = 0.5
+RECENCY_HALF_LIFE_DAYS = 365.0
+LENGTH_SATURATION_CHARS = 2000
+
+# Reputacao por dominio (sufixo mais especifico vence).
+DOMAIN_REPUTATION: Dict[str, float] = {
+    "gov": 0.9,
+    "gov.br": 0.9,
+    "edu": 0.85,
+    "edu.br": 0.85,
+    "nasa.gov": 0.95,
+    "who.int": 0.9,
+    "nature.com": 0.9,
+    "science.org": 0.9,
+    "arxiv.org": 0.8,
+    "wikipedia.org": 0.8,
+    "britannica.com": 0.8,
+    "reuters.com": 0.8,
+    "apnews.com": 0.8,
+    "bbc.com": 0.75,
+    "bbc.co.uk": 0.75,
+    "g1.globo.com": 0.7,
+    "folha.uol.com.br": 0.7,
+    "estadao.com.br": 0.7,
+    "docs.python.org": 0.9,
+    "github.com": 0.65,
+    "stackoverflow.com": 0.65,
+    "medium.com": 0.45,
+    "blogspot.com": 0.35,
+    "wordpress.com": 0.35,
+    "reddit.com": 0.35,
+    "quora.com": 0.3,
+}
+UNKNOWN_DOMAIN = 0.5
+NO_URL = 0.4
+
+_memo: "OrderedDict[str, float]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _memo_key(url: str, text: str) -> str:
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"{url}|{digest}"
+
+
+def _memo_get(key: str) -> float | None:
+    with _memo_lock:
+        value = _memo.get(key)
+        if value is not None:
+            _memo.move_to_end(key)
+        return value
+
+
+def _memo_put(key: str, value: float) -> None:
+    with _memo_lock:
+        _memo[key] = value
+        _memo.move_to_end(key)
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+
+
+def _known_reputation(url: str) -> float | None:
+    """Reputacao do dominio, ou None se o dominio nao esta na tabela."""
+    if not url or not url.startswith(("http://", "https://")):
+        return NO_URL
+    host = (urlparse(url).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    labels = host.split(".")
+    for start in range(len(labels)):
+        suffix = ".".join(labels[start:])
+        if suffix in DOMAIN_REPUTATION:
+            return DOMAIN_REPUTATION[suffix]
+    return None
+
+
+def domain_reputation(url: str) -> float:
+    reputation = _known_reputation(url)
+    return UNKNOWN_DOMAIN if reputation is None else reputation
+
+
+def _recency(published: Any, now: datetime) -> float:
+    """Decaimento pela idade da publicacao; NaN quando a data e desconhecida."""
+    if not published:
+        return math.nan
+    try:
+        moment = datetime.fromisoformat(str(published).replace("Z", "+00:00"))
+    except ValueError:
+        return math.nan
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    age_days = max(0.0, (now - moment).total_seconds() / 86400.0)
+    return math.pow(0.5, age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def _agreement(texts: Sequence[str]) -> np.ndarray:
+    """Similaridade media (cosseno) de cada texto com os demais do lote."""
+    if len(texts) < 2:
+        return np.full(len(texts), np.nan)
+    try:
+        vectors = np.asarray(
+            database.default_embedding_function(list(texts)), dtype=np.float64
+        )
+    except Exception as error:  # noqa: BLE001
+        print(f"[Confidence Scorer] Embeddings indisponiveis: {error}")
+        return np.full(len(texts), np.nan)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    mean_similarity = similarity.sum(axis=1) / (len(texts) - 1)
+    return np.clip(mean_similarity, 0.0, 1.0)
+
+
+def score_documents(
+    items: Sequence[Dict[str, Any]],
+    llm_estimator: Callable[[int], float] | None = None,
+) -> List[float]:
+    """
+    Calcula a confianca externa de cada item ({text, url, published}).
+    Itens ja vistos (mesma URL e conteudo) vem do memo; os de nota ambigua
+    sao reavaliados pelo llm_estimator (recebe o indice do item), ate
+    MAX_LLM_ESCALATIONS por chamada, em paralelo.
+    """
+    scores: List[float | None] = [None] * len(items)
+    keys = [
+        _memo_key(str(item.get("url") or ""), str(item.get("text") or ""))
+        for item in items
+    ]
+    pending = []
+    for index, key in enumerate(keys):
+        cached = _memo_get(key)
+        if cached is not None:
+            scores[index] = cached
+        else:
+            pending.append(index)
+    if not pending:
+        return [float(score) for score in scores]
+
+    now = datetime.now(timezone.utc)
+    texts = [str(items[index].get("text") or "") for index in pending]
+    features = np.column_stack(
+        [
+            [
+                math.nan if reputation is None else reputation
+                for reputation in (
+                    _known_reputation(str(items[index].get("url") or ""))
+                    for index in pending
+                )
+            ],
+            [_recency(items[index].get("published"), now) for index in pending],
+            np.minimum(
+                np.log1p([len(text) for text in texts])
+                / math.log1p(LENGTH_SATURATION_CHARS),
+                1.0,
+            ),
+            _agreement(texts),
+        ]
+    )
+    # Media ponderada so dos sinais presentes (o tamanho sempre existe).
+    weights = np.where(np.isnan(features), 0.0, FEATURE_WEIGHTS)
+    local_scores = np.clip(
+        (np.nan_to_num(features) * weights).sum(axis=1) / weights.sum(axis=1),
+        0.0,
+        1.0,
+    )
+
+    ambiguous = [
+        position
+        for position in np.argsort(np.abs(local_scores - NEUTRAL))
+        if AMBIGUOUS_LOW <= local_scores[position] <= AMBIGUOUS_HIGH
+    ][:MAX_LLM_ESCALATIONS]
+    if llm_estimator is not None and ambiguous:
+        with ThreadPoolExecutor(max_workers=len(ambiguous)) as executor:
+            futures = {
+                position: executor.submit(llm_estimator, pending[position])
+                for position in ambiguous
+            }
+            for position, future in futures.items():
+                try:
+                    local_scores[position] = max(0.0, min(float(future.result()), 1.0))
+                except Exception as error:  # noqa: BLE001
+                    print(f"[Confidence Scorer] Estimativa via LLM falhou: {error}")
+
+    for position, index in enumerate(pending):
+        value = float(local_scores[position])
+        scores[index] = value
+        _memo_put(keys[index], value)
+    print(
+        f"[Confidence Scorer] {len(pending)} documentos pontuados localmente "
+        f"({len(items) - len(pending)} do memo, {len(ambiguous) if llm_estimator else 0} via LLM)."
+    )
+    return [float(score) for score in scores]
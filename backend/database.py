@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import base64
+import heapq
+import itertools
 import json
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 from chromadb.utils import embedding_functions
 
+from activation_buffer import activation_buffer
+from chroma_eviction import eviction_index, remove_documents
 from db_connect import chroma_client, neo4j_driver
+from message_writer import message_writer
+from graph_projection import node_matches, projection
+from prompt_budget import extract_terms, fold_accents
+from session_cache import SessionHistoryCache
+from synaptic_decay import schedule_cypher
 from models import (
     ChatMessage,
     ChatSession,
@@ -25,6 +38,9 @@ DEFAULT_MEMORY_STATUS = "MCP"
 DEFAULT_INTRINSIC_CONFIDENCE = 0.25
 DEFAULT_SYNAPTIC_STRENGTH = 1.0
 DEFAULT_REL_CONTEXTUAL_RELEVANCE = 1.0
+# Marcos de poda/promocao recalculados sempre que a forca base e gravada.
+SOURCE_DECAY_SCHEDULE = schedule_cypher("source")
+TARGET_DECAY_SCHEDULE = schedule_cypher("target")
 
 
 def create_inbox_item(item: Union[InboxItem, str], item_type: Optional[str] = None) -> InboxItem:
@@ -67,27 +83,163 @@ def create_chat_session(title: str) -> ChatSession:
             **payload,
         )
 
+    history_cache.mark_new(session_model.id)
+    _remember_summary(session_model.id, None)
     return session_model
 
 
-def get_all_sessions() -> List[ChatSession]:
-    """Fetch all chat sessions ordered by most recent update."""
-    with neo4j_driver.session() as db_session:
-        result = db_session.run(
-            "MATCH (s:ChatSession) RETURN s ORDER BY s.updated_at DESC"
-        )
-        sessions: List[ChatSession] = []
-        for record in result:
-            node = record["s"]
-            sessions.append(ChatSession(**node))
-        return sessions
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
+PAGE_FLUSH_TIMEOUT = 5.0  # Segundos esperando o write-behind da sessao
+
+# Campos projetaveis por entidade: nome do campo -> expressao Cypher.
+SESSION_FIELDS = {
+    "id": "s.id",
+    "title": "s.title",
+    "created_at": "s.created_at",
+    "updated_at": "s.updated_at",
+}
+INBOX_FIELDS = {
+    "id": "i.id",
+    "content": "i.content",
+    "type": "i.type",
+    "created_at": "i.created_at",
+}
+MESSAGE_FIELDS = {
+    "id": "m.id",
+    "session_id": "m.session_id",
+    "role": "m.role",
+    "content": "m.content",
+    "created_at": "m.timestamp_iso",
+}
+
+
+def encode_cursor(sort_value: Any, item_id: str) -> str:
+    raw = json.dumps([sort_value, item_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> Tuple[Any, str | None]:
+    """Decodifica um cursor de paginacao; ValueError se for invalido."""
+    if not cursor:
+        return None, None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as error:
+        raise ValueError("Cursor de paginacao invalido.") from error
+    return sort_value, str(item_id)
+
+
+def _projection(available: Dict[str, str], fields: Sequence[str] | None) -> str:
+    """Monta a projecao Cypher apenas com campos conhecidos (id sempre incluido)."""
+    selected = [name for name in available if not fields or name in fields or name == "id"]
+    unknown = [name for name in fields or [] if name not in available]
+    if unknown:
+        raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}")
+    return "{" + ", ".join(f"{name}: {available[name]}" for name in selected) + "}"
 
 
-def get_inbox_items() -> List[InboxItem]:
-    """Fetch every :InboxItem node from Neo4j."""
+def _run_page(
+    query: str,
+    limit: int | None,
+    cursor: str | None,
+    **params: Any,
+) -> Tuple[List[Dict[str, Any]], str | None]:
+    """
+    Executa a consulta keyset. Sem `limit` e sem `cursor` devolve tudo (contrato
+    antigo dos endpoints); com cursor, o limite padrao vale.
+    """
+    if limit is None and cursor:
+        limit = PAGE_DEFAULT_LIMIT
+    if limit is not None:
+        limit = max(1, min(int(limit), PAGE_MAX_LIMIT))
+        query += "\nLIMIT $limit"
+    cursor_value, cursor_id = decode_cursor(cursor)
     with neo4j_driver.session() as session:
-        results = session.run("MATCH (i:InboxItem) RETURN i")
-        return [InboxItem(**record["i"]) for record in results]
+        records = list(
+            session.run(
+                query,
+                cursor_value=cursor_value,
+                cursor_id=cursor_id,
+                limit=limit + 1 if limit is not None else None,
+                **params,
+            )
+        )
+    next_cursor = None
+    if limit is not None and len(records) > limit:
+        records = records[:limit]
+        last = records[-1]
+        next_cursor = encode_cursor(last["sort_value"], last["sort_id"])
+    items = [dict(record["item"]) for record in records]
+    return items, next_cursor
+
+
+def get_sessions_page(
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: Sequence[str] | None = None,
+) -> Tuple[List[Dict[str, Any]], str | None]:
+    """Sessoes da mais recente para a mais antiga (keyset em updated_at, id)."""
+    query = f"""
+        MATCH (s:ChatSession)
+        WHERE $cursor_id IS NULL
+           OR s.updated_at < $cursor_value
+           OR (s.updated_at = $cursor_value AND s.id < $cursor_id)
+        RETURN s {_projection(SESSION_FIELDS, fields)} AS item,
+               s.updated_at AS sort_value, s.id AS sort_id
+        ORDER BY s.updated_at DESC, s.id DESC
+    """
+    return _run_page(query, limit, cursor)
+
+
+def get_inbox_items_page(
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: Sequence[str] | None = None,
+) -> Tuple[List[Dict[str, Any]], str | None]:
+    """Itens da caixa de entrada do mais recente ao mais antigo (keyset em created_at, id)."""
+    query = f"""
+        MATCH (i:InboxItem)
+        WHERE $cursor_id IS NULL
+           OR i.created_at < $cursor_value
+           OR (i.created_at = $cursor_value AND i.id < $cursor_id)
+        RETURN i {_projection(INBOX_FIELDS, fields)} AS item,
+               i.created_at AS sort_value, i.id AS sort_id
+        ORDER BY i.created_at DESC, i.id DESC
+    """
+    return _run_page(query, limit, cursor)
+
+
+def get_chat_messages_page(
+    session_id: str,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: Sequence[str] | None = None,
+) -> Tuple[List[Dict[str, Any]], str | None]:
+    """
+    Pagina as mensagens da sessao de tras para frente: a primeira pagina traz
+    as mais recentes e o cursor aponta para as anteriores. Cada pagina volta
+    em ordem cronologica.
+    """
+    if not cursor:
+        # Garante que mensagens desta sessao ainda no buffer write-behind aparecam.
+        message_writer.flush(session_id, timeout=PAGE_FLUSH_TIMEOUT)
+    query = f"""
+        MATCH (m:ChatMessage {{session_id: $session_id}})
+        WHERE m.timestamp IS NOT NULL
+          AND (
+                $cursor_id IS NULL
+             OR m.timestamp < datetime($cursor_value)
+             OR (m.timestamp = datetime($cursor_value) AND m.id < $cursor_id)
+          )
+        RETURN m {_projection(MESSAGE_FIELDS, fields)} AS item,
+               m.timestamp_iso AS sort_value, m.id AS sort_id
+        ORDER BY m.timestamp DESC, m.id DESC
+    """
+    items, next_cursor = _run_page(query, limit, cursor, session_id=session_id)
+    items.reverse()
+    return items, next_cursor
 
 
 def get_inbox_item_by_id(item_id: str) -> Optional[InboxItem]:
@@ -107,7 +259,7 @@ def add_chat_message(message: ChatMessage) -> ChatMessage:
     """Append a chat message into the ChromaDB collection linked to the session."""
     collection_name = f"chat_{message.session_id}"
     role_value = (message.role or "").lower() or "unknown"
-    timestamp_iso = datetime.now(timezone.utc).isoformat()
+    timestamp_iso = message.created_at
     collection = chroma_client.get_or_create_collection(
         name=collection_name,
         embedding_function=default_embedding_function,
@@ -115,63 +267,39 @@ def add_chat_message(message: ChatMessage) -> ChatMessage:
 
     collection.add(
         documents=[message.content],
-        metadatas=[{"role": role_value, "timestamp": message.id}],
+        metadatas=[
+            {
+                "role": role_value,
+                "timestamp": timestamp_iso,
+                "ts": _timestamp_to_epoch(timestamp_iso),
+            }
+        ],
         ids=[message.id],
     )
+    eviction_index.record(message.id, collection_name, _timestamp_to_epoch(timestamp_iso) or None)
+    history_cache.append(message)
+
+    # Gravacao no grafo e feita em lote, fora do caminho da requisicao.
+    message_writer.enqueue(
+        message_id=message.id,
+        session_id=message.session_id,
+        role=role_value,
+        content=message.content,
+        timestamp_iso=timestamp_iso,
+    )
 
-    try:
-        with neo4j_driver.session() as session:
-            session.run(
-                """
-                MERGE (chat_session:ChatSession {id: $session_id})
-                ON CREATE SET chat_session.title = $session_id,
-                              chat_session.created_at = $timestamp_iso,
-                              chat_session.updated_at = $timestamp_iso
-                SET chat_session.updated_at = $timestamp_iso
-                WITH chat_session
-                MERGE (creator:Entity {id: 'CREATOR'})
-                ON CREATE SET creator.name = 'Usuario'
-                MERGE (creator)-[:PARTICIPATES_IN]->(chat_session)
-                MERGE (msg:ChatMessage {id: $id})
-                SET msg.role = $role,
-                    msg.content = $content,
-                    msg.timestamp = datetime($timestamp_iso),
-                    msg.timestamp_iso = $timestamp_iso,
-                    msg.session_id = $session_id
-                MERGE (chat_session)-[:HAS_MESSAGE]->(msg)
-                """,
-                id=message.id,
-                session_id=message.session_id,
-                role=role_value,
-                content=message.content,
-                timestamp_iso=timestamp_iso,
-            )
+    return message
 
-            if role_value == "assistant":
-                session.run(
-                    """
-                    MATCH (chat_session:ChatSession {id: $session_id})-[:HAS_MESSAGE]->(reply:ChatMessage {id: $id})
-                    MATCH (chat_session)-[:HAS_MESSAGE]->(question:ChatMessage)
-                    WHERE question.role = 'user'
-                      AND question.timestamp IS NOT NULL
-                      AND reply.timestamp IS NOT NULL
-                      AND question.timestamp <= reply.timestamp
-                    WITH reply, question
-                    ORDER BY question.timestamp DESC
-                    LIMIT 1
-                    MERGE (reply)-[:RESPONSE_TO]->(question)
-                    """,
-                    session_id=message.session_id,
-                    id=message.id,
-                )
-    except Exception as error:  # noqa: BLE001
-        print(f"[Database] Aviso: nao foi possivel registrar mensagem no grafo. Detalhe: {error}")
 
-    return message
+def _timestamp_to_epoch(timestamp_iso: str) -> float:
+    try:
+        return datetime.fromisoformat(timestamp_iso).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
 
 
 def get_chat_messages(session_id: str) -> List[ChatMessage]:
-    """Retrieve all messages for a session from ChromaDB."""
+    """Retrieve all messages for a session from ChromaDB, oldest first."""
     collection_name = f"chat_{session_id}"
     try:
         collection = chroma_client.get_collection(
@@ -180,22 +308,113 @@ def get_chat_messages(session_id: str) -> List[ChatMessage]:
         )
         results = collection.get(include=["metadatas", "documents"])
 
-        messages: List[ChatMessage] = []
+        entries: List[Tuple[float, ChatMessage]] = []
         for index in range(len(results["ids"])):
-            messages.append(
+            metadata = results["metadatas"][index] or {}
+            timestamp_iso = str(metadata.get("timestamp") or "")
+            epoch = metadata.get("ts")
+            if epoch is None:
+                # Mensagens antigas guardavam o id no lugar do timestamp.
+                epoch = _timestamp_to_epoch(timestamp_iso)
+            message_fields = {
+                "id": results["ids"][index],
+                "session_id": session_id,
+                "content": results["documents"][index],
+                "role": metadata.get("role", "unknown"),
+            }
+            if epoch:
+                message_fields["created_at"] = timestamp_iso
+            entries.append((float(epoch or 0.0), ChatMessage(**message_fields)))
+
+        entries.sort(key=lambda entry: entry[0])
+        return [message for _, message in entries]
+    except Exception as error:
+        print(f"Warning: could not fetch chat {collection_name}. Error: {error}")
+        return []
+
+
+def _load_recent_messages(session_id: str, limit: int) -> List[ChatMessage]:
+    """Le apenas a janela mais recente da sessao no grafo (indice session_id/timestamp)."""
+    try:
+        with neo4j_driver.session() as session:
+            result = session.run(
+                """
+                MATCH (m:ChatMessage {session_id: $session_id})
+                WHERE m.timestamp IS NOT NULL
+                RETURN m.id AS id, m.role AS role, m.content AS content,
+                       m.timestamp_iso AS timestamp_iso
+                ORDER BY m.timestamp DESC
+                LIMIT $limit
+                """,
+                session_id=session_id,
+                limit=limit,
+            )
+            messages = [
                 ChatMessage(
-                    id=results["ids"][index],
+                    id=record["id"],
                     session_id=session_id,
-                    content=results["documents"][index],
-                    role=results["metadatas"][index]["role"],
+                    role=record["role"] or "unknown",
+                    content=record["content"] or "",
+                    created_at=record["timestamp_iso"],
                 )
-            )
-
-        messages.sort(key=lambda chat_msg: chat_msg.id)
+                for record in result
+            ]
+        messages.reverse()
         return messages
-    except Exception as error:
-        print(f"Warning: could not fetch chat {collection_name}. Error: {error}")
-        return []
+    except Exception as error:  # noqa: BLE001
+        print(f"[Database] Falha ao ler historico recente no grafo ({session_id}): {error}")
+        return get_chat_messages(session_id)[-limit:]
+
+
+history_cache = SessionHistoryCache(loader=_load_recent_messages)
+
+
+def get_recent_messages(session_id: str, n: int = 10) -> List[ChatMessage]:
+    """Retorna as ultimas `n` mensagens da sessao em ordem cronologica."""
+    return history_cache.get_recent(session_id, n)
+
+
+def ensure_indexes() -> None:
+    """Cria (se necessario) os indices usados no historico, na paginacao e no RAG."""
+    statements = [
+        "CREATE CONSTRAINT chat_message_id IF NOT EXISTS "
+        "FOR (m:ChatMessage) REQUIRE m.id IS UNIQUE",
+        "CREATE INDEX chat_message_session_timestamp IF NOT EXISTS "
+        "FOR (m:ChatMessage) ON (m.session_id, m.timestamp)",
+        "CREATE CONSTRAINT chat_session_id IF NOT EXISTS "
+        "FOR (s:ChatSession) REQUIRE s.id IS UNIQUE",
+        "CREATE INDEX chat_session_updated_at IF NOT EXISTS "
+        "FOR (s:ChatSession) ON (s.updated_at)",
+        "CREATE CONSTRAINT inbox_item_id IF NOT EXISTS "
+        "FOR (i:InboxItem) REQUIRE i.id IS UNIQUE",
+        "CREATE INDEX inbox_item_created_at IF NOT EXISTS "
+        "FOR (i:InboxItem) ON (i.created_at)",
+        "CREATE CONSTRAINT scheduler_lease_name IF NOT EXISTS "
+        "FOR (l:SchedulerLease) REQUIRE l.name IS UNIQUE",
+        # Buscas por id usadas no flush das ativacoes de memoria.
+        "CREATE INDEX conceito_id IF NOT EXISTS FOR (n:Conceito) ON (n.id)",
+        "CREATE INDEX entity_id IF NOT EXISTS FOR (n:Entity) ON (n.id)",
+        "CREATE INDEX consciousness_id IF NOT EXISTS FOR (n:Consciousness) ON (n.id)",
+        "CREATE INDEX fato_id IF NOT EXISTS FOR (n:Fato) ON (n.id)",
+        "CREATE INDEX ideia_id IF NOT EXISTS FOR (n:Ideia) ON (n.id)",
+        "CREATE INDEX objetivo_id IF NOT EXISTS FOR (n:Objetivo) ON (n.id)",
+        "CREATE INDEX acao_id IF NOT EXISTS FOR (n:Acao) ON (n.id)",
+        "CREATE INDEX recurso_id IF NOT EXISTS FOR (n:Recurso) ON (n.id)",
+        "CREATE INDEX dev_project_id IF NOT EXISTS FOR (n:DevProject) ON (n.id)",
+        # Marcos derivados do decaimento analitico, lidos pela consolidacao.
+        "CREATE INDEX conceito_poda_em IF NOT EXISTS FOR (n:Conceito) ON (n.poda_em)",
+        "CREATE INDEX conceito_promocao_ate IF NOT EXISTS FOR (n:Conceito) ON (n.promocao_ate)",
+        # Indice full-text (BM25/Lucene) usado pela perna de palavra-chave do RAG.
+        "CREATE FULLTEXT INDEX memoria_fulltext IF NOT EXISTS "
+        "FOR (n:Conceito|Entity|Consciousness|Ideia|Objetivo|Acao|Recurso|DevProject) "
+        "ON EACH [n.name, n.title, n.description]",
+    ]
+    with neo4j_driver.session() as session:
+        for statement in statements:
+            try:
+                session.run(statement).consume()
+            except Exception as error:  # noqa: BLE001
+                print(f"[Database] Aviso: nao foi possivel criar indice ({statement}): {error}")
 
 
 def create_log(log: SystemLog):
@@ -266,7 +485,7 @@ def save_knowledge_triples(triples: List[Dict[str, str]]):
 
             timestamp = datetime.now(timezone.utc).isoformat()
             try:
-                session.run(
+                record = session.run(
                     f"""
                     MERGE (source:Conceito {{name: $source_name}})
                       ON CREATE SET
@@ -274,15 +493,20 @@ def save_knowledge_triples(triples: List[Dict[str, str]]):
                         source.status_memoria = $default_status,
                         source.confianca_intrinseca = $default_confidence,
                         source.forca_sinaptica = $default_strength,
+                        source.forca_atualizada_em = datetime($timestamp),
                         source.ultima_ativacao = datetime($timestamp),
                         source.criado_em = datetime($timestamp)
                     SET
                         source.status_memoria = coalesce(source.status_memoria, $default_status),
                         source.confianca_intrinseca = coalesce(source.confianca_intrinseca, $default_confidence),
                         source.forca_sinaptica = coalesce(source.forca_sinaptica, $default_strength),
+                        source.forca_atualizada_em = coalesce(
+                            source.forca_atualizada_em, source.ultima_ativacao, datetime($timestamp)
+                        ),
                         source.id = coalesce(source.id, randomUUID()),
                         source.ultima_ativacao = datetime($timestamp),
                         source.atualizado_em = datetime($timestamp)
+                    SET {SOURCE_DECAY_SCHEDULE}
 
                     MERGE (target:Conceito {{name: $target_name}})
                       ON CREATE SET
@@ -290,15 +514,20 @@ def save_knowledge_triples(triples: List[Dict[str, str]]):
                         target.status_memoria = $default_status,
                         target.confianca_intrinseca = $default_confidence,
                         target.forca_sinaptica = $default_strength,
+                        target.forca_atualizada_em = datetime($timestamp),
                         target.ultima_ativacao = datetime($timestamp),
                         target.criado_em = datetime($timestamp)
                     SET
                         target.status_memoria = coalesce(target.status_memoria, $default_status),
                         target.confianca_intrinseca = coalesce(target.confianca_intrinseca, $default_confidence),
                         target.forca_sinaptica = coalesce(target.forca_sinaptica, $default_strength),
+                        target.forca_atualizada_em = coalesce(
+                            target.forca_atualizada_em, target.ultima_ativacao, datetime($timestamp)
+                        ),
                         target.id = coalesce(target.id, randomUUID()),
                         target.ultima_ativacao = datetime($timestamp),
                         target.atualizado_em = datetime($timestamp)
+                    SET {TARGET_DECAY_SCHEDULE}
 
                     MERGE (source)-[rel:{rel}]->(target)
                       ON CREATE SET
@@ -309,6 +538,13 @@ def save_knowledge_triples(triples: List[Dict[str, str]]):
                         rel.confianca_intrinseca = coalesce(rel.confianca_intrinseca, $default_confidence),
                         rel.relevancia_contextual = coalesce(rel.relevancia_contextual, $default_rel_relevance),
                         rel.atualizado_em = datetime($timestamp)
+                    RETURN source.id AS source_id, target.id AS target_id,
+                           source {{.id, .name, .title, .description, .status_memoria,
+                                    .confianca_intrinseca, .fonte_url, .url}} AS source_props,
+                           target {{.id, .name, .title, .description, .status_memoria,
+                                    .confianca_intrinseca, .fonte_url, .url}} AS target_props,
+                           rel.confianca_intrinseca AS rel_confidence,
+                           rel.relevancia_contextual AS rel_relevance
                     """,
                     source_name=source,
                     target_name=target,
@@ -317,9 +553,20 @@ def save_knowledge_triples(triples: List[Dict[str, str]]):
                     default_strength=DEFAULT_SYNAPTIC_STRENGTH,
                     default_rel_relevance=DEFAULT_REL_CONTEXTUAL_RELEVANCE,
                     timestamp=timestamp,
-                )
+                ).single()
+                if record:
+                    projection.add_triple(
+                        record["source_id"],
+                        dict(record["source_props"]),
+                        rel,
+                        record["target_id"],
+                        dict(record["target_props"]),
+                        record["rel_confidence"],
+                        record["rel_relevance"],
+                    )
             except Exception as error:
                 print(f"[Database] Erro ao salvar tripla {source}-[:{rel}]->{target}: {error}")
+    NexusGraph.invalidate_cache()
 
 
 def save_meta_knowledge(entries: List[Dict[str, str]]):
@@ -345,27 +592,45 @@ def save_meta_knowledge(entries: List[Dict[str, str]]):
             )
 
 
-def save_meta_prompt(task_type: str, optimized_prompt: str) -> None:
+def save_meta_prompt(task_type: str, optimized_prompt: str, status: str = "active") -> int | None:
     """
-    Persiste um prompt otimizado associado a um tipo de tarefa.
+    Persiste uma nova versao do prompt associado a um tipo de tarefa.
+    Com status "active" as versoes ativas anteriores sao aposentadas;
+    "candidate" deixa a versao em teste A/B. Retorna o numero da versao.
     """
     if not task_type or not optimized_prompt:
-        return
+        return None
 
     timestamp = datetime.now(timezone.utc).isoformat()
     with neo4j_driver.session() as session:
-        session.run(
+        record = session.run(
             """
             MERGE (t:Task_Type {name: $task_type})
-            MERGE (p:Meta_Prompt {task_type: $task_type})
+            WITH t
+            OPTIONAL MATCH (t)-[:USA_META_PROMPT]->(old:Meta_Prompt)
+            WITH t, collect(old) AS olds
+            // Prompts anteriores ao versionamento viram a versao 1.
+            FOREACH (legacy IN [n IN olds WHERE n.version IS NULL] |
+                SET legacy.version = 1, legacy.status = coalesce(legacy.status, 'active'))
+            FOREACH (previous IN [n IN olds WHERE $status = 'active' AND n.status = 'active'] |
+                SET previous.status = 'retired')
+            WITH t, reduce(latest = 0, n IN olds |
+                CASE WHEN n.version > latest THEN n.version ELSE latest END) AS latest
+            CREATE (p:Meta_Prompt {task_type: $task_type, version: latest + 1})
             SET p.prompt = $prompt,
+                p.status = $status,
+                p.uses = 0,
+                p.failures = 0,
                 p.updated_at = datetime($timestamp)
             MERGE (t)-[:USA_META_PROMPT]->(p)
+            RETURN p.version AS version
             """,
             task_type=task_type,
             prompt=optimized_prompt,
+            status=status,
             timestamp=timestamp,
-        )
+        ).single()
+    return record["version"] if record else None
 
 
 def get_meta_prompt(task_type: str) -> str | None:
@@ -376,8 +641,9 @@ def get_meta_prompt(task_type: str) -> str | None:
         record = session.run(
             """
             MATCH (t:Task_Type {name: $task_type})-[:USA_META_PROMPT]->(p:Meta_Prompt)
+            WHERE coalesce(p.status, 'active') = 'active'
             RETURN p.prompt AS prompt
-            ORDER BY p.updated_at DESC
+            ORDER BY coalesce(p.version, 1) DESC, p.updated_at DESC
             LIMIT 1
             """,
             task_type=task_type,
@@ -387,6 +653,67 @@ def get_meta_prompt(task_type: str) -> str | None:
     return None
 
 
+def get_meta_prompt_versions(task_type: str) -> List[Dict[str, Any]]:
+    """Versoes ativas e candidatas do prompt, com as metricas acumuladas."""
+    if not task_type:
+        return []
+
+    with neo4j_driver.session() as session:
+        result = session.run(
+            """
+            MATCH (t:Task_Type {name: $task_type})-[:USA_META_PROMPT]->(p:Meta_Prompt)
+            WITH p, coalesce(p.status, 'active') AS status
+            WHERE status IN ['active', 'candidate']
+            RETURN coalesce(p.version, 1) AS version,
+                   p.prompt AS prompt,
+                   status,
+                   coalesce(p.uses, 0) AS uses,
+                   coalesce(p.failures, 0) AS failures
+            ORDER BY version DESC
+            """,
+            task_type=task_type,
+        )
+        return [record.data() for record in result]
+
+
+def record_meta_prompt_usage(task_type: str, counters: List[Dict[str, int]]) -> None:
+    """Soma usos e falhas ({version, uses, failures}) as versoes do prompt."""
+    if not task_type or not counters:
+        return
+
+    with neo4j_driver.session() as session:
+        session.run(
+            """
+            UNWIND $counters AS row
+            MATCH (t:Task_Type {name: $task_type})-[:USA_META_PROMPT]->(p:Meta_Prompt)
+            WHERE coalesce(p.version, 1) = row.version
+            SET p.uses = coalesce(p.uses, 0) + row.uses,
+                p.failures = coalesce(p.failures, 0) + row.failures
+            """,
+            task_type=task_type,
+            counters=counters,
+        ).consume()
+
+
+def set_meta_prompt_status(task_type: str, version: int, status: str) -> None:
+    """Muda o status de uma versao; promover a "active" aposenta a ativa atual."""
+    timestamp = datetime.now(timezone.utc).isoformat()
+    with neo4j_driver.session() as session:
+        session.run(
+            """
+            MATCH (t:Task_Type {name: $task_type})-[:USA_META_PROMPT]->(p:Meta_Prompt)
+            WITH p, coalesce(p.version, 1) = $version AS target
+            WHERE target OR ($status = 'active' AND coalesce(p.status, 'active') = 'active')
+            SET p.status = CASE WHEN target THEN $status ELSE 'retired' END,
+                p.updated_at = CASE WHEN target THEN datetime($timestamp) ELSE p.updated_at END
+            """,
+            task_type=task_type,
+            version=version,
+            status=status,
+            timestamp=timestamp,
+        ).consume()
+
+
 def save_blueprint_path(path: str) -> None:
     """
     Armazena o caminho do script de restauração cognitiva.
@@ -432,28 +759,11 @@ def get_least_activated_documents(limit: int) -> List[str]:
 def register_memory_activation(node_id: str, boost: float) -> None:
     """
     Ajusta a confianca intrinseca de um nodo de fato no Neo4j.
+    O ajuste e acumulado no activation_buffer e gravado em lote.
     """
     if not node_id or boost is None:
         return
-
-    timestamp = datetime.now(timezone.utc).isoformat()
-    with neo4j_driver.session() as session:
-        session.run(
-            """
-            MATCH (n {id: $node_id})
-            WITH n, coalesce(n.confianca_intrinseca, $default_confidence) AS current_conf
-            SET n.confianca_intrinseca = CASE
-                    WHEN current_conf + $boost > 1.0 THEN 1.0
-                    WHEN current_conf + $boost < 0.0 THEN 0.0
-                    ELSE current_conf + $boost
-                END,
-                n.ultima_ativacao = datetime($timestamp)
-            """,
-            node_id=node_id,
-            boost=float(boost),
-            timestamp=timestamp,
-            default_confidence=DEFAULT_INTRINSIC_CONFIDENCE,
-        )
+    activation_buffer.add(node_id, boost)
 
 
 def register_cognitive_dissonance(node_id: str, dissonance_text: str) -> None:
@@ -482,11 +792,17 @@ def register_cognitive_dissonance(node_id: str, dissonance_text: str) -> None:
             timestamp=timestamp,
             description=dissonance_text,
         )
+    NexusGraph.invalidate_cache()
 
 
-def save_context_summary(session_id: str, summary_text: str) -> None:
+def save_context_summary(
+    session_id: str,
+    summary_text: str,
+    covered_until: Optional[str] = None,
+) -> None:
     """
     Persiste um resumo contextual ligado a uma sessao de chat.
+    `covered_until` e o timestamp ISO da ultima mensagem incluida no resumo.
     """
     if not session_id or not summary_text:
         return
@@ -500,45 +816,139 @@ def save_context_summary(session_id: str, summary_text: str) -> None:
             MATCH (s:ChatSession {id: $session_id})
             MERGE (r:Resumo_Contextual {id: $summary_id})
             SET r.summary = $summary,
-                r.timestamp = datetime($timestamp)
+                r.timestamp = datetime($timestamp),
+                r.covered_until = $covered_until
             MERGE (s)-[:TEM_RESUMO]->(r)
             """,
             session_id=session_id,
             summary_id=summary_id,
             summary=summary_text,
             timestamp=timestamp,
+            covered_until=covered_until,
         )
+    _remember_summary(
+        session_id,
+        {"summary": summary_text, "covered_until": covered_until},
+    )
+
+
+_summary_cache: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
+_summary_lock = threading.Lock()
+SUMMARY_CACHE_SIZE = 256
+
+
+def _remember_summary(session_id: str, summary: Optional[Dict[str, Any]]) -> None:
+    with _summary_lock:
+        _summary_cache[session_id] = summary
+        _summary_cache.move_to_end(session_id)
+        while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+
+
+def get_session_summary(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna o resumo contextual mais recente da sessao ({summary, covered_until})
+    ou None. Mantido em memoria para nao custar uma consulta por turno.
+    """
+    if not session_id:
+        return None
+    with _summary_lock:
+        if session_id in _summary_cache:
+            _summary_cache.move_to_end(session_id)
+            return _summary_cache[session_id]
+
+    summary: Optional[Dict[str, Any]] = None
+    try:
+        with neo4j_driver.session() as session:
+            record = session.run(
+                """
+                MATCH (:ChatSession {id: $session_id})-[:TEM_RESUMO]->(r:Resumo_Contextual)
+                RETURN r.summary AS summary, r.covered_until AS covered_until
+                ORDER BY r.timestamp DESC
+                LIMIT 1
+                """,
+                session_id=session_id,
+            ).single()
+        if record and record["summary"]:
+            summary = {"summary": record["summary"], "covered_until": record["covered_until"]}
+    except Exception as error:  # noqa: BLE001
+        print(f"[Database] Falha ao ler resumo da sessao {session_id}: {error}")
+        return None
+    _remember_summary(session_id, summary)
+    return summary
+
+
+def get_messages_since(
+    session_id: str,
+    since_iso: Optional[str],
+    limit: int,
+) -> List[ChatMessage]:
+    """
+    Mensagens da sessao posteriores a `since_iso` (ou desde o inicio), em
+    ordem cronologica, ate `limit`. Usado pelo resumo incremental.
+    """
+    message_writer.flush(session_id)
+    with neo4j_driver.session() as session:
+        result = session.run(
+            """
+            MATCH (m:ChatMessage {session_id: $session_id})
+            WHERE m.timestamp IS NOT NULL
+              AND ($since IS NULL OR m.timestamp > datetime($since))
+            RETURN m.id AS id, m.role AS role, m.content AS content,
+                   m.timestamp_iso AS timestamp_iso
+            ORDER BY m.timestamp ASC
+            LIMIT $limit
+            """,
+            session_id=session_id,
+            since=since_iso,
+            limit=limit,
+        )
+        return [
+            ChatMessage(
+                id=record["id"],
+                session_id=session_id,
+                role=record["role"] or "unknown",
+                content=record["content"] or "",
+                created_at=record["timestamp_iso"],
+            )
+            for record in result
+        ]
 
 
 def delete_chroma_documents(document_ids: List[str]) -> None:
     """
-    Remove documentos do ChromaDB independente da coleção.
+    Remove documentos do ChromaDB. A colecao de cada id vem do indice de
+    despejo; so ids desconhecidos sao procurados em todas as colecoes.
     """
     if not document_ids:
         return
 
-    try:
-        collections = chroma_client.list_collections()
-    except Exception as error:
-        print(f"[Chroma] Falha ao listar coleções: {error}")
-        return
+    grouped = eviction_index.locate(document_ids)
+    unknown = grouped.pop("", [])
+    removed = remove_documents(grouped, archive=False)
+    removed_from: List[str] = sorted(grouped)
 
-    removed_from: List[str] = []
-    for info in collections:
+    if unknown:
         try:
-            try:
-                collection = chroma_client.get_collection(name=info.name)
-            except TypeError:
-                collection = chroma_client.get_collection(
-                    name=info.name,
-                    embedding_function=default_embedding_function,
-                )
-            collection.delete(ids=document_ids)
-            removed_from.append(info.name)
+            collections = chroma_client.list_collections()
         except Exception as error:
-            print(f"[Chroma] Aviso ao remover documentos da coleção '{info.name}': {error}")
+            print(f"[Chroma] Falha ao listar coleções: {error}")
+            collections = []
+        for info in collections:
+            try:
+                try:
+                    collection = chroma_client.get_collection(name=info.name)
+                except TypeError:
+                    collection = chroma_client.get_collection(
+                        name=info.name,
+                        embedding_function=default_embedding_function,
+                    )
+                collection.delete(ids=unknown)
+                removed_from.append(info.name)
+            except Exception as error:
+                print(f"[Chroma] Aviso ao remover documentos da coleção '{info.name}': {error}")
 
-    if removed_from:
+    if removed or unknown:
         _log_audit_event(
             "Chroma cleanup",
             f"Documentos removidos: {document_ids} das coleções {removed_from}",
@@ -588,6 +998,7 @@ def save_idea_entities(idea_content: str, entities: Dict[str, str]) -> None:
     with neo4j_driver.session() as session:
         session.execute_write(lambda tx: tx.run(query, **params))
 
+    NexusGraph.invalidate_cache()
     _log_audit_event(
         "Ideia registrada",
         f"Ideia '{idea_id}' armazenada com próxima ação '{next_action_text}'.",
@@ -672,6 +1083,55 @@ def _is_critical_context(context_of_use: str | None) -> bool:
 class NexusGraph:
     MAX_PATH_LENGTH = 4
     MCP_PENALTY = 5.0
+    # Poda da busca: custo maximo acumulado, arestas lidas por no e nos expandidos.
+    MAX_PATH_WEIGHT = 40.0
+    MAX_FANOUT = 50
+    MAX_EXPANDED = 2000
+    EXPANSION_BATCH = 32
+    # Menor peso possivel de uma aresta (confianca * relevancia = 1.0).
+    MIN_EDGE_WEIGHT = 1.0
+    CACHE_SIZE = 256
+    CACHE_TTL = 300.0
+
+    _cache: "OrderedDict[Tuple[str, bool, int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+    _cache_lock = threading.Lock()
+    _generation = 0
+
+    @classmethod
+    def invalidate_cache(cls) -> None:
+        """Descarta as buscas em cache; chamado pelos caminhos que escrevem no grafo."""
+        with cls._cache_lock:
+            cls._generation += 1
+            cls._cache.clear()
+
+    @classmethod
+    def _cache_get(cls, key: Tuple[str, bool, int]) -> List[Dict[str, Any]] | None:
+        with cls._cache_lock:
+            entry = cls._cache.get(key)
+            if entry is None:
+                return None
+            stored_at, documents = entry
+            if time.monotonic() - stored_at > cls.CACHE_TTL:
+                cls._cache.pop(key, None)
+                return None
+            cls._cache.move_to_end(key)
+            return [dict(document) for document in documents]
+
+    @classmethod
+    def _cache_put(
+        cls,
+        key: Tuple[str, bool, int],
+        documents: List[Dict[str, Any]],
+        generation: int,
+    ) -> None:
+        with cls._cache_lock:
+            # Houve escrita no grafo durante a busca: resultado pode estar velho.
+            if generation != cls._generation:
+                return
+            cls._cache[key] = (time.monotonic(), [dict(document) for document in documents])
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
 
     @staticmethod
     def quantum_search(
@@ -688,106 +1148,36 @@ class NexusGraph:
         if not term:
             return []
 
-        cypher = """
-        MATCH (origin:Consciousness {id: 'SELF'})
-        CALL {
-            WITH origin
-            MATCH path = (origin)-[rels*1..$max_depth]->(target)
-            WHERE
-                (
-                    toLower(coalesce(target.name, '')) CONTAINS $term OR
-                    toLower(coalesce(target.title, '')) CONTAINS $term OR
-                    toLower(coalesce(target.description, '')) CONTAINS $term
-                )
-                AND ($critical = false OR ALL(node IN nodes(path) WHERE coalesce(node.status_memoria, '') <> 'MCP'))
-            WITH DISTINCT path, rels, target,
-                 reduce(total = 0.0, r IN rels | total + CASE
-                     WHEN coalesce(r.confianca_intrinseca, 0.0) <= 0 OR coalesce(r.relevancia_contextual, 0.0) <= 0
-                         THEN 10.0
-                     ELSE 1.0 / (r.confianca_intrinseca * r.relevancia_contextual)
-                 END
-            ) AS path_weight
-            RETURN target, rels, nodes(path) AS node_list, path_weight,
-                   elementId(target) AS target_element_id,
-                   [node IN nodes(path) | elementId(node)] AS node_element_ids
-            ORDER BY path_weight ASC
-            LIMIT $limit
-        }
-        RETURN target, rels, node_list, node_element_ids, path_weight, target_element_id
-        """
+        cache_key = (term, critical, limit)
+        cached = NexusGraph._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        generation = NexusGraph._generation
 
-        documents: List[Dict[str, Any]] = []
-        with neo4j_driver.session() as session:
-            records = session.run(
-                cypher,
-                term=term,
-                limit=limit,
-                max_depth=NexusGraph.MAX_PATH_LENGTH,
-                critical=critical,
-            )
-            for record in records:
-                target = record.get("target")
-                rels = record.get("rels", [])
-                node_list = record.get("node_list", [])
-                node_element_ids = record.get("node_element_ids", [])
-                path_weight = float(record.get("path_weight", 0.0))
-                target_element_id = record.get("target_element_id")
-
-                # Penaliza caminhos MCP quando nao critico
-                if not critical:
-                    if any(_get_attr(node, "status_memoria") == "MCP" for node in node_list):
-                        path_weight += NexusGraph.MCP_PENALTY
-
-                intrinsic_values: List[float] = []
-                for rel in rels:
-                    intrinsic_values.append(
-                        _normalize_confidence(_get_attr(rel, "confianca_intrinseca"))
-                    )
-                target_conf = _normalize_confidence(_get_attr(target, "confianca_intrinseca"))
-                if target_conf > 0:
-                    intrinsic_values.append(target_conf)
-                intrinsic_confidence = (
-                    sum(intrinsic_values) / len(intrinsic_values) if intrinsic_values else 0.0
-                )
-
-                target_id = _get_attr(target, "id") or target_element_id
-
-                document = {
-                    "id": target_id,
-                    "title": _get_attr(target, "name")
-                    or _get_attr(target, "title")
-                    or target_id
-                    or "Conceito",
-                    "content": _format_path(node_list, rels),
-                    "url": _get_attr(target, "fonte_url") or _get_attr(target, "url") or "",
-                    "confianca_intrinseca": intrinsic_confidence,
-                    "status_memoria": _get_attr(target, "status_memoria"),
-                    "path_weight": path_weight,
-                    "context_nodes": [
-                        {
-                            "id": _get_attr(node, "id")
-                            or (node_element_ids[index] if index < len(node_element_ids) else None),
-                            "name": _get_attr(node, "name") or _get_attr(node, "title"),
-                            "status_memoria": _get_attr(node, "status_memoria"),
-                        }
-                        for index, node in enumerate(node_list)
-                    ],
-                }
-                documents.append(document)
+        # Termos sem acento; node_matches (mesma regra na projecao e aqui)
+        # compara contra o texto do no normalizado do mesmo jeito.
+        terms = extract_terms(term) or [fold_accents(term)]
+        if projection.ready:
+            documents = NexusGraph._projection_search(terms, critical, limit)
+        else:
+            documents = NexusGraph._best_first_search(terms, critical, limit)
 
         if not documents:
             # Fallback simples: retorna conceitos diretamente associados ao termo.
             fallback_cypher = """
             MATCH (concept:Conceito)
-            WHERE toLower(coalesce(concept.name, '')) CONTAINS $term
-                OR toLower(coalesce(concept.title, '')) CONTAINS $term
+            WHERE ANY(term IN $terms WHERE
+                toLower(coalesce(concept.name, '')) CONTAINS term
+                OR toLower(coalesce(concept.title, '')) CONTAINS term)
             RETURN concept, elementId(concept) AS concept_element_id
             LIMIT $limit
             """
             with neo4j_driver.session() as session:
+                # O Cypher nao remove acentos: compara com as duas grafias.
+                accented = extract_terms(term, keep_accents=True) or [term]
                 fallback_records = session.run(
                     fallback_cypher,
-                    term=term,
+                    terms=list(dict.fromkeys([*terms, *accented])),
                     limit=limit,
                 )
                 for record in fallback_records:
@@ -810,7 +1200,247 @@ class NexusGraph:
                     )
 
         documents.sort(key=lambda doc: doc.get("path_weight", 0.0))
-        return documents[:limit]
+        documents = documents[:limit]
+        NexusGraph._cache_put(cache_key, documents, generation)
+        return [dict(document) for document in documents]
+
+    @staticmethod
+    def _projection_search(
+        terms: Sequence[str],
+        critical: bool,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Mesma busca de _best_first_search, respondida pela projecao em memoria."""
+        paths = projection.search(
+            "SELF",
+            terms,
+            critical=critical,
+            limit=limit,
+            max_depth=NexusGraph.MAX_PATH_LENGTH,
+            mcp_penalty=NexusGraph.MCP_PENALTY,
+            max_weight=NexusGraph.MAX_PATH_WEIGHT,
+        )
+        documents = []
+        for path in paths:
+            props = {key: projection.node_props(key) for key in path["path_nodes"]}
+            documents.append(
+                _path_document(
+                    path["target"],
+                    path["path_weight"],
+                    path["path_nodes"],
+                    path["path_rels"],
+                    props,
+                )
+            )
+        return documents
+
+    @staticmethod
+    def k_best_paths(
+        source_id: str,
+        target_id: str,
+        k: int = 3,
+        context_of_use: str | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Os k caminhos de menor peso entre dois nos (por `id`). Exige a
+        projecao em memoria; sem ela retorna lista vazia.
+        """
+        if not projection.ready:
+            return []
+        paths = projection.k_best_paths(
+            source_id,
+            target_id,
+            k=k,
+            critical=_is_critical_context(context_of_use),
+            mcp_penalty=NexusGraph.MCP_PENALTY,
+        )
+        documents = []
+        for path in paths:
+            props = {key: projection.node_props(key) for key in path["path_nodes"]}
+            documents.append(
+                _path_document(
+                    path["target"],
+                    path["path_weight"],
+                    path["path_nodes"],
+                    path["path_rels"],
+                    props,
+                )
+            )
+        return documents
+
+    @staticmethod
+    def _best_first_search(
+        terms: Sequence[str],
+        critical: bool,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Dijkstra limitado a partir de SELF, com peso 1/(confianca * relevancia)
+        por aresta e penalidade MCP (uma vez por caminho) fora de contextos
+        criticos. Os vizinhos sao lidos em lote, uma consulta por rodada, para
+        todos os nos cujo custo esta a menos de MIN_EDGE_WEIGHT do menor custo
+        da fronteira; como nenhuma aresta custa menos que isso, expandi-los
+        juntos nao altera o resultado. Para assim que `limit` alvos forem
+        assentados ou a fronteira exceder MAX_PATH_WEIGHT/MAX_PATH_LENGTH.
+        """
+        with neo4j_driver.session() as session:
+            origin = session.run(
+                """
+                MATCH (origin:Consciousness {id: 'SELF'})
+                RETURN elementId(origin) AS element_id,
+                       origin {.id, .name, .title, .description, .status_memoria,
+                               .confianca_intrinseca, .fonte_url, .url} AS props
+                """
+            ).single()
+            if origin is None:
+                return []
+
+            props: Dict[str, Dict[str, Any]] = {origin["element_id"]: dict(origin["props"])}
+            adjacency: Dict[str, List[Dict[str, Any]]] = {}
+            origin_mcp = props[origin["element_id"]].get("status_memoria") == "MCP"
+            if critical and origin_mcp:
+                return []
+
+            counter = itertools.count()
+            start_cost = NexusGraph.MCP_PENALTY if origin_mcp and not critical else 0.0
+            # (custo, desempate, no, caminho_tem_mcp, nos_do_caminho, arestas_do_caminho)
+            heap: List[Tuple[float, int, str, bool, Tuple[str, ...], Tuple[Dict[str, Any], ...]]] = [
+                (start_cost, next(counter), origin["element_id"], origin_mcp, (origin["element_id"],), ())
+            ]
+            best: Dict[Tuple[str, bool], float] = {(origin["element_id"], origin_mcp): start_cost}
+            matched: set = set()
+            documents: List[Dict[str, Any]] = []
+            expanded = 0
+
+            while heap and len(documents) < limit and expanded < NexusGraph.MAX_EXPANDED:
+                batch = []
+                band = heap[0][0] + NexusGraph.MIN_EDGE_WEIGHT
+                while heap and heap[0][0] < band and len(batch) < NexusGraph.EXPANSION_BATCH:
+                    entry = heapq.heappop(heap)
+                    cost, _, element_id, has_mcp, path_nodes, path_rels = entry
+                    if best.get((element_id, has_mcp), float("inf")) < cost:
+                        continue
+                    if path_rels and element_id not in matched and node_matches(props[element_id], terms):
+                        matched.add(element_id)
+                        documents.append(
+                            _path_document(element_id, cost, path_nodes, path_rels, props)
+                        )
+                        if len(documents) >= limit:
+                            break
+                    if len(path_rels) < NexusGraph.MAX_PATH_LENGTH:
+                        batch.append(entry)
+                if len(documents) >= limit or not batch:
+                    continue
+
+                missing = list({entry[2] for entry in batch if entry[2] not in adjacency})
+                if missing:
+                    for source_id in missing:
+                        adjacency[source_id] = []
+                    for record in session.run(
+                        """
+                        UNWIND $element_ids AS source_id
+                        MATCH (source) WHERE elementId(source) = source_id
+                        CALL {
+                            WITH source
+                            MATCH (source)-[rel]->(target)
+                            WITH rel, target,
+                                 coalesce(rel.confianca_intrinseca, 0.0) * coalesce(rel.relevancia_contextual, 0.0) AS strength
+                            RETURN rel, target
+                            ORDER BY strength DESC
+                            LIMIT $fanout
+                        }
+                        RETURN source_id, elementId(target) AS target_id, type(rel) AS rel_type,
+                               rel {.confianca_intrinseca, .relevancia_contextual} AS rel_props,
+                               target {.id, .name, .title, .description, .status_memoria,
+                                       .confianca_intrinseca, .fonte_url, .url} AS target_props
+                        """,
+                        element_ids=missing,
+                        fanout=NexusGraph.MAX_FANOUT,
+                    ):
+                        props.setdefault(record["target_id"], dict(record["target_props"]))
+                        rel_props = dict(record["rel_props"])
+                        adjacency[record["source_id"]].append(
+                            {
+                                "target": record["target_id"],
+                                "weight": _relationship_weight(rel_props),
+                                "rel": {"type": record["rel_type"], **rel_props},
+                            }
+                        )
+
+                for cost, _, element_id, has_mcp, path_nodes, path_rels in batch:
+                    expanded += 1
+                    for edge in adjacency.get(element_id, []):
+                        target_id = edge["target"]
+                        if target_id in path_nodes:
+                            continue
+                        target_mcp = props[target_id].get("status_memoria") == "MCP"
+                        if critical and target_mcp:
+                            continue
+                        new_cost = cost + edge["weight"]
+                        if target_mcp and not has_mcp:
+                            new_cost += NexusGraph.MCP_PENALTY
+                        if new_cost > NexusGraph.MAX_PATH_WEIGHT:
+                            continue
+                        state = (target_id, has_mcp or target_mcp)
+                        if new_cost >= best.get(state, float("inf")):
+                            continue
+                        best[state] = new_cost
+                        heapq.heappush(
+                            heap,
+                            (
+                                new_cost,
+                                next(counter),
+                                target_id,
+                                state[1],
+                                path_nodes + (target_id,),
+                                path_rels + (edge["rel"],),
+                            ),
+                        )
+
+        return documents
+
+
+def _path_document(
+    element_id: str,
+    path_weight: float,
+    path_nodes: Sequence[str],
+    path_rels: Sequence[Dict[str, Any]],
+    props: Dict[str, Dict[str, Any]],
+) -> Dict[str, Any]:
+    target = props[element_id]
+    node_list = [props[node_id] for node_id in path_nodes]
+
+    intrinsic_values: List[float] = [
+        _normalize_confidence(_get_attr(rel, "confianca_intrinseca")) for rel in path_rels
+    ]
+    target_conf = _normalize_confidence(_get_attr(target, "confianca_intrinseca"))
+    if target_conf > 0:
+        intrinsic_values.append(target_conf)
+    intrinsic_confidence = (
+        sum(intrinsic_values) / len(intrinsic_values) if intrinsic_values else 0.0
+    )
+
+    target_id = _get_attr(target, "id") or element_id
+    return {
+        "id": target_id,
+        "title": _get_attr(target, "name")
+        or _get_attr(target, "title")
+        or target_id
+        or "Conceito",
+        "content": _format_path(node_list, path_rels),
+        "url": _get_attr(target, "fonte_url") or _get_attr(target, "url") or "",
+        "confianca_intrinseca": intrinsic_confidence,
+        "status_memoria": _get_attr(target, "status_memoria"),
+        "path_weight": path_weight,
+        "context_nodes": [
+            {
+                "id": _get_attr(node, "id") or node_id,
+                "name": _get_attr(node, "name") or _get_attr(node, "title"),
+                "status_memoria": _get_attr(node, "status_memoria"),
+            }
+            for node_id, node in zip(path_nodes, node_list)
+        ],
+    }
 
 
 def save_settings(settings: SystemSettings):
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import importlib.util
 import json
 import os
-from typing import Any, Dict, Tuple, Type
+import threading
+from importlib.metadata import entry_points
+from types import ModuleType
+from typing import Any, Dict, List, Tuple, Type
 
 import requests
+from requests.adapters import HTTPAdapter
 from duckduckgo_search import DDGS
 from pydantic import ValidationError, create_model
 from tavily import TavilyClient
@@ -12,6 +17,28 @@ from tavily import TavilyClient
 import usage_tracker
 
 AVAILABLE_TOOLS: Dict[str, Dict[str, Any]] = {}
+# Incrementada a cada mudanca no registro; invalida os textos de prompt em cache.
+REGISTRY_VERSION = 0
+_prompt_cache: Dict[str, Any] = {"version": -1, "descriptions": {}, "prompt": ""}
+# Plugins: modulos .py do diretorio e entry points do grupo abaixo. Cada um
+# expoe register_tools(register_tool) ou registra suas ferramentas ao importar.
+PLUGIN_DIR = os.getenv(
+    "NEXUS_TOOL_PLUGIN_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugins"),
+)
+PLUGIN_ENTRY_POINT_GROUP = "nexus.tools"
+LOADED_PLUGINS: Dict[str, str] = {}  # Nome do plugin -> origem
+HTTP_POOL_SIZE = 10
+HTTP_TIMEOUT = 10  # Segundos
+
+# Clientes reaproveitados entre chamadas (conexoes mantidas abertas no pool).
+_http_session = requests.Session()
+_http_session.mount(
+    "https://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+)
+_client_lock = threading.Lock()
+_tavily_client: TavilyClient | None = None
+_ddgs_local = threading.local()
 
 TYPE_MAPPING: Dict[str, Type[Any]] = {
     "str": str,
@@ -28,7 +55,13 @@ def register_tool(
     required_env_var: str | None = None,
     limit_key: str | None = None,
     parameters: Dict[str, Dict[str, Any]] | None = None,
+    timeout: float | None = None,
+    cache_ttl: float | None = None,
 ):
+    """
+    Registra uma ferramenta. `timeout` e `cache_ttl` (segundos) sobrescrevem os
+    padroes do tool_runtime; cache_ttl=0 desativa o cache de resultados.
+    """
     if required_env_var and not os.getenv(required_env_var):
         return
 
@@ -47,66 +80,100 @@ def register_tool(
     else:
         final_func = func
 
+    params = parameters or {}
+    # Modelo de argumentos e fragmentos de prompt sao compilados uma unica vez.
+    argument_model, has_dummy = _build_argument_model(name, params)
     AVAILABLE_TOOLS[name] = {
         "description": description,
         "function": final_func,
-        "parameters": parameters or {},
+        "parameters": params,
+        "argument_model": argument_model,
+        "has_dummy": has_dummy,
+        "description_fragment": _describe_tool(name, description, params),
+        "prompt_fragment": _tool_prompt_line(name, description, params),
+        "timeout": timeout,
+        "cache_ttl": cache_ttl,
+    }
+    _bump_registry_version()
+
+
+def unregister_tool(name: str) -> bool:
+    """Remove uma ferramenta do registro. Retorna False se ela nao existia."""
+    if AVAILABLE_TOOLS.pop(name, None) is None:
+        return False
+    _bump_registry_version()
+    return True
+
+
+def _bump_registry_version() -> None:
+    global REGISTRY_VERSION
+    REGISTRY_VERSION += 1
+
+
+def _describe_tool(
+    name: str, description: str, params: Dict[str, Dict[str, Any]]
+) -> str:
+    if not params:
+        return f"{name}() - {description or 'Sem descricao'}"
+    signature = []
+    details = []
+    for param_name, meta in params.items():
+        param_type = meta.get("type", "str")
+        required = meta.get("required", False)
+        signature.append(f"{param_name}: {param_type}{'!' if required else ''}")
+        details.append(
+            f"  - {param_name} ({param_type}, {'obrigatorio' if required else 'opcional'}): "
+            f"{meta.get('description', 'Sem descricao')}"
+        )
+    return (
+        f"{name}({', '.join(signature)}) - {description or 'Sem descricao'}\n"
+        + "\n".join(details)
+    )
+
+
+def _tool_prompt_line(
+    name: str, description: str, params: Dict[str, Dict[str, Any]]
+) -> str:
+    if not params:
+        return f"- '{name}': {description}"
+    signature = ", ".join(
+        f"{param} ({meta.get('type', 'str')})" for param, meta in params.items()
+    )
+    return f"- '{name}({signature})': {description}"
+
+
+def _refresh_prompt_cache() -> None:
+    if _prompt_cache["version"] == REGISTRY_VERSION:
+        return
+    descriptions = {
+        name: data["description_fragment"] for name, data in AVAILABLE_TOOLS.items()
     }
+    if AVAILABLE_TOOLS:
+        prompt = "\n".join(
+            ["FERRAMENTAS DISPONIVEIS:"]
+            + [data["prompt_fragment"] for data in AVAILABLE_TOOLS.values()]
+        )
+    else:
+        prompt = "FERRAMENTAS DISPONIVEIS:\n- Nenhuma ferramenta ativa."
+    _prompt_cache.update(
+        version=REGISTRY_VERSION, descriptions=descriptions, prompt=prompt
+    )
 
 
 def get_tool_descriptions() -> Dict[str, str]:
     """
     Retorna descricoes detalhadas das ferramentas (nome, assinatura e parametros).
     """
-    descriptions: Dict[str, str] = {}
-    for name, data in AVAILABLE_TOOLS.items():
-        params = data.get("parameters", {})
-        if params:
-            signature = []
-            details = []
-            for param_name, meta in params.items():
-                param_type = meta.get("type", "str")
-                required = meta.get("required", False)
-                signature.append(f"{param_name}: {param_type}{'!' if required else ''}")
-                details.append(
-                    f"  - {param_name} ({param_type}, {'obrigatorio' if required else 'opcional'}): "
-                    f"{meta.get('description', 'Sem descricao')}"
-                )
-            formatted = (
-                f"{name}({', '.join(signature)}) - {data.get('description', 'Sem descricao')}\n"
-                + "\n".join(details)
-            )
-            descriptions[name] = formatted
-        else:
-            descriptions[name] = (
-                f"{name}() - {data.get('description', 'Sem descricao')}"
-            )
-    return descriptions
+    _refresh_prompt_cache()
+    return dict(_prompt_cache["descriptions"])
 
 
 def get_tools_prompt() -> str:
-    if not AVAILABLE_TOOLS:
-        return "FERRAMENTAS DISPONIVEIS:\n- Nenhuma ferramenta ativa."
-
-    lines = ["FERRAMENTAS DISPONIVEIS:"]
-    for name, info in AVAILABLE_TOOLS.items():
-        params = info.get("parameters") or {}
-        if params:
-            signature = ", ".join(
-                f"{param} ({meta.get('type', 'str')})" for param, meta in params.items()
-            )
-            lines.append(f"- '{name}({signature})': {info['description']}")
-        else:
-            lines.append(f"- '{name}': {info['description']}")
-    return "\n".join(lines)
-
+    _refresh_prompt_cache()
+    return _prompt_cache["prompt"]
 
-def _build_argument_model(tool_name: str):
-    tool = AVAILABLE_TOOLS.get(tool_name)
-    if not tool:
-        raise ValueError(f"Ferramenta '{tool_name}' nao foi registrada.")
 
-    params = tool.get("parameters") or {}
+def _build_argument_model(tool_name: str, params: Dict[str, Dict[str, Any]]):
     fields: Dict[str, Tuple[Any, Any]] = {}
     for param_name, meta in params.items():
         type_name = meta.get("type", "str")
@@ -128,7 +195,10 @@ def _build_argument_model(tool_name: str):
 def validate_tool_arguments(
     tool_name: str, arguments: Dict[str, Any]
 ) -> Dict[str, Any]:
-    model, has_dummy = _build_argument_model(tool_name)
+    tool = AVAILABLE_TOOLS.get(tool_name)
+    if not tool:
+        raise ValueError(f"Ferramenta '{tool_name}' nao foi registrada.")
+    model, has_dummy = tool["argument_model"], tool["has_dummy"]
     cleaned_args = arguments or {}
 
     try:
@@ -141,9 +211,26 @@ def validate_tool_arguments(
         raise ValueError(error.errors()) from error
 
 
+def _get_tavily_client() -> TavilyClient:
+    global _tavily_client
+    with _client_lock:
+        if _tavily_client is None:
+            _tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+        return _tavily_client
+
+
+def _get_ddgs() -> DDGS:
+    # Uma instancia por thread do pool de ferramentas.
+    ddgs = getattr(_ddgs_local, "client", None)
+    if ddgs is None:
+        ddgs = DDGS()
+        _ddgs_local.client = ddgs
+    return ddgs
+
+
 def _tool_tavily(query: str) -> str:
     try:
-        client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+        client = _get_tavily_client()
         result = client.search(query=query, search_depth="advanced", max_results=5)
         return json.dumps(result.get("results", []))
     except Exception as error:  # noqa: BLE001
@@ -156,6 +243,7 @@ register_tool(
     _tool_tavily,
     required_env_var="TAVILY_API_KEY",
     limit_key="tavily",
+    timeout=30,
     parameters={
         "query": {
             "type": "str",
@@ -169,8 +257,11 @@ register_tool(
 def _tool_nasa(query: str | None = None) -> str:
     try:
         api_key = os.getenv("NASA_API_KEY")
-        url = f"https://api.nasa.gov/planetary/apod?api_key={api_key}"
-        response = requests.get(url, timeout=10)
+        response = _http_session.get(
+            "https://api.nasa.gov/planetary/apod",
+            params={"api_key": api_key},
+            timeout=HTTP_TIMEOUT,
+        )
         data = response.json()
         title = data.get("title", "Sem titulo")
         explanation = data.get("explanation", "Sem descricao")
@@ -186,6 +277,7 @@ register_tool(
     _tool_nasa,
     required_env_var="NASA_API_KEY",
     limit_key="nasa",
+    cache_ttl=3600,  # A imagem astronomica do dia muda uma vez por dia
     parameters={
         "query": {
             "type": "str",
@@ -199,10 +291,7 @@ register_tool(
 
 def _tool_ddg_news(query: str, max_results: int = 5) -> str:
     try:
-        results = []
-        with DDGS() as ddgs:
-            for record in ddgs.news(query, region="br-pt", max_results=max_results):
-                results.append(record)
+        results = list(_get_ddgs().news(query, region="br-pt", max_results=max_results))
         return json.dumps(results)
     except Exception as error:  # noqa: BLE001
         return f"ERRO DDG: {error}"
@@ -212,6 +301,7 @@ register_tool(
     "news_search",
     "Use apenas para noticias recentes, manchetes do dia ou eventos em tempo real.",
     _tool_ddg_news,
+    cache_ttl=120,
     parameters={
         "query": {
             "type": "str",
@@ -226,3 +316,58 @@ register_tool(
         },
     },
 )
+
+
+def _activate_plugin(name: str, origin: str, target: Any) -> None:
+    # Entry points podem apontar para o modulo ou direto para a funcao de registro.
+    if isinstance(target, ModuleType):
+        register = getattr(target, "register_tools", None)
+    else:
+        register = target
+    if callable(register):
+        register(register_tool)
+    LOADED_PLUGINS[name] = origin
+
+
+def load_plugins(directory: str | None = PLUGIN_DIR) -> List[str]:
+    """
+    Carrega os plugins de ferramentas ainda nao carregados. Falhas sao
+    registradas no log e nao impedem os demais. Retorna os nomes carregados.
+    """
+    loaded: List[str] = []
+    if directory and os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".py") or filename.startswith("_"):
+                continue
+            name = filename[:-3]
+            if name in LOADED_PLUGINS:
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                spec = importlib.util.spec_from_file_location(
+                    f"nexus_plugins.{name}", path
+                )
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)  # type: ignore[union-attr]
+                _activate_plugin(name, path, module)
+                loaded.append(name)
+            except Exception as error:  # noqa: BLE001
+                print(f"[Ferramentas] Falha ao carregar plugin '{path}': {error}")
+
+    for entry_point in entry_points(group=PLUGIN_ENTRY_POINT_GROUP):
+        if entry_point.name in LOADED_PLUGINS:
+            continue
+        try:
+            _activate_plugin(entry_point.name, entry_point.value, entry_point.load())
+            loaded.append(entry_point.name)
+        except Exception as error:  # noqa: BLE001
+            print(
+                f"[Ferramentas] Falha ao carregar plugin '{entry_point.value}': {error}"
+            )
+
+    if loaded:
+        print(f"[Ferramentas] Plugins carregados: {', '.join(loaded)}")
+    return loaded
+
+
+load_plugins()
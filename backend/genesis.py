@@ -114,6 +114,7 @@ def perform_genesis():
             MERGE (s)-[:SENTE]->(i)
             """
         )
+    database.NexusGraph.invalidate_cache()
 
     try:
         blueprint_path = generate_cognitive_blueprint()
@@ -0,0 +1,592 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import threading
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+try:  # pragma: no cover
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+from db_connect import neo4j_driver
+from prompt_budget import fold_accents
+
+# Projecao em memoria (CSR) do subgrafo Conceito/Consciousness, usada pelo
+# NexusGraph para responder buscas ponderadas sem ir ao Neo4j. Opcional:
+# exige numpy e NEXUS_GRAPH_PROJECTION=1.
+PROJECTION_ENABLED = os.getenv("NEXUS_GRAPH_PROJECTION", "0").lower() in (
+    "1",
+    "true",
+    "sim",
+)
+# Arestas novas ficam num buffer de delta ate a proxima compactacao do CSR.
+COMPACT_THRESHOLD = 5000
+NODE_FIELDS = (
+    "id",
+    "name",
+    "title",
+    "description",
+    "status_memoria",
+    "confianca_intrinseca",
+    "fonte_url",
+    "url",
+)
+SEARCH_FIELDS = ("name", "title", "description")
+
+LOAD_NODES_QUERY = """
+MATCH (n)
+WHERE n:Conceito OR n:Consciousness
+RETURN coalesce(n.id, elementId(n)) AS key,
+       n {.id, .name, .title, .description, .status_memoria,
+          .confianca_intrinseca, .fonte_url, .url} AS props
+"""
+LOAD_EDGES_QUERY = """
+MATCH (a)-[r]->(b)
+WHERE (a:Conceito OR a:Consciousness) AND (b:Conceito OR b:Consciousness)
+RETURN coalesce(a.id, elementId(a)) AS source, coalesce(b.id, elementId(b)) AS target,
+       type(r) AS rel_type,
+       r.confianca_intrinseca AS confianca_intrinseca,
+       r.relevancia_contextual AS relevancia_contextual
+"""
+
+
+def _search_text(props: Dict[str, Any]) -> str:
+    return fold_accents(
+        " ".join(str(props.get(field) or "") for field in SEARCH_FIELDS)
+    )
+
+
+def node_matches(props: Dict[str, Any], terms: Sequence[str]) -> bool:
+    """
+    Regra unica de casamento da busca, na projecao e no Neo4j: algum termo
+    contido no texto do no, em minusculas e sem acentos.
+    """
+    text = _search_text(props)
+    return any(term in text for term in terms)
+
+
+def edge_weight(confidence: Any, relevance: Any) -> float:
+    """Mesmo custo do NexusGraph: 1/(confianca * relevancia), 10.0 se nulo."""
+    try:
+        intrinsic = max(0.0, min(float(confidence), 1.0))
+        contextual = max(0.0, min(float(relevance), 1.0))
+    except (TypeError, ValueError):
+        return 10.0
+    if intrinsic <= 0.0 or contextual <= 0.0:
+        return 10.0
+    return 1.0 / (intrinsic * contextual)
+
+
+class GraphProjection:
+    """
+    Grafo em arrays (indptr/indices/weights) com um buffer de arestas novas.
+    Os caminhos de escrita (save_knowledge_triples, ativacoes, memory_jobs)
+    mantem a projecao atualizada; mudancas em massa pedem um recarregamento.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self.ready = False
+        self._keys: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._props: List[Dict[str, Any]] = []
+        self._mcp = None
+        self._texts: List[str] = []
+        self._rel_types: List[str] = []
+        self._rel_type_index: Dict[str, int] = {}
+        self._indptr = None
+        self._indices = None
+        self._weights = None
+        self._edge_types = None
+        self._edge_confidence = None
+        self._extra: Dict[int, List[Tuple[int, float, int, float]]] = {}
+        self._extra_count = 0
+        self._edge_keys: Set[Tuple[int, int, int]] = set()
+
+    # ------------------------------------------------------------------
+    # Carga e manutencao
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Carrega a projecao em segundo plano, se habilitada."""
+        if not PROJECTION_ENABLED:
+            return
+        if np is None:
+            print("[Graph Projection] numpy indisponivel; projecao desativada.")
+            return
+        self.request_reload()
+
+    def request_reload(self) -> None:
+        if not PROJECTION_ENABLED or np is None:
+            return
+        threading.Thread(
+            target=self.reload, name="nexus-graph-projection", daemon=True
+        ).start()
+
+    def reload(self) -> None:
+        """Le o subgrafo do Neo4j e reconstroi os arrays."""
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            with neo4j_driver.session() as session:
+                node_records = list(session.run(LOAD_NODES_QUERY))
+                edge_records = list(session.run(LOAD_EDGES_QUERY))
+            with self._lock:
+                self._reset()
+                for record in node_records:
+                    self._add_node(
+                        record["key"], dict(record["props"] or {}), bulk=True
+                    )
+                self._mcp = np.array(
+                    [props.get("status_memoria") == "MCP" for props in self._props],
+                    dtype=bool,
+                )
+                edges = []
+                for record in edge_records:
+                    source = self._index.get(record["source"])
+                    target = self._index.get(record["target"])
+                    if source is None or target is None:
+                        continue
+                    rel_type = self._rel_type_id(record["rel_type"])
+                    key = (source, target, rel_type)
+                    if key in self._edge_keys:
+                        continue
+                    self._edge_keys.add(key)
+                    edges.append(
+                        (
+                            source,
+                            target,
+                            edge_weight(
+                                record["confianca_intrinseca"],
+                                record["relevancia_contextual"],
+                            ),
+                            rel_type,
+                            float(record["confianca_intrinseca"] or 0.0),
+                        )
+                    )
+                self._build_csr(edges)
+                self.ready = True
+            print(
+                f"[Graph Projection] Projecao carregada: {len(self._keys)} nos, "
+                f"{len(edges)} arestas."
+            )
+        except Exception as error:  # noqa: BLE001
+            print(f"[Graph Projection] Falha ao carregar projecao: {error}")
+        finally:
+            self._reload_lock.release()
+
+    def _reset(self) -> None:
+        self._keys, self._index, self._props = [], {}, []
+        self._texts, self._rel_types, self._rel_type_index = [], [], {}
+        self._extra, self._extra_count, self._edge_keys = {}, 0, set()
+        self._mcp = np.zeros(0, dtype=bool)
+
+    def _add_node(self, key: str, props: Dict[str, Any], bulk: bool = False) -> int:
+        index = self._index.get(key)
+        if index is not None:
+            self._props[index].update(
+                {field: props[field] for field in NODE_FIELDS if field in props}
+            )
+            self._texts[index] = _search_text(self._props[index])
+            if not bulk:
+                self._mcp[index] = self._props[index].get("status_memoria") == "MCP"
+            return index
+        index = len(self._keys)
+        self._keys.append(key)
+        self._index[key] = index
+        self._props.append({field: props.get(field) for field in NODE_FIELDS})
+        self._texts.append(_search_text(props))
+        if not bulk:
+            self._mcp = np.append(self._mcp, props.get("status_memoria") == "MCP")
+        return index
+
+    def _rel_type_id(self, rel_type: str) -> int:
+        index = self._rel_type_index.get(rel_type)
+        if index is None:
+            index = len(self._rel_types)
+            self._rel_types.append(rel_type)
+            self._rel_type_index[rel_type] = index
+        return index
+
+    def _build_csr(self, edges: Sequence[Tuple[int, int, float, int, float]]) -> None:
+        node_count = len(self._keys)
+        if edges:
+            sources = np.fromiter(
+                (edge[0] for edge in edges), dtype=np.int64, count=len(edges)
+            )
+            order = np.argsort(sources, kind="stable")
+            self._indices = np.fromiter((edge[1] for edge in edges), dtype=np.int32)[
+                order
+            ]
+            self._weights = np.fromiter((edge[2] for edge in edges), dtype=np.float64)[
+                order
+            ]
+            self._edge_types = np.fromiter((edge[3] for edge in edges), dtype=np.int32)[
+                order
+            ]
+            self._edge_confidence = np.fromiter(
+                (edge[4] for edge in edges), dtype=np.float64
+            )[order]
+            counts = np.bincount(sources, minlength=node_count)
+        else:
+            self._indices = np.zeros(0, dtype=np.int32)
+            self._weights = np.zeros(0, dtype=np.float64)
+            self._edge_types = np.zeros(0, dtype=np.int32)
+            self._edge_confidence = np.zeros(0, dtype=np.float64)
+            counts = np.zeros(node_count, dtype=np.int64)
+        self._indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._indptr[1:])
+        self._extra, self._extra_count = {}, 0
+
+    def _compact(self) -> None:
+        edges = []
+        for source in range(len(self._indptr) - 1):
+            for position in range(self._indptr[source], self._indptr[source + 1]):
+                edges.append(
+                    (
+                        source,
+                        int(self._indices[position]),
+                        float(self._weights[position]),
+                        int(self._edge_types[position]),
+                        float(self._edge_confidence[position]),
+                    )
+                )
+        for source, extra_edges in self._extra.items():
+            for target, weight, rel_type, confidence in extra_edges:
+                edges.append((source, target, weight, rel_type, confidence))
+        self._build_csr(edges)
+
+    def add_triple(
+        self,
+        source_key: str,
+        source_props: Dict[str, Any],
+        rel_type: str,
+        target_key: str,
+        target_props: Dict[str, Any],
+        confidence: float,
+        relevance: float,
+    ) -> None:
+        """Registra (ou atualiza) os nos e a aresta gravados por save_knowledge_triples."""
+        if not self.ready:
+            return
+        with self._lock:
+            source = self._add_node(source_key, source_props)
+            target = self._add_node(target_key, target_props)
+            rel_type_id = self._rel_type_id(rel_type)
+            key = (source, target, rel_type_id)
+            if key in self._edge_keys:
+                return
+            self._edge_keys.add(key)
+            self._extra.setdefault(source, []).append(
+                (
+                    target,
+                    edge_weight(confidence, relevance),
+                    rel_type_id,
+                    float(confidence or 0.0),
+                )
+            )
+            self._extra_count += 1
+            if self._extra_count >= COMPACT_THRESHOLD:
+                # Nos novos ficam fora do indptr ate a compactacao.
+                self._compact()
+
+    def update_node(self, key: str, **props: Any) -> None:
+        if not self.ready:
+            return
+        with self._lock:
+            index = self._index.get(key)
+            if index is None:
+                return
+            self._props[index].update(props)
+            self._texts[index] = _search_text(self._props[index])
+            self._mcp[index] = self._props[index].get("status_memoria") == "MCP"
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def node_props(self, key: str) -> Dict[str, Any]:
+        index = self._index.get(key)
+        return dict(self._props[index]) if index is not None else {}
+
+    def _neighbors(self, node: int):
+        """Arestas do no: (destinos, pesos, tipos, confiancas) como arrays."""
+        if node + 1 < len(self._indptr):
+            start, end = self._indptr[node], self._indptr[node + 1]
+            targets = self._indices[start:end]
+            weights = self._weights[start:end]
+            types = self._edge_types[start:end]
+            confidences = self._edge_confidence[start:end]
+        else:
+            targets = weights = types = confidences = None
+        extra = self._extra.get(node)
+        if extra:
+            extra_targets = np.array([edge[0] for edge in extra], dtype=np.int32)
+            extra_weights = np.array([edge[1] for edge in extra], dtype=np.float64)
+            extra_types = np.array([edge[2] for edge in extra], dtype=np.int32)
+            extra_conf = np.array([edge[3] for edge in extra], dtype=np.float64)
+            if targets is None:
+                return extra_targets, extra_weights, extra_types, extra_conf
+            return (
+                np.concatenate([targets, extra_targets]),
+                np.concatenate([weights, extra_weights]),
+                np.concatenate([types, extra_types]),
+                np.concatenate([confidences, extra_conf]),
+            )
+        if targets is None:
+            empty = np.zeros(0)
+            return empty.astype(np.int32), empty, empty.astype(np.int32), empty
+        return targets, weights, types, confidences
+
+    def _rel(self, rel_type: int, confidence: float) -> Dict[str, Any]:
+        return {"type": self._rel_types[rel_type], "confianca_intrinseca": confidence}
+
+    def search(
+        self,
+        origin_key: str,
+        terms: Sequence[str],
+        critical: bool,
+        limit: int,
+        max_depth: int,
+        mcp_penalty: float,
+        max_weight: float,
+    ) -> List[Dict[str, Any]]:
+        """
+        Dijkstra (relaxacao vetorizada por no) a partir de origin_key sobre o
+        estado (no, caminho_tem_mcp). Devolve os `limit` alvos de menor custo
+        cujo texto contem algum dos termos (mesma regra de `node_matches`),
+        com o caminho completo.
+        """
+        with self._lock:
+            origin = self._index.get(origin_key)
+            if origin is None:
+                return []
+            targets = {
+                index
+                for index, text in enumerate(self._texts)
+                if any(term in text for term in terms)
+            }
+            targets.discard(origin)
+            if not targets:
+                return []
+
+            node_count = len(self._keys)
+            dist = np.full((node_count, 2), np.inf)
+            depth = np.zeros((node_count, 2), dtype=np.int32)
+            parent: Dict[Tuple[int, int], Tuple[int, int, int, float]] = {}
+            origin_flag = int(self._mcp[origin])
+            if critical and origin_flag:
+                return []
+            start_cost = mcp_penalty if origin_flag and not critical else 0.0
+            dist[origin, origin_flag] = start_cost
+            counter = itertools.count()
+            heap = [(start_cost, next(counter), origin, origin_flag)]
+            found: List[Tuple[float, int, int]] = []
+            settled: Set[int] = set()
+
+            while heap and len(found) < limit:
+                cost, _, node, flag = heapq.heappop(heap)
+                if cost > dist[node, flag]:
+                    continue
+                if node in targets and node not in settled:
+                    settled.add(node)
+                    found.append((cost, node, flag))
+                if depth[node, flag] >= max_depth:
+                    continue
+
+                neighbors, weights, types, confidences = self._neighbors(node)
+                if not len(neighbors):
+                    continue
+                target_mcp = self._mcp[neighbors]
+                if critical:
+                    keep = ~target_mcp
+                    neighbors, weights = neighbors[keep], weights[keep]
+                    types, confidences, target_mcp = (
+                        types[keep],
+                        confidences[keep],
+                        target_mcp[keep],
+                    )
+                new_flags = target_mcp.astype(np.int32) | flag
+                new_costs = cost + weights
+                if not flag:
+                    new_costs = new_costs + np.where(target_mcp, mcp_penalty, 0.0)
+                improved = (new_costs < dist[neighbors, new_flags]) & (
+                    new_costs <= max_weight
+                )
+                for position in np.nonzero(improved)[0]:
+                    neighbor = int(neighbors[position])
+                    neighbor_flag = int(new_flags[position])
+                    new_cost = float(new_costs[position])
+                    if new_cost >= dist[neighbor, neighbor_flag]:
+                        continue
+                    dist[neighbor, neighbor_flag] = new_cost
+                    depth[neighbor, neighbor_flag] = depth[node, flag] + 1
+                    parent[(neighbor, neighbor_flag)] = (
+                        node,
+                        flag,
+                        int(types[position]),
+                        float(confidences[position]),
+                    )
+                    heapq.heappush(
+                        heap, (new_cost, next(counter), neighbor, neighbor_flag)
+                    )
+
+            results = []
+            for cost, node, flag in found:
+                path_nodes = [node]
+                path_rels: List[Dict[str, Any]] = []
+                state = (node, flag)
+                while state in parent:
+                    previous, previous_flag, rel_type, confidence = parent[state]
+                    path_rels.append(self._rel(rel_type, confidence))
+                    path_nodes.append(previous)
+                    state = (previous, previous_flag)
+                path_nodes.reverse()
+                path_rels.reverse()
+                results.append(
+                    {
+                        "target": self._keys[node],
+                        "path_weight": cost,
+                        "path_nodes": [self._keys[index] for index in path_nodes],
+                        "path_rels": path_rels,
+                    }
+                )
+            return results
+
+    def _shortest_path(
+        self,
+        source: int,
+        target: int,
+        critical: bool,
+        blocked_nodes: Set[int],
+        blocked_edges: Set[Tuple[int, int, int]],
+    ) -> Tuple[float, List[int], List[Tuple[int, float]]] | None:
+        dist = np.full(len(self._keys), np.inf)
+        dist[source] = 0.0
+        parent: Dict[int, Tuple[int, int, float]] = {}
+        heap = [(0.0, source)]
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if cost > dist[node]:
+                continue
+            if node == target:
+                nodes, rels = [node], []
+                while node in parent:
+                    previous, rel_type, confidence = parent[node]
+                    rels.append((rel_type, confidence))
+                    nodes.append(previous)
+                    node = previous
+                return cost, nodes[::-1], rels[::-1]
+            neighbors, weights, types, confidences = self._neighbors(node)
+            new_costs = cost + weights
+            for position in np.nonzero(new_costs < dist[neighbors])[0]:
+                neighbor = int(neighbors[position])
+                rel_type = int(types[position])
+                if (
+                    neighbor in blocked_nodes
+                    or (node, neighbor, rel_type) in blocked_edges
+                ):
+                    continue
+                if critical and self._mcp[neighbor]:
+                    continue
+                if new_costs[position] >= dist[neighbor]:
+                    continue
+                dist[neighbor] = new_costs[position]
+                parent[neighbor] = (node, rel_type, float(confidences[position]))
+                heapq.heappush(heap, (float(new_costs[position]), neighbor))
+        return None
+
+    def k_best_paths(
+        self,
+        source_key: str,
+        target_key: str,
+        k: int = 3,
+        critical: bool = False,
+        mcp_penalty: float = 0.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Os k caminhos simples de menor custo entre dois nos (algoritmo de Yen).
+        A penalidade MCP e aplicada uma vez por caminho, depois da enumeracao.
+        """
+        with self._lock:
+            source = self._index.get(source_key)
+            target = self._index.get(target_key)
+            if source is None or target is None or k <= 0:
+                return []
+            first = self._shortest_path(source, target, critical, set(), set())
+            if first is None:
+                return []
+            accepted = [first]
+            candidates: List[Tuple[float, int, List[int], List[Tuple[int, float]]]] = []
+            counter = itertools.count()
+            seen = {tuple(first[1])}
+
+            while len(accepted) < k:
+                _, last_nodes, last_rels = accepted[-1]
+                for spur_index in range(len(last_nodes) - 1):
+                    root_nodes = last_nodes[: spur_index + 1]
+                    root_rels = last_rels[:spur_index]
+                    blocked_edges: Set[Tuple[int, int, int]] = set()
+                    for _, nodes, rels in accepted:
+                        if (
+                            nodes[: spur_index + 1] == root_nodes
+                            and len(nodes) > spur_index + 1
+                        ):
+                            blocked_edges.add(
+                                (
+                                    nodes[spur_index],
+                                    nodes[spur_index + 1],
+                                    rels[spur_index][0],
+                                )
+                            )
+                    blocked_nodes = set(root_nodes[:-1])
+                    spur = self._shortest_path(
+                        root_nodes[-1], target, critical, blocked_nodes, blocked_edges
+                    )
+                    if spur is None:
+                        continue
+                    nodes = root_nodes[:-1] + spur[1]
+                    if tuple(nodes) in seen:
+                        continue
+                    seen.add(tuple(nodes))
+                    rels = root_rels + spur[2]
+                    root_cost = self._path_cost(root_nodes, root_rels)
+                    heapq.heappush(
+                        candidates, (root_cost + spur[0], next(counter), nodes, rels)
+                    )
+                if not candidates:
+                    break
+                cost, _, nodes, rels = heapq.heappop(candidates)
+                accepted.append((cost, nodes, rels))
+
+            results = []
+            for cost, nodes, rels in accepted:
+                if any(self._mcp[node] for node in nodes):
+                    cost += mcp_penalty
+                results.append(
+                    {
+                        "target": target_key,
+                        "path_weight": cost,
+                        "path_nodes": [self._keys[node] for node in nodes],
+                        "path_rels": [
+                            self._rel(rel_type, conf) for rel_type, conf in rels
+                        ],
+                    }
+                )
+            results.sort(key=lambda item: item["path_weight"])
+            return results
+
+    def _path_cost(
+        self, nodes: Sequence[int], rels: Sequence[Tuple[int, float]]
+    ) -> float:
+        total = 0.0
+        for position, (rel_type, _) in enumerate(rels):
+            neighbors, weights, types, _ = self._neighbors(nodes[position])
+            mask = (neighbors == nodes[position + 1]) & (types == rel_type)
+            total += float(weights[mask].min()) if mask.any() else 10.0
+        return total
+
+
+projection = GraphProjection()
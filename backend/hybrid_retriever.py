@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+import database
+from chroma_eviction import eviction_index
+from db_connect import chroma_client, neo4j_driver
+from prompt_budget import count_tokens, extract_terms
+
+# Recuperacao hibrida: as pernas de grafo (caminhos ponderados), palavra-chave
+# (indice full-text/BM25 do Neo4j) e vetorial (ChromaDB) rodam em paralelo e
+# sao fundidas por Reciprocal Rank Fusion, com bonus pela confianca intrinseca.
+RRF_K = 60
+LEG_WEIGHTS = {"graph": 1.0, "keyword": 1.0, "vector": 1.0}
+CONFIDENCE_WEIGHT = 0.5
+LEG_LIMIT = 8
+CONTEXT_TOKEN_BUDGET = int(os.getenv("NEXUS_RAG_TOKEN_BUDGET", 1500))
+FULLTEXT_INDEX = "memoria_fulltext"
+
+
+def _lucene_query(terms: Sequence[str]) -> str:
+    escaped = [re.sub(r'([+\-&|!(){}\[\]^"~*?:\\/])', r"\\\1", term) for term in terms]
+    return " OR ".join(escaped)
+
+
+def _node_document(
+    node: Any, rels: Sequence[Dict[str, Any]], leg: str
+) -> Dict[str, Any]:
+    node_name = node.get("name") or node.get("title") or node.get("id") or "NoName"
+    line_parts = [f"Neo4j Node: {node_name}"]
+    description = node.get("description")
+    if description:
+        line_parts.append(f"Descricao: {description}")
+    rel_text = "; ".join(
+        f"{item.get('rel')} -> {item.get('target')}"
+        for item in rels or []
+        if item.get("rel")
+    )
+    if rel_text:
+        line_parts.append(f"Relacoes: {rel_text}")
+    return {
+        "id": node.get("id") or node_name,
+        "title": node_name,
+        "content": " | ".join(line_parts),
+        "url": node.get("fonte_url") or "",
+        "confianca_intrinseca": float(node.get("confianca_intrinseca", 0.0) or 0.0),
+        "status_memoria": node.get("status_memoria"),
+        "source_label": f"Neo4j:{node_name}",
+        "leg": leg,
+    }
+
+
+# ----------------------------------------------------------------------
+# Pernas de recuperacao
+# ----------------------------------------------------------------------
+def _graph_leg(query: str, context_of_use: str | None) -> List[Dict[str, Any]]:
+    documents = database.NexusGraph.quantum_search(
+        query=query,
+        context_of_use=context_of_use,
+        limit=LEG_LIMIT,
+    )
+    for document in documents:
+        document.setdefault("source_label", f"Neo4j:{document.get('title')}")
+        document["leg"] = "graph"
+    # path_weight ja inclui a penalidade MCP; menor peso = caminho mais forte.
+    return sorted(documents, key=lambda item: float(item.get("path_weight") or 0.0))
+
+
+def _keyword_leg(terms: Sequence[str]) -> List[Dict[str, Any]]:
+    if not terms:
+        return []
+    with neo4j_driver.session() as session:
+        try:
+            records = list(
+                session.run(
+                    """
+                    CALL db.index.fulltext.queryNodes($index, $lucene_query) YIELD node, score
+                    WITH node AS n, score
+                    ORDER BY score DESC
+                    LIMIT $limit
+                    OPTIONAL MATCH (n)-[r]->(m)
+                    WITH n, score, collect({rel: type(r), target: coalesce(m.name, m.title, m.id, '')})[..10] AS rels
+                    RETURN n, rels
+                    ORDER BY score DESC
+                    """,
+                    index=FULLTEXT_INDEX,
+                    lucene_query=_lucene_query(terms),
+                    limit=LEG_LIMIT,
+                )
+            )
+        except Exception as error:  # noqa: BLE001
+            # Indice full-text ausente: busca por substring nos termos.
+            print(f"[RAG] Indice full-text indisponivel ({error}). Usando CONTAINS.")
+            records = list(
+                session.run(
+                    """
+                    MATCH (n)
+                    WITH n, toLower(coalesce(n.name, '') + ' ' + coalesce(n.title, '') + ' '
+                                    + coalesce(n.description, '')) AS text
+                    WITH n, size([term IN $terms WHERE text CONTAINS term]) AS hits
+                    WHERE hits > 0
+                    WITH n, hits
+                    ORDER BY hits DESC
+                    LIMIT $limit
+                    OPTIONAL MATCH (n)-[r]->(m)
+                    WITH n, hits, collect({rel: type(r), target: coalesce(m.name, m.title, m.id, '')})[..10] AS rels
+                    RETURN n, rels
+                    ORDER BY hits DESC
+                    """,
+                    terms=list(terms),
+                    limit=LEG_LIMIT,
+                )
+            )
+    return [
+        _node_document(record["n"], record["rels"], "keyword") for record in records
+    ]
+
+
+def _vector_leg(
+    query: str,
+    session_id: str,
+    exclude_message_id: str | None,
+) -> List[Dict[str, Any]]:
+    collection = chroma_client.get_or_create_collection(
+        name=f"chat_{session_id}",
+        embedding_function=database.default_embedding_function,
+    )
+    result = collection.query(
+        query_texts=[query],
+        n_results=LEG_LIMIT,
+        include=["metadatas", "documents", "distances"],
+    )
+    documents = result.get("documents", [[]])[0]
+    metadatas = result.get("metadatas", [[]])[0]
+    ids = result.get("ids", [[]])[0]
+    distances = result.get("distances", [[]])[0]
+
+    found: List[Dict[str, Any]] = []
+    for index, (doc, meta) in enumerate(zip(documents, metadatas)):
+        doc_id = ids[index] if index < len(ids) else f"doc_{index}"
+        if exclude_message_id and doc_id == exclude_message_id:
+            continue
+        role = meta.get("role") if isinstance(meta, dict) else ""
+        found.append(
+            {
+                "id": doc_id,
+                "title": f"ChatMem:{role or 'mensagem'}",
+                "content": doc,
+                "url": "",
+                "confianca_intrinseca": 0.0,
+                "status_memoria": "MCP",
+                "distance": distances[index] if index < len(distances) else None,
+                "source_label": f"ChatMem:{role or 'mensagem'}",
+                "context_line": f"ChatMem[{doc_id}]: {doc}",
+                "leg": "vector",
+            }
+        )
+    return found
+
+
+# ----------------------------------------------------------------------
+# Fusao
+# ----------------------------------------------------------------------
+def _document_key(document: Dict[str, Any]) -> str:
+    if document.get("id"):
+        return str(document["id"])
+    content = str(document.get("content") or "")
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def fuse(ranked_lists: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Reciprocal Rank Fusion ponderado + bonus por confianca intrinseca."""
+    fused: Dict[str, Dict[str, Any]] = {}
+    for leg, documents in ranked_lists.items():
+        weight = LEG_WEIGHTS.get(leg, 1.0)
+        for rank, document in enumerate(documents, start=1):
+            key = _document_key(document)
+            entry = fused.get(key)
+            if entry is None:
+                entry = dict(document)
+                entry["legs"] = []
+                entry["score_hibrido"] = 0.0
+                fused[key] = entry
+            entry["legs"].append(leg)
+            entry["score_hibrido"] += weight / (RRF_K + rank)
+            entry["confianca_intrinseca"] = max(
+                float(entry.get("confianca_intrinseca") or 0.0),
+                float(document.get("confianca_intrinseca") or 0.0),
+            )
+
+    for entry in fused.values():
+        confidence = max(0.0, min(float(entry.get("confianca_intrinseca") or 0.0), 1.0))
+        entry["score_hibrido"] += CONFIDENCE_WEIGHT * confidence / (RRF_K + 1)
+
+    return sorted(fused.values(), key=lambda item: item["score_hibrido"], reverse=True)
+
+
+def apply_token_budget(
+    documents: Sequence[Dict[str, Any]],
+    token_budget: int,
+) -> List[Dict[str, Any]]:
+    """Mantem os documentos melhor ranqueados que cabem no orcamento de tokens."""
+    selected: List[Dict[str, Any]] = []
+    used = 0
+    for document in documents:
+        cost = count_tokens(str(document.get("content") or ""))
+        if used + cost > token_budget:
+            continue
+        selected.append(document)
+        used += cost
+    return selected
+
+
+def record_activation(documents: Sequence[Dict[str, Any]]) -> None:
+    """Mensagens usadas no contexto contam como ativacao (fila de despejo)."""
+    try:
+        eviction_index.touch(
+            doc["id"] for doc in documents if "vector" in doc.get("legs", ())
+        )
+    except Exception as error:  # noqa: BLE001
+        print(f"[RAG] Falha ao registrar ativacoes: {error}")
+
+
+def retrieve(
+    query: str,
+    session_id: str | None = None,
+    context_of_use: str | None = None,
+    exclude_message_id: str | None = None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    use_graph_paths: bool = True,
+    track_activation: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Executa as pernas de grafo, palavra-chave e vetor em paralelo e devolve
+    os documentos fundidos, do mais relevante ao menos, dentro do orcamento.
+    Com `track_activation=False` o chamador registra as ativacoes depois, via
+    `record_activation`, quando souber que o contexto foi de fato usado.
+    """
+    terms = extract_terms(query)
+    legs = {}
+    if query and use_graph_paths:
+        legs["graph"] = (_graph_leg, query, context_of_use)
+    if terms:
+        legs["keyword"] = (_keyword_leg, terms)
+    if session_id:
+        legs["vector"] = (_vector_leg, query, session_id, exclude_message_id)
+
+    ranked_lists: Dict[str, List[Dict[str, Any]]] = {}
+    if legs:
+        # Pool proprio por chamada: recuperacoes concorrentes (chat, rascunhos
+        # especulativos) nao ficam na fila umas das outras.
+        with ThreadPoolExecutor(
+            max_workers=len(legs), thread_name_prefix="nexus-rag"
+        ) as executor:
+            futures = {
+                leg: executor.submit(*arguments) for leg, arguments in legs.items()
+            }
+            for leg, future in futures.items():
+                try:
+                    ranked_lists[leg] = future.result()
+                except Exception as error:  # noqa: BLE001
+                    print(
+                        f"[RAG] ERRO na perna '{leg}' da recuperacao hibrida: {error}"
+                    )
+                    ranked_lists[leg] = []
+
+    fused = fuse(ranked_lists)
+    selected = apply_token_budget(fused, token_budget)
+    if track_activation:
+        record_activation(selected)
+    print(
+        "[RAG] Recuperacao hibrida: "
+        + ", ".join(f"{leg}={len(docs)}" for leg, docs in ranked_lists.items())
+        + f" -> {len(selected)}/{len(fused)} documentos no orcamento de {token_budget} tokens."
+    )
+    return selected
@@ -0,0 +1,570 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import agente_consolidacao
+import database
+from local_search import local_index
+
+try:  # pragma: no cover - dependencia opcional
+    from pypdf import PdfReader
+except Exception:  # pragma: no cover
+    PdfReader = None
+
+# Ingestao em lote da base de conhecimento local: arquivos (Markdown, texto,
+# HTML, PDF) viram trechos com embeddings em lote no indice local (BM25 +
+# vetores, consultado pela pesquisa), e as triplas extraidas em paralelo vao
+# para o Neo4j. Um manifesto com o hash do conteudo de cada arquivo torna a
+# ingestao idempotente e retomavel: arquivos sem mudanca sao pulados e
+# arquivos apagados saem do indice.
+STATE_PATH = os.getenv(
+    "NEXUS_INGEST_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "nexus_ingestion.sqlite3"),
+)
+INGEST_ROOT = os.getenv(
+    "NEXUS_INGEST_ROOT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "conhecimento"),
+)
+CHUNK_TOKENS = int(os.getenv("NEXUS_INGEST_CHUNK_TOKENS", 300))
+EMBED_BATCH_SIZE = 64
+EXTRACTION_WORKERS = 2
+MAX_PENDING_EXTRACTIONS = 4  # Arquivos aguardando triplas antes de frear a leitura
+SUPPORTED_EXTENSIONS = (".md", ".markdown", ".txt", ".html", ".htm", ".pdf")
+
+STATUS_EMBEDDED = "embedded"  # Trechos no indice local
+STATUS_DONE = "done"  # Triplas tambem gravadas no Neo4j
+
+
+class _HTMLText(HTMLParser):
+    """Extrai o texto visivel e o <title> de um documento HTML."""
+
+    SKIPPED_TAGS = {"script", "style", "noscript", "head"}
+    BLOCK_TAGS = {
+        "p",
+        "div",
+        "br",
+        "li",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "tr",
+        "section",
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parts: List[str] = []
+        self.title = ""
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self.parts.append(data)
+
+
+def read_document(path: str) -> Tuple[str, str]:
+    """Le um arquivo suportado e devolve (titulo, texto)."""
+    extension = os.path.splitext(path)[1].lower()
+    default_title = os.path.splitext(os.path.basename(path))[0]
+    if extension == ".pdf":
+        if PdfReader is None:
+            raise RuntimeError("pypdf nao instalado para ler PDFs.")
+        reader = PdfReader(path)
+        text = "\n\n".join((page.extract_text() or "") for page in reader.pages)
+        title = (reader.metadata.title if reader.metadata else None) or default_title
+        return str(title), text
+
+    with open(path, "r", encoding="utf-8", errors="replace") as handle:
+        raw = handle.read()
+    if extension in (".html", ".htm"):
+        parser = _HTMLText()
+        parser.feed(raw)
+        text = re.sub(r"[ \t]+", " ", "".join(parser.parts))
+        text = re.sub(r"\n\s*\n\s*", "\n\n", text)
+        return parser.title.strip() or default_title, text
+    heading = re.search(r"^#\s+(.+)$", raw, flags=re.MULTILINE)
+    return (heading.group(1).strip() if heading else default_title), raw
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[str]:
+    """Arquivos suportados sob os caminhos (arquivos ou diretorios), em ordem estavel."""
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isfile(path):
+            if path.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield path
+            continue
+        for root, directories, filenames in os.walk(path):
+            directories.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    yield os.path.join(root, filename)
+
+
+def _chunk_id(path: str, content_hash: str, index: int) -> str:
+    path_hash = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+    return f"doc_{path_hash}_{content_hash[:12]}_{index}"
+
+
+class IngestionPipeline:
+    """Pipeline de ingestao com manifesto (SQLite) e relatorio de progresso."""
+
+    def __init__(self, state_path: str = STATE_PATH) -> None:
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._initialized = False
+        self._progress: Dict[str, Any] = {"status": "idle"}
+
+    # ------------------------------------------------------------------
+    # Manifesto
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.state_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingested_files (
+                    path TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    chunks INTEGER NOT NULL DEFAULT 0,
+                    triples INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Trechos com triplas ja gravadas: a retomada nao paga o LLM de novo.
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extracted_chunks (
+                    path TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    chunk INTEGER NOT NULL,
+                    triples INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (path, content_hash, chunk)
+                )
+                """
+            )
+            self._initialized = True
+        return connection
+
+    def _manifest(self, path: str) -> sqlite3.Row | None:
+        connection = self._connect()
+        try:
+            return connection.execute(
+                "SELECT * FROM ingested_files WHERE path = ?", (path,)
+            ).fetchone()
+        finally:
+            connection.close()
+
+    def _mark(
+        self, path: str, content_hash: str, status: str, chunks: int, triples: int = 0
+    ) -> None:
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?, ?)",
+                (path, content_hash, status, chunks, triples, time.time()),
+            )
+        finally:
+            connection.close()
+
+    def _extracted_chunks(self, path: str, content_hash: str) -> Dict[int, int]:
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT chunk, triples FROM extracted_chunks"
+                " WHERE path = ? AND content_hash = ?",
+                (path, content_hash),
+            ).fetchall()
+        finally:
+            connection.close()
+        return {row["chunk"]: row["triples"] for row in rows}
+
+    def _mark_chunk(
+        self, path: str, content_hash: str, chunk: int, triples: int
+    ) -> None:
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO extracted_chunks VALUES (?, ?, ?, ?)",
+                (path, content_hash, chunk, triples),
+            )
+        finally:
+            connection.close()
+
+    def _clear_chunks(self, path: str) -> None:
+        # Arquivo reprocessado: o progresso de extracao anterior nao vale mais.
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM extracted_chunks WHERE path = ?", (path,))
+        finally:
+            connection.close()
+
+    # ------------------------------------------------------------------
+    # Progresso
+    # ------------------------------------------------------------------
+    def _update(self, **changes: Any) -> None:
+        with self._lock:
+            self._progress.update(changes)
+
+    def _count(self, **increments: int) -> None:
+        with self._lock:
+            for name, value in increments.items():
+                self._progress[name] = self._progress.get(name, 0) + value
+
+    def progress(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._progress)
+        started_at = snapshot.get("started_at")
+        if started_at:
+            elapsed = (snapshot.get("finished_at") or time.time()) - started_at
+            snapshot["elapsed_seconds"] = round(elapsed, 1)
+            if elapsed > 0:
+                snapshot["chunks_per_second"] = round(
+                    snapshot.get("chunks", 0) / elapsed, 2
+                )
+                snapshot["mb_per_second"] = round(
+                    snapshot.get("bytes", 0) / 1e6 / elapsed, 3
+                )
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Etapas
+    # ------------------------------------------------------------------
+    def _remove_previous(self, path: str) -> None:
+        # Versao anterior do arquivo (hash diferente): os trechos antigos saem.
+        local_index.delete_source(path)
+        self._clear_chunks(path)
+
+    def _prune_removed(self, roots: Sequence[str]) -> None:
+        """Tira do manifesto e do indice os arquivos apagados sob `roots`."""
+        roots = [os.path.abspath(root) for root in roots]
+        connection = self._connect()
+        try:
+            paths = [
+                row["path"]
+                for row in connection.execute("SELECT path FROM ingested_files")
+            ]
+        finally:
+            connection.close()
+        for path in paths:
+            covered = any(
+                path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+                for root in roots
+            )
+            if not covered or os.path.exists(path):
+                continue
+            try:
+                self._remove_previous(path)
+                connection = self._connect()
+                try:
+                    connection.execute(
+                        "DELETE FROM ingested_files WHERE path = ?", (path,)
+                    )
+                finally:
+                    connection.close()
+                self._count(files_removed=1)
+            except Exception as error:  # noqa: BLE001
+                self._fail(path, error)
+
+    def _embed_and_store(
+        self, path: str, title: str, chunks: Sequence[str], content_hash: str
+    ) -> None:
+        for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+            batch = list(chunks[start : start + EMBED_BATCH_SIZE])
+            ids = [
+                _chunk_id(path, content_hash, start + offset)
+                for offset in range(len(batch))
+            ]
+            metadatas = [
+                {
+                    "source": path,
+                    "title": title,
+                    "chunk": start + offset,
+                    "hash": content_hash,
+                }
+                for offset in range(len(batch))
+            ]
+            embeddings = [
+                [float(value) for value in vector]
+                for vector in database.default_embedding_function(batch)
+            ]
+            local_index.add_documents(
+                [
+                    {
+                        "id": ids[offset],
+                        "content": chunk,
+                        "source": path,
+                        "title": title,
+                        "metadata": metadatas[offset],
+                    }
+                    for offset, chunk in enumerate(batch)
+                ],
+                embeddings=embeddings,
+            )
+            self._count(chunks=len(batch))
+
+    def _extract_triples(
+        self, path: str, content_hash: str, chunks: Sequence[str]
+    ) -> None:
+        # Cada trecho extraido fica registrado; falhas deixam o arquivo em
+        # STATUS_EMBEDDED e a retomada so extrai os trechos que faltaram.
+        extracted = self._extracted_chunks(path, content_hash)
+        missing = [index for index in range(len(chunks)) if index not in extracted]
+        triples_per_chunk, failures = agente_consolidacao.extract_knowledge_by_text(
+            [chunks[index] for index in missing]
+        )
+        for position, triples in enumerate(triples_per_chunk):
+            if position in failures:
+                continue
+            if triples:
+                database.save_knowledge_triples(triples)
+            self._mark_chunk(path, content_hash, missing[position], len(triples))
+            extracted[missing[position]] = len(triples)
+            self._count(triples=len(triples))
+        if failures:
+            raise RuntimeError(
+                f"{len(failures)} de {len(chunks)} trechos sem triplas: "
+                f"{next(iter(failures.values()))}"
+            )
+        self._mark(
+            path, content_hash, STATUS_DONE, len(chunks), sum(extracted.values())
+        )
+
+    # ------------------------------------------------------------------
+    # API publica
+    # ------------------------------------------------------------------
+    def ingest(
+        self,
+        paths: Sequence[str],
+        extract_triples: bool = True,
+        force: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Ingere os arquivos sob `paths`. Arquivos com o mesmo hash ja ingeridos
+        sao pulados (ou so recebem as triplas pendentes); `force` reprocessa.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError("Ja existe uma ingestao em andamento.")
+        try:
+            return self._ingest_locked(paths, extract_triples, force)
+        finally:
+            self._run_lock.release()
+
+    def _ingest_locked(
+        self,
+        paths: Sequence[str],
+        extract_triples: bool,
+        force: bool,
+    ) -> Dict[str, Any]:
+        """Corpo de `ingest`; quem chama ja possui `_run_lock`."""
+        files = list(iter_files(paths))
+        with self._lock:
+            self._progress = {
+                "status": "running",
+                "files_total": len(files),
+                "files_done": 0,
+                "files_skipped": 0,
+                "files_failed": 0,
+                "files_removed": 0,
+                "chunks": 0,
+                "triples": 0,
+                "bytes": 0,
+                "current": None,
+                "errors": [],
+                "started_at": time.time(),
+            }
+        self._prune_removed(paths)
+        pending: List[Tuple[str, Future]] = []
+        with ThreadPoolExecutor(
+            max_workers=EXTRACTION_WORKERS, thread_name_prefix="nexus-ingest"
+        ) as executor:
+            for path in files:
+                self._update(current=path)
+                try:
+                    future = self._ingest_file(path, extract_triples, force, executor)
+                except Exception as error:  # noqa: BLE001
+                    self._fail(path, error)
+                    continue
+                if future is not None:
+                    pending.append((path, future))
+                # Contrapressao: a leitura nao corre muito a frente da extracao.
+                while len(pending) > MAX_PENDING_EXTRACTIONS:
+                    self._collect(*pending.pop(0))
+            for path, future in pending:
+                self._collect(path, future)
+        self._update(status="idle", current=None, finished_at=time.time())
+        report = self.progress()
+        print(
+            f"[Ingestao] {report['files_done']} arquivos ingeridos, "
+            f"{report['files_skipped']} sem mudanca, {report['files_removed']} removidos, "
+            f"{report['files_failed']} com falha "
+            f"({report['chunks']} trechos, {report['triples']} triplas, "
+            f"{report.get('elapsed_seconds', 0)}s)."
+        )
+        return report
+
+    def _ingest_file(
+        self,
+        path: str,
+        extract_triples: bool,
+        force: bool,
+        executor: ThreadPoolExecutor,
+    ) -> Future | None:
+        title, text = read_document(path)
+        text = text.strip()
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        previous = self._manifest(path)
+        chunks = agente_consolidacao.chunk_text(text, max_tokens=CHUNK_TOKENS)
+        self._count(bytes=len(text.encode("utf-8")))
+
+        unchanged = (
+            previous is not None
+            and previous["content_hash"] == content_hash
+            and not force
+        )
+        if unchanged and (previous["status"] == STATUS_DONE or not extract_triples):
+            self._count(files_skipped=1)
+            return None
+        if not unchanged:
+            if previous is not None:
+                self._remove_previous(path)
+            if chunks:
+                self._embed_and_store(path, title, chunks, content_hash)
+            self._mark(path, content_hash, STATUS_EMBEDDED, len(chunks))
+        if not extract_triples or not chunks:
+            self._count(files_done=1)
+            return None
+        # Retomada: trechos ja gravados, so as triplas estavam pendentes.
+        return executor.submit(self._extract_triples, path, content_hash, chunks)
+
+    def _collect(self, path: str, future: Future) -> None:
+        try:
+            future.result()
+            self._count(files_done=1)
+        except Exception as error:  # noqa: BLE001
+            self._fail(path, error)
+
+    def _fail(self, path: str, error: Exception) -> None:
+        print(f"[Ingestao] Falha em '{path}': {error}")
+        with self._lock:
+            self._progress["files_failed"] = self._progress.get("files_failed", 0) + 1
+            errors = self._progress.setdefault("errors", [])
+            if len(errors) < 20:
+                errors.append({"path": path, "error": str(error)})
+
+    def start(
+        self, paths: Sequence[str], extract_triples: bool = True, force: bool = False
+    ) -> bool:
+        """
+        Roda a ingestao numa thread propria (endpoint). Nao usa a fila em
+        segundo plano porque lotes longos estourariam o lease das tarefas.
+        Retorna False se ja houver uma ingestao em andamento.
+        """
+        # A trava e obtida aqui e repassada a thread: dois POSTs simultaneos
+        # nao podem ambos receber "started".
+        if not self._run_lock.acquire(blocking=False):
+            return False
+
+        def run() -> None:
+            try:
+                self._ingest_locked(paths, extract_triples, force)
+            except Exception as error:  # noqa: BLE001
+                print(f"[Ingestao] Ingestao interrompida: {error}")
+            finally:
+                self._run_lock.release()
+
+        try:
+            threading.Thread(target=run, name="nexus-ingestion", daemon=True).start()
+        except Exception:
+            self._run_lock.release()
+            raise
+        return True
+
+
+def resolve_ingest_paths(paths: Sequence[str]) -> List[str]:
+    """Caminhos pedidos via API, restritos a NEXUS_INGEST_ROOT."""
+    root = os.path.realpath(INGEST_ROOT)
+    resolved: List[str] = []
+    for path in paths or ["."]:
+        candidate = os.path.realpath(os.path.join(root, path))
+        if candidate != root and not candidate.startswith(root + os.sep):
+            raise ValueError(f"Caminho fora de {INGEST_ROOT}: {path}")
+        resolved.append(candidate)
+    return resolved
+
+
+ingestion_pipeline = IngestionPipeline()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Ingere documentos na base de conhecimento do Nexus."
+    )
+    parser.add_argument("paths", nargs="+", help="Arquivos ou diretorios a ingerir.")
+    parser.add_argument(
+        "--no-triples", action="store_true", help="Nao extrai triplas para o Neo4j."
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Reprocessa arquivos sem mudanca."
+    )
+    args = parser.parse_args(argv)
+
+    done = threading.Event()
+
+    def report_progress() -> None:
+        while not done.wait(5.0):
+            snapshot = ingestion_pipeline.progress()
+            if snapshot.get("status") == "running":
+                print(
+                    f"[Ingestao] {snapshot['files_done'] + snapshot['files_skipped']}"
+                    f"/{snapshot['files_total']} arquivos, {snapshot['chunks']} trechos, "
+                    f"{snapshot['triples']} triplas, "
+                    f"{snapshot.get('chunks_per_second', 0)} trechos/s"
+                )
+
+    reporter = threading.Thread(target=report_progress, daemon=True)
+    reporter.start()
+    try:
+        ingestion_pipeline.ingest(
+            args.paths, extract_triples=not args.no_triples, force=args.force
+        )
+    finally:
+        done.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+import database
+
+# Primeiro nivel da classificacao de intencao: kNN sobre embeddings locais
+# (mesmo modelo do ChromaDB) de pares (mensagem, intencao) ja classificados
+# pelo LLM. Sementes rotuladas pela heuristica cobrem o inicio a frio.
+EXAMPLES_PATH = os.getenv(
+    "NEXUS_INTENT_EXAMPLES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "nexus_intents.sqlite3"),
+)
+CONFIDENCE_THRESHOLD = float(os.getenv("NEXUS_INTENT_LOCAL_THRESHOLD", 0.75))
+NEIGHBORS = 7
+FULL_SIMILARITY = 0.6  # Similaridade a partir da qual o vizinho conta por inteiro
+SEED_WEIGHT = 0.5
+MAX_EXAMPLES = 5000
+CACHE_SIZE = 1024
+CACHE_TTL = 3600.0  # Segundos
+MIN_CACHE_WORDS = 3  # Mensagens curtas ("sim", "e ai?") dependem do historico
+
+SEED_MESSAGES = [
+    "quais as ultimas noticias sobre tecnologia",
+    "o que aconteceu hoje no mundo",
+    "novidades do mercado financeiro",
+    "explique como funciona a fotossintese",
+    "pesquisar sobre computacao quantica",
+    "por que o ceu e azul",
+    "me lembre amanha de pagar a conta",
+    "lembrete para a reuniao na sexta",
+    "coloque na agenda o dentista no dia 10",
+    "quero planejar um projeto de aplicativo",
+    "vamos definir o mvp do projeto",
+    "escreva codigo python para ler um csv",
+    "tem um bug nessa funcao javascript",
+    "refatore esse html e css",
+    "desenhe a infraestrutura de microsservicos",
+    "diagrama dos servicos do sistema",
+    "oi, tudo bem?",
+    "ola, como vai voce",
+    "so queria conversar um pouco",
+    "tive uma ideia de negocio",
+    "pensei em um conceito novo de app",
+    "anote que o wifi de casa mudou",
+    "guardar: a senha do portao e 1234",
+]
+
+
+def normalize_message(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def _embed(texts: List[str]) -> np.ndarray:
+    vectors = np.asarray(database.default_embedding_function(texts), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class LocalIntentClassifier:
+    """Classificador kNN com exemplos persistidos em SQLite e cache por mensagem."""
+
+    def __init__(self, path: str = EXAMPLES_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._labels: List[str] = []
+        self._weights = np.zeros(0, dtype=np.float32)
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._counters = {
+            "cache_hits": 0,
+            "local_hits": 0,
+            "escalations": 0,
+            "learned": 0,
+            "contextual": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS intent_examples (
+                text TEXT PRIMARY KEY,
+                intent TEXT NOT NULL,
+                source TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        return connection
+
+    def _load(self, seed_labeler: Callable[[str], str] | None) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            connection = self._connect()
+            try:
+                rows = connection.execute(
+                    "SELECT intent, source, embedding FROM ("
+                    "SELECT * FROM intent_examples ORDER BY created_at DESC LIMIT ?"
+                    ") ORDER BY created_at ASC",
+                    (MAX_EXAMPLES,),
+                ).fetchall()
+                if not rows and seed_labeler is not None:
+                    vectors = _embed(SEED_MESSAGES)
+                    now = time.time()
+                    seeds = [
+                        (
+                            text,
+                            seed_labeler(text),
+                            "seed",
+                            vectors[index].tobytes(),
+                            now,
+                        )
+                        for index, text in enumerate(SEED_MESSAGES)
+                    ]
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO intent_examples VALUES (?, ?, ?, ?, ?)",
+                        seeds,
+                    )
+                    rows = [
+                        (intent, source, blob) for _, intent, source, blob, _ in seeds
+                    ]
+            finally:
+                connection.close()
+            if rows:
+                self._vectors = np.vstack(
+                    [np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows]
+                )
+                self._labels = [intent for intent, _, _ in rows]
+                self._weights = np.array(
+                    [SEED_WEIGHT if source == "seed" else 1.0 for _, source, _ in rows],
+                    dtype=np.float32,
+                )
+            self._loaded = True
+
+    # ------------------------------------------------------------------
+    # API publica
+    # ------------------------------------------------------------------
+    def cached(self, text: str) -> str | None:
+        key = normalize_message(text)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            stored_at, intent = entry
+            if time.time() - stored_at > CACHE_TTL:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self._counters["cache_hits"] += 1
+            return intent
+
+    def remember(self, text: str, intent: str) -> None:
+        key = normalize_message(text)
+        if len(key.split()) < MIN_CACHE_WORDS:
+            return
+        with self._lock:
+            self._cache[key] = (time.time(), intent)
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def predict(
+        self,
+        text: str,
+        seed_labeler: Callable[[str], str] | None = None,
+    ) -> Tuple[str | None, float]:
+        """
+        Intencao mais votada entre os vizinhos mais proximos e a confianca
+        (fracao do voto ponderado, atenuada quando os vizinhos estao longe).
+        """
+        self._load(seed_labeler)
+        if not self._labels or not text.strip():
+            return None, 0.0
+        query = _embed([normalize_message(text)])[0]
+        with self._lock:
+            vectors, labels, weights = self._vectors, self._labels, self._weights
+        similarities = vectors @ query
+        top = np.argsort(-similarities)[:NEIGHBORS]
+        votes: Dict[str, float] = {}
+        for index in top:
+            similarity = max(float(similarities[index]), 0.0)
+            label = labels[index]
+            votes[label] = votes.get(label, 0.0) + similarity * float(weights[index])
+        total = sum(votes.values())
+        if total <= 0:
+            return None, 0.0
+        intent = max(votes, key=votes.get)
+        best_similarity = max(
+            float(similarities[index]) for index in top if labels[index] == intent
+        )
+        confidence = (votes[intent] / total) * min(
+            1.0, best_similarity / FULL_SIMILARITY
+        )
+        return intent, round(confidence, 3)
+
+    def learn(self, text: str, intent: str, source: str = "llm") -> None:
+        """Registra um exemplo classificado (o mais recente vence para o mesmo texto)."""
+        key = normalize_message(text)
+        if not key or not intent:
+            return
+        vector = _embed([key])[0]
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO intent_examples VALUES (?, ?, ?, ?, ?)",
+                (key, intent, source, vector.tobytes(), time.time()),
+            )
+        finally:
+            connection.close()
+        with self._lock:
+            if self._loaded:
+                self._vectors = (
+                    np.vstack([self._vectors, vector])
+                    if len(self._labels)
+                    else vector[None, :]
+                )
+                self._labels = self._labels + [intent]
+                self._weights = np.append(self._weights, np.float32(1.0))
+                if len(self._labels) > MAX_EXAMPLES:
+                    self._vectors = self._vectors[-MAX_EXAMPLES:]
+                    self._labels = self._labels[-MAX_EXAMPLES:]
+                    self._weights = self._weights[-MAX_EXAMPLES:]
+            self._counters["learned"] += 1
+
+    def count(self, event: str) -> None:
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._counters,
+                "examples": len(self._labels),
+                "cached": len(self._cache),
+            }
+
+
+local_classifier = LocalIntentClassifier()
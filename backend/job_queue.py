@@ -0,0 +1,587 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+# Fila persistente local (SQLite) para trabalho em segundo plano.
+# Substitui os BackgroundTasks do FastAPI: as tarefas sobrevivem a reinicios
+# e rodam num pool de workers separado do atendimento das requisicoes.
+JOB_QUEUE_PATH = os.getenv(
+    "NEXUS_JOB_QUEUE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "nexus_jobs.sqlite3"),
+)
+DEFAULT_WORKERS = int(os.getenv("NEXUS_JOB_WORKERS", 2))
+MAX_PENDING_JOBS = int(os.getenv("NEXUS_JOB_MAX_PENDING", 500))
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 5.0  # Segundos; dobra a cada nova tentativa
+JOB_LEASE_SECONDS = 600.0  # Tarefas "running" mais velhas que isso sao retomadas
+HEARTBEAT_INTERVAL = JOB_LEASE_SECONDS / 4  # Renovacao da lease das tarefas em execucao
+JOB_RETENTION_SECONDS = 7 * 24 * 3600.0  # Historico usado para deduplicacao
+POLL_INTERVAL = 1.0
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+ENQUEUED = "enqueued"
+DUPLICATE = "duplicate"
+REJECTED = "rejected"
+
+
+def _content_hash(value: Any) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    normalized = " ".join(value.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class PartialBatchError(Exception):
+    """
+    Lote concluido em parte: `failures` mapeia a posicao do payload no lote
+    ao erro. So essas tarefas voltam para nova tentativa; as demais concluem.
+    """
+
+    def __init__(self, failures: Dict[int, Exception]) -> None:
+        super().__init__(f"{len(failures)} tarefa(s) do lote falharam")
+        self.failures = failures
+
+
+class JobQueue:
+    """
+    Fila de tarefas com workers proprios, limite de concorrencia por tipo,
+    novas tentativas com backoff, deduplicacao por hash de conteudo e
+    metricas de contrapressao.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: int = DEFAULT_WORKERS,
+        max_pending: int = MAX_PENDING_JOBS,
+    ) -> None:
+        self.path = path
+        self.worker_count = max(1, workers)
+        self.max_pending = max_pending
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, int] = {}
+        self._active_ids: Dict[int, int] = {}  # id da tarefa -> workers executando
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._counters: Dict[str, int] = {
+            "enqueued": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "completed": 0,
+            "retried": 0,
+            "failed": 0,
+        }
+        self._initialized = False
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _ensure_schema(self) -> None:
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            connection = self._connect()
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        kind TEXT NOT NULL,
+                        payload TEXT NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        max_attempts INTEGER NOT NULL,
+                        available_at REAL NOT NULL,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL,
+                        last_error TEXT
+                    )
+                    """
+                )
+                connection.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS jobs_kind_hash ON jobs (kind, content_hash)"
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, kind, available_at)"
+                )
+            finally:
+                connection.close()
+            self._initialized = True
+
+    # ------------------------------------------------------------------
+    # API publica
+    # ------------------------------------------------------------------
+    def register_handler(
+        self,
+        kind: str,
+        func: Callable[[Any], None],
+        concurrency: int = 1,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        batch_size: int = 1,
+        batch_window: float = 0.0,
+    ) -> None:
+        """
+        Associa um tipo de tarefa a funcao que a executa.
+        Com batch_size > 1 a funcao recebe uma lista de payloads, coalescidos
+        ate o lote encher ou a tarefa mais antiga esperar batch_window segundos.
+        """
+        self._handlers[kind] = {
+            "function": func,
+            "concurrency": max(1, concurrency),
+            "max_attempts": max(1, max_attempts),
+            "batch_size": max(1, batch_size),
+            "batch_window": max(0.0, batch_window),
+        }
+        self._running.setdefault(kind, 0)
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        dedup_key: Any = None,
+    ) -> str:
+        """
+        Persiste uma nova tarefa. Retorna ENQUEUED, DUPLICATE (mesmo conteudo
+        ja enfileirado ou processado) ou REJECTED (fila cheia).
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de tarefa '{kind}' nao registrado.")
+        self._ensure_schema()
+
+        content_hash = _content_hash(dedup_key if dedup_key is not None else payload)
+        max_attempts = self._handlers[kind]["max_attempts"]
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            existing = connection.execute(
+                "SELECT id, status FROM jobs WHERE kind = ? AND content_hash = ?",
+                (kind, content_hash),
+            ).fetchone()
+            if existing and existing["status"] != STATUS_FAILED:
+                connection.execute("COMMIT")
+                self._count("duplicates")
+                return DUPLICATE
+
+            pending = connection.execute(
+                "SELECT count(*) FROM jobs WHERE status = ?",
+                (STATUS_PENDING,),
+            ).fetchone()[0]
+            if pending >= self.max_pending:
+                connection.execute("COMMIT")
+                self._count("rejected")
+                print(
+                    f"[Job Queue] Fila cheia ({pending}/{self.max_pending}). "
+                    f"Tarefa '{kind}' descartada."
+                )
+                return REJECTED
+
+            if existing:
+                connection.execute(
+                    """
+                    UPDATE jobs
+                    SET payload = ?, status = ?, attempts = 0, max_attempts = ?,
+                        available_at = ?, updated_at = ?, last_error = NULL
+                    WHERE id = ?
+                    """,
+                    (
+                        json.dumps(payload, ensure_ascii=False),
+                        STATUS_PENDING,
+                        max_attempts,
+                        now,
+                        now,
+                        existing["id"],
+                    ),
+                )
+            else:
+                connection.execute(
+                    """
+                    INSERT INTO jobs (kind, payload, content_hash, status, attempts,
+                                      max_attempts, available_at, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)
+                    """,
+                    (
+                        kind,
+                        json.dumps(payload, ensure_ascii=False),
+                        content_hash,
+                        STATUS_PENDING,
+                        max_attempts,
+                        now,
+                        now,
+                        now,
+                    ),
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+        self._count("enqueued")
+        self._wakeup.set()
+        return ENQUEUED
+
+    def start(self) -> None:
+        """Inicia o pool de workers (idempotente)."""
+        if self._threads:
+            return
+        self._ensure_schema()
+        self.purge_expired()
+        self._stop.clear()
+        for index in range(self.worker_count):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"nexus-job-worker-{index}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, name="nexus-job-heartbeat", daemon=True
+        )
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        print(f"[Job Queue] {self.worker_count} workers iniciados ({self.path}).")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Sinaliza parada e aguarda os workers terminarem a tarefa atual."""
+        if not self._threads:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.time()))
+        self._threads = []
+        print("[Job Queue] Workers finalizados.")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna contagens por estado/tipo e sinais de contrapressao."""
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            by_status: Dict[str, int] = {}
+            by_kind: Dict[str, Dict[str, int]] = {}
+            for row in connection.execute(
+                "SELECT kind, status, count(*) AS total FROM jobs GROUP BY kind, status"
+            ):
+                by_status[row["status"]] = (
+                    by_status.get(row["status"], 0) + row["total"]
+                )
+                by_kind.setdefault(row["kind"], {})[row["status"]] = row["total"]
+            oldest = connection.execute(
+                "SELECT min(created_at) FROM jobs WHERE status = ?",
+                (STATUS_PENDING,),
+            ).fetchone()[0]
+        finally:
+            connection.close()
+
+        pending = by_status.get(STATUS_PENDING, 0)
+        with self._lock:
+            running = dict(self._running)
+            counters = dict(self._counters)
+        return {
+            "workers": len(self._threads),
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "saturation": round(pending / self.max_pending, 3)
+            if self.max_pending
+            else 0.0,
+            "oldest_pending_age_seconds": round(time.time() - oldest, 1)
+            if oldest
+            else 0.0,
+            "running": running,
+            "by_status": by_status,
+            "by_kind": by_kind,
+            "counters": counters,
+        }
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def _available_kinds(self) -> List[str]:
+        with self._lock:
+            return [
+                kind
+                for kind, handler in self._handlers.items()
+                if self._running.get(kind, 0) < handler["concurrency"]
+            ]
+
+    def _claim(self) -> List[Dict[str, Any]]:
+        kinds = self._available_kinds()
+        if not kinds:
+            return []
+        now = time.time()
+        placeholders = ", ".join("?" for _ in kinds)
+        claimed_kind: str | None = None
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # Retoma tarefas cujo worker morreu (processo reiniciado no meio);
+            # as que ja gastaram todas as tentativas falham de vez, para uma
+            # tarefa que derruba o processo nao voltar para sempre.
+            expired = connection.execute(
+                """
+                UPDATE jobs SET status = ?, updated_at = ?, last_error = ?
+                WHERE status = ? AND updated_at < ? AND attempts >= max_attempts
+                """,
+                (
+                    STATUS_FAILED,
+                    now,
+                    "Lease expirada na ultima tentativa",
+                    STATUS_RUNNING,
+                    now - JOB_LEASE_SECONDS,
+                ),
+            ).rowcount
+            connection.execute(
+                "UPDATE jobs SET status = ?, available_at = ? WHERE status = ? AND updated_at < ?",
+                (STATUS_PENDING, now, STATUS_RUNNING, now - JOB_LEASE_SECONDS),
+            )
+            if expired > 0:
+                self._count("failed", expired)
+            # Tipos com tarefas disponiveis, do mais atrasado para o mais recente.
+            candidates = connection.execute(
+                f"""
+                SELECT kind, min(available_at) AS oldest FROM jobs
+                WHERE status = ? AND available_at <= ? AND kind IN ({placeholders})
+                GROUP BY kind
+                ORDER BY oldest ASC
+                """,
+                (STATUS_PENDING, now, *kinds),
+            ).fetchall()
+
+            rows: List[sqlite3.Row] = []
+            for candidate in candidates:
+                handler = self._handlers[candidate["kind"]]
+                batch_size = handler["batch_size"]
+                rows = connection.execute(
+                    """
+                    SELECT id, kind, payload, attempts, max_attempts FROM jobs
+                    WHERE status = ? AND available_at <= ? AND kind = ?
+                    ORDER BY available_at ASC, id ASC
+                    LIMIT ?
+                    """,
+                    (STATUS_PENDING, now, candidate["kind"], batch_size),
+                ).fetchall()
+                # Lote incompleto espera a janela de coalescencia expirar.
+                if (
+                    len(rows) < batch_size
+                    and now - candidate["oldest"] < handler["batch_window"]
+                ):
+                    rows = []
+                    continue
+                if rows:
+                    break
+
+            if not rows:
+                connection.execute("COMMIT")
+                return []
+            kind = rows[0]["kind"]
+            with self._lock:
+                if self._running.get(kind, 0) >= self._handlers[kind]["concurrency"]:
+                    connection.execute("COMMIT")
+                    return []
+                self._running[kind] = self._running.get(kind, 0) + 1
+                claimed_kind = kind
+            connection.executemany(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(STATUS_RUNNING, now, row["id"]) for row in rows],
+            )
+            connection.execute("COMMIT")
+            return [dict(row) for row in rows]
+        except Exception:
+            connection.execute("ROLLBACK")
+            if claimed_kind is not None:
+                with self._lock:
+                    self._running[claimed_kind] -= 1
+            raise
+        finally:
+            connection.close()
+
+    def _finish(
+        self,
+        jobs: List[Dict[str, Any]],
+        error: Exception | None,
+        corrupt: Dict[int, Exception] | None = None,
+        failures: Dict[int, Exception] | None = None,
+    ) -> None:
+        now = time.time()
+        corrupt = corrupt or {}
+        failures = failures or {}
+        connection = self._connect()
+        try:
+            for job in jobs:
+                attempts = job["attempts"] + 1
+                job_error = failures.get(job["id"], error)
+                if job["id"] in corrupt:
+                    # Nova tentativa nao conserta o payload: falha definitiva.
+                    connection.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ?, last_error = ? WHERE id = ?",
+                        (
+                            STATUS_FAILED,
+                            now,
+                            f"Payload invalido: {corrupt[job['id']]}",
+                            job["id"],
+                        ),
+                    )
+                    self._count("failed")
+                elif job_error is None:
+                    connection.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ?, last_error = NULL WHERE id = ?",
+                        (STATUS_DONE, now, job["id"]),
+                    )
+                    self._count("completed")
+                elif attempts >= job["max_attempts"]:
+                    connection.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ?, last_error = ? WHERE id = ?",
+                        (STATUS_FAILED, now, str(job_error), job["id"]),
+                    )
+                    self._count("failed")
+                else:
+                    delay = RETRY_BASE_DELAY * (2 ** (attempts - 1))
+                    connection.execute(
+                        """
+                        UPDATE jobs SET status = ?, available_at = ?, updated_at = ?, last_error = ?
+                        WHERE id = ?
+                        """,
+                        (STATUS_PENDING, now + delay, now, str(job_error), job["id"]),
+                    )
+                    self._count("retried")
+        finally:
+            connection.close()
+            kind = jobs[0]["kind"]
+            with self._lock:
+                self._running[kind] = max(0, self._running.get(kind, 1) - 1)
+
+    def purge_expired(self) -> int:
+        """Apaga tarefas concluidas/falhas mais velhas que a retencao."""
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            removed = connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (STATUS_DONE, STATUS_FAILED, time.time() - JOB_RETENTION_SECONDS),
+            ).rowcount
+        finally:
+            connection.close()
+        if removed:
+            print(f"[Job Queue] {removed} tarefas antigas removidas do historico.")
+        return removed
+
+    def _heartbeat(self) -> None:
+        """Renova `updated_at` das tarefas em execucao para a lease nao expirar."""
+        with self._lock:
+            job_ids = list(self._active_ids)
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" for _ in job_ids)
+        connection = self._connect()
+        try:
+            connection.execute(
+                f"UPDATE jobs SET updated_at = ? WHERE status = ? AND id IN ({placeholders})",
+                (time.time(), STATUS_RUNNING, *job_ids),
+            )
+        finally:
+            connection.close()
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                self._heartbeat()
+            except Exception as error:  # noqa: BLE001
+                print(f"[Job Queue] Falha ao renovar lease das tarefas: {error}")
+
+    def _track(self, jobs: List[Dict[str, Any]], active: bool) -> None:
+        with self._lock:
+            for job in jobs:
+                count = self._active_ids.get(job["id"], 0) + (1 if active else -1)
+                if count > 0:
+                    self._active_ids[job["id"]] = count
+                else:
+                    self._active_ids.pop(job["id"], None)
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                jobs = self._claim()
+            except Exception as error:  # noqa: BLE001
+                print(f"[Job Queue] Falha ao buscar tarefa: {error}")
+                jobs = []
+
+            if not jobs:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+
+            kind = jobs[0]["kind"]
+            handler = self._handlers[kind]
+            error: Exception | None = None
+            # Payload corrompido falha so a propria tarefa, sem derrubar o worker.
+            payloads: List[Any] = []
+            payload_ids: List[int] = []
+            corrupt: Dict[int, Exception] = {}
+            failures: Dict[int, Exception] = {}
+            for job in jobs:
+                try:
+                    payloads.append(json.loads(job["payload"]))
+                    payload_ids.append(job["id"])
+                except (TypeError, ValueError) as exc:
+                    corrupt[job["id"]] = exc
+                    print(
+                        f"[Job Queue] Payload invalido na tarefa {job['id']} ({kind}): {exc}"
+                    )
+            self._track(jobs, active=True)
+            try:
+                if payloads and handler["batch_size"] > 1:
+                    handler["function"](payloads)
+                elif payloads:
+                    handler["function"](payloads[0])
+            except PartialBatchError as exc:
+                failures = {
+                    payload_ids[position]: failure
+                    for position, failure in exc.failures.items()
+                    if 0 <= position < len(payload_ids)
+                }
+                job_ids = ", ".join(str(job_id) for job_id in failures)
+                print(f"[Job Queue] Tarefa(s) {job_ids} ({kind}) falharam: {exc}")
+            except Exception as exc:  # noqa: BLE001
+                error = exc
+                job_ids = ", ".join(str(job["id"]) for job in jobs)
+                print(f"[Job Queue] Tarefa(s) {job_ids} ({kind}) falharam: {exc}")
+            finally:
+                self._track(jobs, active=False)
+            try:
+                self._finish(jobs, error, corrupt, failures)
+            except Exception as exc:  # noqa: BLE001
+                print(
+                    f"[Job Queue] Falha ao registrar resultado de tarefas '{kind}': {exc}"
+                )
+
+
+background_queue = JobQueue(JOB_QUEUE_PATH)
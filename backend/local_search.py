@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+import database
+from hybrid_retriever import fuse
+from prompt_budget import extract_terms
+
+# Base de conhecimento local: documentos ingeridos ficam num SQLite com indice
+# invertido FTS5 (ranking BM25, acentos ignorados) e embeddings do mesmo modelo
+# do ChromaDB. A busca funde as duas pernas por RRF, sem rede e sem cota.
+INDEX_PATH = os.getenv(
+    "NEXUS_LOCAL_INDEX_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "nexus_local_index.sqlite3"
+    ),
+)
+LEG_LIMIT = 20
+MIN_VECTOR_SIMILARITY = 0.3
+EMBED_BATCH_SIZE = 64
+MAX_QUERY_TERMS = 12
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _embed(texts: List[str]) -> np.ndarray:
+    batches = [
+        np.asarray(
+            database.default_embedding_function(texts[start : start + EMBED_BATCH_SIZE])
+        )
+        for start in range(0, len(texts), EMBED_BATCH_SIZE)
+    ]
+    return _normalize(np.vstack(batches))
+
+
+class LocalSearchIndex:
+    """Indice BM25 (FTS5) + vetorial sobre os documentos da base local."""
+
+    def __init__(self, path: str = INDEX_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._vectors: np.ndarray | None = None
+        self._rowids: np.ndarray | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _ensure_schema(self) -> None:
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            connection = self._connect()
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS documents (
+                        rowid INTEGER PRIMARY KEY,
+                        id TEXT NOT NULL UNIQUE,
+                        source TEXT NOT NULL,
+                        title TEXT,
+                        content TEXT NOT NULL,
+                        metadata TEXT,
+                        embedding BLOB,
+                        created_at REAL NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS documents_source ON documents (source);
+                    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                        title, content,
+                        content='documents', content_rowid='rowid',
+                        tokenize='unicode61 remove_diacritics 2'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+                        INSERT INTO documents_fts (rowid, title, content)
+                        VALUES (new.rowid, new.title, new.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+                        INSERT INTO documents_fts (documents_fts, rowid, title, content)
+                        VALUES ('delete', old.rowid, old.title, old.content);
+                    END;
+                    """
+                )
+            finally:
+                connection.close()
+            self._initialized = True
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def add_documents(
+        self,
+        documents: Sequence[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]] | None = None,
+    ) -> int:
+        """
+        Indexa documentos {id, content, source, title, metadata}; ids existentes
+        sao substituidos. `embeddings` evita recalcular vetores ja gerados.
+        """
+        documents = [document for document in documents if document.get("content")]
+        if not documents:
+            return 0
+        self._ensure_schema()
+        if embeddings is None:
+            vectors = _embed([document["content"] for document in documents])
+        else:
+            vectors = _normalize(np.asarray(embeddings))
+        now = time.time()
+        rows = [
+            (
+                str(document["id"]),
+                str(document.get("source") or ""),
+                document.get("title") or "",
+                document["content"],
+                json.dumps(document.get("metadata") or {}, ensure_ascii=False),
+                vectors[index].tobytes(),
+                now,
+            )
+            for index, document in enumerate(documents)
+        ]
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # DELETE explicito (e nao REPLACE) para o gatilho limpar o FTS.
+            connection.executemany(
+                "DELETE FROM documents WHERE id = ?", [(row[0],) for row in rows]
+            )
+            connection.executemany(
+                "INSERT INTO documents (id, source, title, content, metadata, embedding, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        self._invalidate_vectors()
+        return len(rows)
+
+    def delete_source(self, source: str) -> int:
+        """Remove todos os documentos de uma origem (ex.: arquivo reingerido)."""
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            removed = connection.execute(
+                "DELETE FROM documents WHERE source = ?", (source,)
+            ).rowcount
+        finally:
+            connection.close()
+        if removed:
+            self._invalidate_vectors()
+        return removed
+
+    def _invalidate_vectors(self) -> None:
+        with self._lock:
+            self._vectors = None
+            self._rowids = None
+
+    # ------------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------------
+    def _load_vectors(self) -> tuple:
+        with self._lock:
+            if self._vectors is not None:
+                return self._vectors, self._rowids
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT rowid, embedding FROM documents WHERE embedding IS NOT NULL"
+            ).fetchall()
+        finally:
+            connection.close()
+        if rows:
+            vectors = np.vstack(
+                [np.frombuffer(row["embedding"], dtype=np.float32) for row in rows]
+            )
+            rowids = np.array([row["rowid"] for row in rows], dtype=np.int64)
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+            rowids = np.zeros(0, dtype=np.int64)
+        with self._lock:
+            self._vectors, self._rowids = vectors, rowids
+        return vectors, rowids
+
+    def _fetch(
+        self, connection: sqlite3.Connection, rowids: List[int]
+    ) -> Dict[int, Dict[str, Any]]:
+        if not rowids:
+            return {}
+        placeholders = ",".join("?" for _ in rowids)
+        rows = connection.execute(
+            f"SELECT rowid, id, source, title, content, metadata FROM documents "
+            f"WHERE rowid IN ({placeholders})",
+            rowids,
+        ).fetchall()
+        return {
+            row["rowid"]: {
+                "id": row["id"],
+                "source": row["source"],
+                "title": row["title"],
+                "content": row["content"],
+                "metadata": json.loads(row["metadata"] or "{}"),
+            }
+            for row in rows
+        }
+
+    def _keyword_leg(self, connection: sqlite3.Connection, query: str) -> List[tuple]:
+        terms = extract_terms(query, max_terms=MAX_QUERY_TERMS)
+        if not terms:
+            return []
+        match = " OR ".join('"' + term.replace('"', "") + '"' for term in terms)
+        rows = connection.execute(
+            "SELECT rowid, bm25(documents_fts) AS rank FROM documents_fts "
+            "WHERE documents_fts MATCH ? ORDER BY rank LIMIT ?",
+            (match, LEG_LIMIT),
+        ).fetchall()
+        # bm25() do SQLite e negativo: quanto menor, mais relevante.
+        return [(row["rowid"], -float(row["rank"])) for row in rows]
+
+    def _vector_leg(self, query: str) -> List[tuple]:
+        vectors, rowids = self._load_vectors()
+        if not len(rowids):
+            return []
+        query_vector = _embed([query])[0]
+        if vectors.shape[1] != query_vector.shape[0]:
+            return []
+        scores = vectors @ query_vector
+        top = min(LEG_LIMIT, len(scores))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (int(rowids[index]), float(scores[index]))
+            for index in best
+            if scores[index] >= MIN_VECTOR_SIMILARITY
+        ]
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Os k documentos mais relevantes (fusao RRF de BM25 e similaridade)."""
+        if not query or not query.strip():
+            return []
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            keyword_hits = self._keyword_leg(connection, query)
+            vector_hits = self._vector_leg(query)
+            documents = self._fetch(
+                connection,
+                list(
+                    {rowid for rowid, _ in keyword_hits}
+                    | {rowid for rowid, _ in vector_hits}
+                ),
+            )
+        finally:
+            connection.close()
+
+        ranked: Dict[str, List[Dict[str, Any]]] = {"keyword": [], "vector": []}
+        for leg, hits, field in (
+            ("keyword", keyword_hits, "bm25"),
+            ("vector", vector_hits, "similarity"),
+        ):
+            for rowid, score in hits:
+                if rowid in documents:
+                    ranked[leg].append({**documents[rowid], field: round(score, 4)})
+        # fuse() guarda os campos da primeira perna; a similaridade vem da vetorial.
+        similarities = {
+            document["id"]: document["similarity"] for document in ranked["vector"]
+        }
+        fused = fuse(ranked)[:k]
+        for document in fused:
+            if document["id"] in similarities:
+                document["similarity"] = similarities[document["id"]]
+            document["score"] = round(document.pop("score_hibrido"), 5)
+            document.pop("confianca_intrinseca", None)
+        return fused
+
+    def count(self) -> int:
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            return int(
+                connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            )
+        finally:
+            connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        self._ensure_schema()
+        connection = self._connect()
+        try:
+            documents, sources = connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT source) FROM documents"
+            ).fetchone()
+        finally:
+            connection.close()
+        return {"documents": documents, "sources": sources, "path": self.path}
+
+
+local_index = LocalSearchIndex()
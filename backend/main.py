@@ -2,13 +2,15 @@
 from __future__ import annotations
 
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Any, Dict, List, Tuple
 
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from openai import OpenAI
 from pydantic import BaseModel
@@ -32,24 +34,39 @@ import agente_noticias
 import ferramentas
 import database
 import genesis
+import hybrid_retriever
+import job_queue
+from prompt_budget import PromptAssembler
 from db_connect import chroma_client, close_neo4j_connection, neo4j_driver
+from activation_buffer import activation_buffer
+from graph_projection import projection
+from cold_archive import cold_archive
+from ingestion import ingestion_pipeline, resolve_ingest_paths
+from local_search import local_index
+from memory_jobs import consolidation_engine
+from meta_prompt_store import meta_prompt_store
+from scheduler import maintenance_scheduler
+from synaptic_decay import effective_strength_cypher
+from tool_runtime import ToolTimeoutError, tool_runtime
+from message_writer import message_writer
 from database import (
     add_chat_message,
     create_chat_session,
     create_inbox_item,
-    get_all_sessions,
     get_chat_messages,
     get_inbox_item_by_id,
-    get_inbox_items,
+    get_recent_messages,
 )
 import agente_arquiteto
 from agente_nqr import NexusQuantumReasoning
 from models import (
     ChatInput,
     ChatMessage,
-    ChatSession,
+    ChatMessageView,
+    ChatSessionView,
     DevProject,
     InboxItem,
+    InboxItemView,
     SystemLog,
     SystemSettings,
 )
@@ -108,6 +125,12 @@ class IdeaInput(BaseModel):
     text: str
 
 
+class IngestRequest(BaseModel):
+    paths: List[str] = []
+    extract_triples: bool = True
+    force: bool = False
+
+
 def log_event(
     type: str,
     title: str,
@@ -191,31 +214,195 @@ def get_proactive_message_by_rule(item_type: str, content: str) -> str:
     )
 
 
+CHAT_HISTORY_WINDOW = 10
+# Mensagens ainda nao resumidas entram literalmente no prompt, mesmo fora da
+# janela acima (limitado ao buffer por sessao do session_cache).
+CHAT_UNSUMMARIZED_WINDOW = 50
+# Orcamentos (tokens) das secoes do prompt de chat.
+CHAT_CONTEXT_TOKENS = int(os.getenv("NEXUS_CHAT_CONTEXT_TOKENS", 1200))
+CHAT_HISTORY_TOKENS = int(os.getenv("NEXUS_CHAT_HISTORY_TOKENS", 1500))
+CHAT_SNIPPET_TOKENS = 300
+CHAT_SUMMARY_TOKENS = 400
+# Resumo incremental da conversa, atualizado fora do caminho critico.
+SUMMARY_JOB = "resumo_sessao"
+SUMMARY_EVERY_TURNS = int(os.getenv("NEXUS_SUMMARY_EVERY_TURNS", 5))
+SUMMARY_MAX_MESSAGES = 60
+# Camada fria: consultada quando a perna vetorial traz menos que isso.
+COLD_FALLBACK_MIN_HITS = 2
+COLD_ARCHIVE_RESULTS = 3
+COLD_MIN_SIMILARITY = 0.35
+LEARNING_JOB = "aprendizado"
+# Coalescencia de textos pendentes numa unica chamada de extracao.
+LEARNING_BATCH_SIZE = 8
+LEARNING_BATCH_WINDOW = 3.0  # Segundos
+# Chat especulativo: o RAG (e, em "full", a geracao) roda em paralelo com o
+# classificador de intencao; o resultado e descartado se o modo nao for chat.
+# "off" desativa, "rag" (default) antecipa so a recuperacao.
+SPECULATIVE_CHAT = os.getenv("NEXUS_SPECULATIVE_CHAT", "rag").strip().lower()
+# Um worker por requisicao sincrona simultanea (limite padrao de threads do
+# FastAPI/anyio), para a especulacao nao enfileirar atras de outras requisicoes.
+SPECULATIVE_WORKERS = 40
+_speculative_executor = ThreadPoolExecutor(
+    max_workers=SPECULATIVE_WORKERS, thread_name_prefix="nexus-speculative"
+)
+_speculation_lock = threading.Lock()
+_speculation_stats = {"hits": 0, "discarded": 0, "failures": 0, "inline": 0}
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     if genesis.is_memory_empty():
         genesis.perform_genesis()
     else:
         print("--- Memoria detectada. Nexus operante. ---")
+    database.ensure_indexes()
+    projection.start()
+    job_queue.background_queue.start()
+    await maintenance_scheduler.start()
     try:
         yield
     finally:
+        await maintenance_scheduler.stop()
+        tool_runtime.shutdown()
+        _speculative_executor.shutdown(wait=False, cancel_futures=True)
+        job_queue.background_queue.stop()
+        message_writer.stop()
+        activation_buffer.stop()
         print("--- Fechando conexão com o Neo4j ---")
         close_neo4j_connection()
 
 
-def background_learning_task(text_to_learn: str, source_topic: str):
+def background_learning_task(jobs: List[Dict[str, str]]) -> None:
     """
-    Função que roda em segundo plano para extrair e salvar conhecimento
-    sem bloquear a resposta principal para o usuário.
+    Executa em segundo plano (fila persistente) a extracao e o salvamento de
+    conhecimento de um lote de textos, sem bloquear a resposta ao usuario.
     """
-    print(f"[Background] Iniciando aprendizado sobre: '{source_topic}'...")
+    topics = ", ".join(f"'{job.get('topic') or ''}'" for job in jobs)
+    print(f"[Background] Iniciando aprendizado sobre: {topics}...")
+    texts = [job["text"] for job in jobs]
+    triples_per_text, failures = agente_consolidacao.extract_knowledge_by_text(texts)
+    for index, (job, fatos) in enumerate(zip(jobs, triples_per_text)):
+        if index in failures:
+            continue
+        try:
+            database.save_knowledge_triples(fatos)
+        except Exception as error:  # noqa: BLE001
+            failures[index] = error
+            continue
+        print(f"[Background] Aprendizado concluído para '{job.get('topic') or ''}'.")
+    if failures:
+        print(
+            f"[Background] ERRO durante o aprendizado de {len(failures)} "
+            f"de {len(jobs)} textos: {next(iter(failures.values()))}"
+        )
+        # So os textos que falharam voltam para a fila; os demais concluem.
+        raise job_queue.PartialBatchError(failures)
+
+
+def enqueue_learning(text_to_learn: str, source_topic: str) -> None:
+    """Enfileira o aprendizado na fila persistente (deduplicado pelo texto)."""
     try:
-        fatos = agente_consolidacao.extract_knowledge(text_to_learn)
-        database.save_knowledge_triples(fatos)
-        print(f"[Background] Aprendizado concluído para '{source_topic}'.")
-    except Exception as error:
-        print(f"[Background] ERRO durante o aprendizado: {error}")
+        status = job_queue.background_queue.enqueue(
+            LEARNING_JOB,
+            {"text": text_to_learn, "topic": source_topic},
+            dedup_key=text_to_learn,
+        )
+        if status != job_queue.ENQUEUED:
+            print(
+                f"[Background] Aprendizado sobre '{source_topic}' nao enfileirado ({status})."
+            )
+    except Exception as error:  # noqa: BLE001
+        print(f"[Background] Falha ao enfileirar aprendizado: {error}")
+
+
+def background_summary_task(payload: Dict[str, str]) -> None:
+    """
+    Atualiza o resumo da sessao com as mensagens ainda nao resumidas, deixando
+    de fora a janela recente (que ja entra literalmente no prompt).
+    """
+    session_id = payload["session_id"]
+    current = database.get_session_summary(session_id) or {}
+    messages = database.get_messages_since(
+        session_id,
+        current.get("covered_until"),
+        SUMMARY_MAX_MESSAGES + CHAT_HISTORY_WINDOW,
+    )
+    pending = messages[:-CHAT_HISTORY_WINDOW]
+    if not pending:
+        return
+    print(
+        f"[Background] Atualizando resumo da sessao {session_id} ({len(pending)} mensagens)..."
+    )
+    nqr_chat.compress_chat_history(
+        session_id,
+        [{"role": message.role, "content": message.content} for message in pending],
+        previous_summary=current.get("summary") or "",
+        covered_until=pending[-1].created_at,
+    )
+
+
+def schedule_summary(session_id: str, last_message_id: str) -> None:
+    """Conta os turnos da sessao e, a cada SUMMARY_EVERY_TURNS, enfileira o resumo."""
+    if not database.history_cache.count_turn(session_id, SUMMARY_EVERY_TURNS):
+        return
+    # Deduplica pelo intervalo a resumir: do fim do resumo atual ate esta mensagem.
+    current = database.get_session_summary(session_id) or {}
+    try:
+        job_queue.background_queue.enqueue(
+            SUMMARY_JOB,
+            {"session_id": session_id},
+            dedup_key=f"{session_id}:{current.get('covered_until') or ''}:{last_message_id}",
+        )
+    except Exception as error:  # noqa: BLE001
+        print(
+            f"[Background] Falha ao enfileirar resumo da sessao {session_id}: {error}"
+        )
+
+
+job_queue.background_queue.register_handler(
+    SUMMARY_JOB,
+    background_summary_task,
+)
+job_queue.background_queue.register_handler(
+    LEARNING_JOB,
+    background_learning_task,
+    concurrency=2,
+    batch_size=LEARNING_BATCH_SIZE,
+    batch_window=LEARNING_BATCH_WINDOW,
+)
+
+# Manutencao periodica (agendamentos configuraveis por variavel de ambiente).
+maintenance_scheduler.register(
+    "consolidacao_memoria",
+    consolidation_engine.run_cycle,
+    schedule=os.getenv("NEXUS_SCHEDULE_CONSOLIDATION", "24h"),
+    budget=1800,
+    cancel=consolidation_engine.cancel,
+)
+maintenance_scheduler.register(
+    "memoria_chroma",
+    agente_arquiteto.manage_chroma_memory,
+    schedule=os.getenv("NEXUS_SCHEDULE_CHROMA", "1h"),
+    budget=300,
+)
+maintenance_scheduler.register(
+    "meta_prompts",
+    meta_prompt_store.maintain,
+    schedule=os.getenv("NEXUS_SCHEDULE_META_PROMPT", "10m"),
+    budget=120,
+)
+maintenance_scheduler.register(
+    "fila_tarefas",
+    job_queue.background_queue.purge_expired,
+    schedule=os.getenv("NEXUS_SCHEDULE_JOB_PURGE", "6h"),
+    budget=60,
+)
+maintenance_scheduler.register(
+    "blueprint_cognitivo",
+    genesis.generate_cognitive_blueprint,
+    schedule=os.getenv("NEXUS_SCHEDULE_BLUEPRINT", "7d"),
+    budget=300,
+)
 
 
 def synthesize_tool_response(user_query: str, tool_name: str, tool_result: str) -> str:
@@ -284,179 +471,240 @@ def check_service_health(service_name: str) -> Tuple[bool, str]:
         return False, str(error)
 
 
-def retrieve_long_term_context(
+def retrieve_from_cold_archive(content: str, session_id: str) -> List[Dict[str, Any]]:
+    """
+    Busca mensagens da sessao ja despejadas do ChromaDB na camada fria.
+    Usada quando a memoria quente devolve pouco contexto.
+    """
+    try:
+        query_embedding = database.default_embedding_function([content])[0]
+        hits = cold_archive.search(
+            query_embedding,
+            k=COLD_ARCHIVE_RESULTS,
+            collection=f"chat_{session_id}",
+            min_score=COLD_MIN_SIMILARITY,
+        )
+    except Exception as error:  # noqa: BLE001
+        print(f"[RAG] Falha ao consultar a camada fria: {error}")
+        return []
+
+    documents: List[Dict[str, Any]] = []
+    for hit in hits:
+        role = (hit.get("metadata") or {}).get("role") or "mensagem"
+        documents.append(
+            {
+                "id": hit["id"],
+                "title": f"Arquivo:{role}",
+                "content": hit.get("document") or "",
+                "url": "",
+                "confianca_intrinseca": 0.0,
+                "status_memoria": "MCP",
+                "distance": round(1.0 - hit["score"], 4),
+                "source_label": f"Arquivo:{role}",
+                "context_line": f"ChatMem (arquivo)[{hit['id']}]: {hit.get('document') or ''}",
+            }
+        )
+    if documents:
+        print(f"[RAG] {len(documents)} trechos recuperados da camada fria.")
+    return documents
+
+
+def _retrieve_context_documents(
     content: str,
     session_id: str | None,
     exclude_message_id: str | None = None,
-) -> Tuple[str, List[Dict[str, str]], List[Dict[str, Any]]]:
-    """
-    Recupera contexto relevante a partir do Neo4j (memoria sinaptica) e ChromaDB.
-    Retorna texto consolidado e uma lista de fontes.
-    """
+    track_activation: bool = True,
+) -> List[Dict[str, Any]]:
     print(f"[RAG] Recuperando contexto para: '{content}' (sessao: {session_id})")
+    documents = hybrid_retriever.retrieve(
+        content,
+        session_id=session_id,
+        exclude_message_id=exclude_message_id,
+        track_activation=track_activation,
+    )
+    vector_hits = sum(
+        1 for document in documents if "vector" in document.get("legs", ())
+    )
+    if session_id and content and vector_hits < COLD_FALLBACK_MIN_HITS:
+        documents.extend(retrieve_from_cold_archive(content, session_id))
+    return documents
+
 
+def _context_from_documents(
+    documents: List[Dict[str, Any]],
+) -> Tuple[List[str], List[Dict[str, str]], List[Dict[str, Any]]]:
     context_lines: List[str] = []
     sources: List[Dict[str, str]] = []
     context_facts: List[Dict[str, Any]] = []
-    lowered = content.lower()
+    for document in documents:
+        context_lines.append(document.get("context_line") or document["content"])
+        source: Dict[str, Any] = {"title": document["source_label"], "url": ""}
+        if document.get("distance") is not None:
+            source["distance"] = document["distance"]
+        sources.append(source)
+        context_facts.append(
+            {
+                "content": document["content"],
+                "title": document["title"],
+                "confianca_intrinseca": document.get("confianca_intrinseca", 0.0),
+                "url": document.get("url") or "",
+                "status_memoria": document.get("status_memoria"),
+            }
+        )
+    return context_lines, sources, context_facts
 
-    # Consulta grafos (Neo4j)
-    if lowered:
-        try:
-            with neo4j_driver.session() as session:
-                result = session.run(
-                    """
-                    MATCH (n)
-                    WHERE toLower(coalesce(n.name, n.title, n.description, '')) CONTAINS $term
-                    OPTIONAL MATCH (n)-[r]->(m)
-                    WITH n, collect({rel: type(r), target: coalesce(m.name, m.title, m.id, '')}) AS rels
-                    RETURN n, rels
-                    LIMIT 5
-                    """,
-                    term=lowered,
-                )
-                for record in result:
-                    node = record["n"]
-                    rels = record["rels"] or []
-                    node_name = (
-                        node.get("name")
-                        or node.get("title")
-                        or node.get("id")
-                        or "NoName"
-                    )
-                    description = node.get("description")
-                    line_parts = [f"Neo4j Node: {node_name}"]
-                    if description:
-                        line_parts.append(f"Descricao: {description}")
-                    if rels:
-                        rel_text = "; ".join(
-                            f"{item.get('rel')} -> {item.get('target')}"
-                            for item in rels
-                            if item.get("rel")
-                        )
-                        if rel_text:
-                            line_parts.append(f"Relacoes: {rel_text}")
-                    combined_text = " | ".join(line_parts)
-                    context_lines.append(combined_text)
-                    intrinsic = float(node.get("confianca_intrinseca", 0.0) or 0.0)
-                    context_facts.append(
-                        {
-                            "content": combined_text,
-                            "title": node_name,
-                            "confianca_intrinseca": intrinsic,
-                            "url": node.get("fonte_url") or "",
-                            "status_memoria": node.get("status_memoria"),
-                        }
-                    )
-                    sources.append(
-                        {
-                            "title": f"Neo4j:{node_name}",
-                            "url": "",
-                        }
-                    )
-        except Exception as error:  # noqa: BLE001
-            print(f"[RAG] ERRO ao consultar Neo4j: {error}")
 
-    # Consulta memoria de curto prazo (ChromaDB)
-    if session_id:
-        collection_name = f"chat_{session_id}"
-        try:
-            collection = chroma_client.get_or_create_collection(
-                name=collection_name,
-                embedding_function=database.default_embedding_function,
-            )
-            query_result = collection.query(
-                query_texts=[content],
-                n_results=3,
-                include=["metadatas", "documents", "distances"],
-            )
-            documents = query_result.get("documents", [[]])[0]
-            metadatas = query_result.get("metadatas", [[]])[0]
-            ids = query_result.get("ids", [[]])[0]
-            distances = query_result.get("distances", [[]])[0]
-            for index, (doc, meta) in enumerate(zip(documents, metadatas), start=1):
-                doc_id = ids[index - 1] if index - 1 < len(ids) else f"doc_{index}"
-                if exclude_message_id and doc_id == exclude_message_id:
-                    continue
-                context_lines.append(f"ChatMem[{doc_id}]: {doc}")
-                role = meta.get("role") if isinstance(meta, dict) else ""
-                distance = distances[index - 1] if index - 1 < len(distances) else None
-                sources.append(
-                    {
-                        "title": f"ChatMem:{role or 'mensagem'}",
-                        "url": "",
-                        "distance": distance,
-                    }
-                )
-                context_facts.append(
-                    {
-                        "content": doc,
-                        "title": f"ChatMem:{role or 'mensagem'}",
-                        "confianca_intrinseca": 0.0,
-                        "url": "",
-                        "status_memoria": "MCP",
-                    }
-                )
-        except Exception as error:  # noqa: BLE001
-            print(f"[RAG] ERRO ao consultar ChromaDB ({collection_name}): {error}")
+def retrieve_long_term_context(
+    content: str,
+    session_id: str | None,
+    exclude_message_id: str | None = None,
+) -> Tuple[List[str], List[Dict[str, str]], List[Dict[str, Any]]]:
+    """
+    Recupera contexto relevante a partir do Neo4j (memoria sinaptica) e ChromaDB
+    via recuperacao hibrida, com a camada fria como reserva. Retorna os trechos
+    de contexto (do mais relevante ao menos), a lista de fontes e os fatos
+    usados na autocorrecao do NQR.
+    """
+    documents = _retrieve_context_documents(content, session_id, exclude_message_id)
+    return _context_from_documents(documents)
 
-    if not context_lines:
-        context_lines.append("Nenhum contexto de longo prazo relevante encontrado.")
 
-    return "\n".join(context_lines), sources, context_facts
+def _unsummarized_history(
+    history: List[ChatMessage],
+    session_id: str | None,
+    summary: Dict[str, Any] | None,
+) -> List[ChatMessage]:
+    """
+    Historico literal do prompt: a janela recente ou, se for maior, tudo o que
+    o resumo ainda nao cobre. O resumo roda a cada SUMMARY_EVERY_TURNS e para
+    antes da janela daquele momento; sem isto, as mensagens que saem da janela
+    ficariam fora do resumo e do historico ate a proxima atualizacao.
+    """
+    recent = history[-CHAT_HISTORY_WINDOW:] if history else []
+    if not session_id:
+        return recent
+    try:
+        buffered = database.get_recent_messages(session_id, CHAT_UNSUMMARIZED_WINDOW)
+    except Exception as error:  # noqa: BLE001
+        print(f"[Agente de Chat] Falha ao ler historico nao resumido: {error}")
+        return recent
+    merged = {message.id: message for message in buffered}
+    for message in history or []:
+        merged.setdefault(message.id, message)
+    covered_until = (summary or {}).get("covered_until")
+    unsummarized = [
+        message
+        for message in sorted(merged.values(), key=lambda item: item.created_at)
+        if not covered_until or message.created_at > covered_until
+    ]
+    return unsummarized if len(unsummarized) > len(recent) else recent
 
 
-def generate_chat_response(
+def _prepare_chat_prompt(
     content: str,
     history: List[ChatMessage],
     session_id: str | None,
     current_message_id: str | None = None,
-) -> Tuple[str, List[Dict[str, str]]]:
+    track_activation: bool = True,
+) -> Dict[str, Any]:
     """
-    Gera resposta conversacional utilizando o LLM DeepSeek com memoria curta e contexto recuperado.
+    Recupera o contexto e monta os prompts do chat, sem efeitos colaterais alem
+    das ativacoes do RAG (adiaveis com `track_activation=False`).
     """
-    print("[Agente de Chat] Gerando resposta com contexto...")
-
-    long_term_context, sources, context_facts = retrieve_long_term_context(
+    documents = _retrieve_context_documents(
         content,
         session_id,
         exclude_message_id=current_message_id,
+        track_activation=track_activation,
     )
-
-    recent_history = history[-10:] if history else []
-    if recent_history:
-        history_text = "\n".join(
-            f"{message.role.upper()}: {message.content}" for message in recent_history
-        )
-    else:
+    context_lines, sources, context_facts = _context_from_documents(documents)
+
+    assembler = PromptAssembler("Chat", query=content)
+    long_term_context = assembler.section(
+        "contexto",
+        context_lines,
+        max_tokens=CHAT_CONTEXT_TOKENS,
+        snippet_max_tokens=CHAT_SNIPPET_TOKENS,
+    )
+    summary = database.get_session_summary(session_id) if session_id else None
+    recent_history = _unsummarized_history(history, session_id, summary)
+    summary_text = assembler.section(
+        "resumo",
+        [summary["summary"]] if summary else [],
+        max_tokens=CHAT_SUMMARY_TOKENS,
+    )
+    history_text = assembler.section(
+        "historico",
+        [f"{message.role.upper()}: {message.content}" for message in recent_history],
+        max_tokens=CHAT_HISTORY_TOKENS,
+        keep_latest=True,
+        dedupe=False,
+    )
+    assembler.log()
+    if not long_term_context:
+        long_term_context = "Nenhum contexto de longo prazo relevante encontrado."
+    if not history_text:
         history_text = "Nenhum historico recente."
 
     system_prompt = (
         "Voce e o Nexus, o assistente cognitivo e companheiro pessoal de Paulo. "
         "Seja amigavel, empatico e responda de forma util, mantendo o contexto. "
-        "Use o CONTEXTO DE LONGO PRAZO e o Historico Recente para formular sua resposta. "
+        "Use o CONTEXTO DE LONGO PRAZO, o Resumo da Conversa e o Historico Recente para formular sua resposta. "
         "DIRETRIZ DE MEMORIA: Se o usuario fornecer informacoes sobre si mesmo na MENSAGEM ATUAL, "
         "trate isso como CONHECIMENTO NOVO, mesmo que apareca no contexto recuperado devido a indexacao rapida. "
         "Nunca diga 'Eu ja sabia disso' quando a informacao veio na mensagem atual. Agradeca e confirme o aprendizado."
     )
     full_prompt = (
         f"CONTEXTO DE LONGO PRAZO:\n{long_term_context}\n\n"
+        f"RESUMO DA CONVERSA ATE AQUI:\n{summary_text or 'Nenhum resumo ainda.'}\n\n"
         f"HISTORICO RECENTE:\n{history_text}\n\n"
         f"NOVA MENSAGEM: {content}"
     )
+    return {
+        "system_prompt": system_prompt,
+        "full_prompt": full_prompt,
+        "sources": sources,
+        "context_facts": context_facts,
+        "documents": documents,
+        "answer": None,
+    }
+
+
+def _complete_chat(draft: Dict[str, Any]) -> str:
+    response = chat_client.chat.completions.create(
+        model="deepseek-chat",
+        messages=[
+            {"role": "system", "content": draft["system_prompt"]},
+            {"role": "user", "content": draft["full_prompt"]},
+        ],
+        temperature=0.7,
+    )
+    return response.choices[0].message.content
+
+
+def generate_chat_response(
+    content: str,
+    history: List[ChatMessage],
+    session_id: str | None,
+    current_message_id: str | None = None,
+    draft: Dict[str, Any] | None = None,
+) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Gera resposta conversacional utilizando o LLM DeepSeek com memoria curta e contexto recuperado.
+    `draft` reaproveita o contexto (e talvez a resposta) preparado especulativamente.
+    """
+    print("[Agente de Chat] Gerando resposta com contexto...")
+
+    if draft is None:
+        draft = _prepare_chat_prompt(content, history, session_id, current_message_id)
+    else:
+        # A especulacao adiou as ativacoes ate a intencao ser confirmada.
+        hybrid_retriever.record_activation(draft["documents"])
 
     try:
-        response = chat_client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": full_prompt},
-            ],
-            temperature=0.7,
-        )
-        answer = response.choices[0].message.content
-        answer = nqr_chat.self_correct_rag(answer, context_facts)
-        return answer, sources
+        answer = draft.get("answer") or _complete_chat(draft)
+        answer = nqr_chat.self_correct_rag(answer, draft["context_facts"])
+        return answer, draft["sources"]
     except Exception as error:  # noqa: BLE001
         print(f"[Agente de Chat] ERRO: {error}")
         return (
@@ -465,6 +713,95 @@ def generate_chat_response(
         )
 
 
+def _speculate_chat(
+    content: str,
+    history: List[ChatMessage],
+    session_id: str | None,
+    current_message_id: str | None,
+    cancelled: threading.Event,
+) -> Dict[str, Any] | None:
+    if cancelled.is_set():
+        return None
+    draft = _prepare_chat_prompt(
+        content, history, session_id, current_message_id, track_activation=False
+    )
+    if SPECULATIVE_CHAT == "full" and not cancelled.is_set():
+        try:
+            draft["answer"] = _complete_chat(draft)
+        except Exception as error:  # noqa: BLE001
+            # generate_chat_response tenta de novo se a intencao for confirmada.
+            print(f"[Especulacao] Falha na geracao antecipada: {error}")
+    return draft
+
+
+def start_chat_speculation(
+    content: str,
+    history: List[ChatMessage],
+    session_id: str | None,
+    current_message_id: str | None,
+) -> Tuple[Future, threading.Event] | None:
+    """
+    Dispara a preparacao do chat (RAG e, no modo `full`, a geracao) enquanto o
+    classificador decide a intencao. Nada e gravado ate a intencao ser confirmada.
+    """
+    if SPECULATIVE_CHAT not in ("rag", "full"):
+        return None
+    cancelled = threading.Event()
+    try:
+        future = _speculative_executor.submit(
+            _speculate_chat,
+            content,
+            list(history),
+            session_id,
+            current_message_id,
+            cancelled,
+        )
+    except RuntimeError as error:  # Executor ja encerrado
+        print(f"[Especulacao] Nao foi possivel iniciar: {error}")
+        return None
+    return future, cancelled
+
+
+def collect_chat_speculation(
+    speculation: Tuple[Future, threading.Event] | None,
+) -> Dict[str, Any] | None:
+    """Rascunho especulativo para a intencao confirmada, ou None para o caminho normal."""
+    if speculation is None:
+        return None
+    future, _ = speculation
+    if future.cancel():
+        # Ainda na fila do pool: preparar inline e mais rapido que esperar.
+        with _speculation_lock:
+            _speculation_stats["inline"] += 1
+        return None
+    try:
+        draft = future.result()
+    except Exception as error:  # noqa: BLE001
+        print(f"[Especulacao] Falha na preparacao antecipada: {error}")
+        draft = None
+    with _speculation_lock:
+        _speculation_stats["hits" if draft is not None else "failures"] += 1
+    return draft
+
+
+def discard_chat_speculation(
+    speculation: Tuple[Future, threading.Event] | None, reason: str
+) -> None:
+    """Cancela (ou apenas ignora, se ja estiver rodando) a preparacao antecipada."""
+    if speculation is None:
+        return
+    future, cancelled = speculation
+    cancelled.set()
+    future.cancel()
+    with _speculation_lock:
+        _speculation_stats["discarded"] += 1
+        stats = dict(_speculation_stats)
+    print(
+        f"[Especulacao] Contexto antecipado descartado ({reason}). "
+        f"Aproveitados: {stats['hits']}, descartados: {stats['discarded']}."
+    )
+
+
 # Le a variavel de ambiente ALLOWED_ORIGINS com urls separados por virgula.
 origins_str = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173")
 # Divide a string em uma lista, removendo espacos extras e ignorando entradas vazias.
@@ -490,6 +827,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -535,6 +873,7 @@ async def get_capabilities():
             },
         ],
         "tools": tool_descriptions,
+        "plugins": ferramentas.LOADED_PLUGINS,
         "status_endpoint": "/api/status",
     }
     return capabilities
@@ -681,22 +1020,65 @@ def update_system_settings(settings: SystemSettings):
         )
 
 
-@app.get("/api/chat/sessions", response_model=List[ChatSession])
-def get_sessions() -> List[ChatSession]:
-    return get_all_sessions()
+def _parse_fields(fields: str | None) -> List[str] | None:
+    if not fields:
+        return None
+    return [name.strip() for name in fields.split(",") if name.strip()]
+
+
+def _paginated(
+    response: Response,
+    page: Tuple[List[Dict[str, Any]], str | None],
+) -> List[Dict[str, Any]]:
+    """Devolve os itens da pagina e anuncia a proxima no cabecalho X-Next-Cursor."""
+    items, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+
+@app.get(
+    "/api/chat/sessions",
+    response_model=List[ChatSessionView],
+    response_model_exclude_unset=True,
+)
+def get_sessions(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=database.PAGE_MAX_LIMIT),
+    cursor: str | None = None,
+    fields: str | None = None,
+) -> List[Dict[str, Any]]:
+    try:
+        page = database.get_sessions_page(limit, cursor, _parse_fields(fields))
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return _paginated(response, page)
 
 
-@app.get("/api/chat/{session_id}/messages", response_model=List[ChatMessage])
-def get_messages(session_id: str) -> List[ChatMessage]:
-    return get_chat_messages(session_id)
+@app.get(
+    "/api/chat/{session_id}/messages",
+    response_model=List[ChatMessageView],
+    response_model_exclude_unset=True,
+)
+def get_messages(
+    session_id: str,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=database.PAGE_MAX_LIMIT),
+    cursor: str | None = None,
+    fields: str | None = None,
+) -> List[Dict[str, Any]]:
+    try:
+        page = database.get_chat_messages_page(
+            session_id, limit, cursor, _parse_fields(fields)
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return _paginated(response, page)
 
 
 # Endpoint legacy renamed to support session handling.
 @app.post("/api/chat/send", response_model=PerplexicaResponse)
-def post_chat(
-    input_data: ChatInput,
-    background_tasks: BackgroundTasks,
-) -> PerplexicaResponse:
+def post_chat(input_data: ChatInput) -> PerplexicaResponse:
     """Roteia o fluxo do chat utilizando o modo sugerido e o classificador central."""
     content = input_data.content
     suggested_mode = input_data.mode or "Chat Pessoal"
@@ -709,39 +1091,47 @@ def post_chat(
 
     user_message = ChatMessage(session_id=session_id, role="user", content=content)
     add_chat_message(user_message)
+    schedule_summary(session_id, user_message.id)
     if len(user_message.content) > 50:
-        background_tasks.add_task(
-            background_learning_task,
-            user_message.content,
-            "Chat Pessoal",
-        )
+        enqueue_learning(user_message.content, "Chat Pessoal")
 
     print(
         f"[Endpoint /api/chat/send] Recebido: '{content}' "
         f"(Modo Sugerido: {suggested_mode}, Sessao: {session_id})"
     )
 
-    conversation_history = get_chat_messages(session_id)
+    conversation_history = get_recent_messages(session_id, CHAT_HISTORY_WINDOW)
     if not conversation_history or conversation_history[-1].content != content:
         conversation_history.append(user_message)
 
     history_for_classifier = [
         {"role": message.role, "content": message.content}
-        for message in conversation_history[-10:]
+        for message in conversation_history
     ]
 
     final_mode = suggested_mode
     intent_payload: Dict[str, Any] | None = None
+    speculation = None
     if suggested_mode in ("Modo: Chat Pessoal", "Chat Pessoal"):
-        classification_result = agente_central.classify_intent(
-            content,
-            history_for_classifier,
+        speculation = start_chat_speculation(
+            content, conversation_history, session_id, user_message.id
         )
+        try:
+            classification_result = agente_central.classify_intent(
+                content,
+                history_for_classifier,
+            )
+        except Exception:
+            discard_chat_speculation(speculation, "falha na classificacao")
+            raise
         if isinstance(classification_result, tuple):
             final_mode, intent_payload = classification_result
         else:
             final_mode = classification_result
     print(f"[Roteador Principal] Modo Final Decidido: {final_mode}")
+    if final_mode != "Chat Pessoal":
+        discard_chat_speculation(speculation, f"modo {final_mode}")
+        speculation = None
 
     assistant_answer: str
     sources: List[Dict] = []
@@ -751,9 +1141,7 @@ def post_chat(
         search_result = agente_pesquisa.search(content)
         assistant_answer = search_result["answer"]
         sources = search_result.get("sources", [])
-        background_tasks.add_task(
-            background_learning_task, search_result["answer"], content
-        )
+        enqueue_learning(search_result["answer"], content)
     elif final_mode == "Noticias":
         print("[Endpoint /api/chat/send] Roteando para Agente de Noticias...")
         news_result = agente_noticias.search_news(content)
@@ -772,6 +1160,7 @@ def post_chat(
             conversation_history,
             session_id,
             current_message_id=user_message.id,
+            draft=collect_chat_speculation(speculation),
         )
         assistant_message = ChatMessage(
             session_id=session_id,
@@ -803,6 +1192,8 @@ def post_chat(
             tool_result = agente_executor.execute_dynamic_tool(tool_name, arguments)
         except ValueError as error:
             raise HTTPException(status_code=400, detail=str(error))
+        except ToolTimeoutError as error:
+            raise HTTPException(status_code=504, detail=str(error))
         except RuntimeError as error:
             raise HTTPException(status_code=500, detail=str(error))
         assistant_answer = synthesize_tool_response(content, tool_name, tool_result)
@@ -859,6 +1250,76 @@ def post_chat(
     )
 
 
+@app.get("/api/jobs/queue")
+def get_job_queue_metrics():
+    """Metricas da fila persistente de tarefas (contrapressao e falhas)."""
+    return job_queue.background_queue.metrics()
+
+
+@app.get("/api/knowledge/search")
+def search_local_knowledge(
+    q: str = Query(..., min_length=1), k: int = Query(5, ge=1, le=50)
+):
+    """Busca hibrida (BM25 + vetores) na base de conhecimento local."""
+    return {"results": local_index.search(q, k=k), "stats": local_index.stats()}
+
+
+@app.post("/api/knowledge/ingest")
+def ingest_knowledge(request: IngestRequest):
+    """Inicia em segundo plano a ingestao de arquivos sob NEXUS_INGEST_ROOT."""
+    try:
+        paths = resolve_ingest_paths(request.paths)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    if not ingestion_pipeline.start(paths, request.extract_triples, request.force):
+        raise HTTPException(
+            status_code=409, detail="Ja existe uma ingestao em andamento."
+        )
+    return {"status": "started", "paths": paths}
+
+
+@app.get("/api/knowledge/ingest")
+def get_ingestion_progress():
+    """Progresso e vazao da ingestao atual (ou da ultima)."""
+    return ingestion_pipeline.progress()
+
+
+@app.get("/api/tools/runtime")
+def get_tool_runtime_metrics():
+    """Chamadas, acertos de cache e timeouts do runtime de ferramentas."""
+    return tool_runtime.stats()
+
+
+@app.get("/api/memory/consolidation")
+def get_consolidation_metrics():
+    """Progresso do ultimo ciclo de consolidacao da memoria."""
+    return consolidation_engine.metrics()
+
+
+@app.get("/api/meta-prompts/{task_type}")
+def get_meta_prompt_metrics(task_type: str):
+    """Versoes do meta-prompt de uma tarefa e as metricas do teste A/B."""
+    return meta_prompt_store.stats(task_type)
+
+
+@app.get("/api/jobs")
+def get_scheduled_jobs():
+    """Estado das tarefas periodicas de manutencao e da fila em segundo plano."""
+    return {
+        "scheduler": maintenance_scheduler.owner,
+        "jobs": maintenance_scheduler.status(),
+        "queue": job_queue.background_queue.metrics(),
+    }
+
+
+@app.post("/api/jobs/{name}/run")
+def run_scheduled_job(name: str):
+    """Antecipa a execucao de uma tarefa periodica."""
+    if not maintenance_scheduler.run_now(name):
+        raise HTTPException(status_code=404, detail="Tarefa nao encontrada.")
+    return {"scheduled": name}
+
+
 @app.get("/status")
 def get_system_status():
     monitored = ["Neo4j", "ChromaDB", "DeepSeek"]
@@ -893,16 +1354,21 @@ def get_memory_graph() -> GraphData:
 
     with neo4j_driver.session() as session:
         result_nodes = session.run(
-            "MATCH (n) RETURN elementId(n) as id, labels(n) as labels, properties(n) as props"
+            "MATCH (n) RETURN elementId(n) as id, labels(n) as labels, properties(n) as props, "
+            "CASE WHEN n.forca_atualizada_em IS NULL THEN null "
+            f"ELSE {effective_strength_cypher('n')} END as forca_efetiva"
         )
         for record in result_nodes:
             labels = record["labels"]
             label = labels[0] if labels else "Unknown"
+            props = dict(record["props"])
+            if record["forca_efetiva"] is not None:
+                props["forca_efetiva"] = record["forca_efetiva"]
             nodes.append(
                 GraphNode(
                     id=record["id"],
                     label=label,
-                    properties=_serialize_neo4j_value(dict(record["props"])),
+                    properties=_serialize_neo4j_value(props),
                 )
             )
 
@@ -921,9 +1387,22 @@ def get_memory_graph() -> GraphData:
     return GraphData(nodes=nodes, links=links)
 
 
-@app.get("/api/inbox/items", response_model=List[InboxItem])
-def list_inbox_items():
-    return get_inbox_items()
+@app.get(
+    "/api/inbox/items",
+    response_model=List[InboxItemView],
+    response_model_exclude_unset=True,
+)
+def list_inbox_items(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=database.PAGE_MAX_LIMIT),
+    cursor: str | None = None,
+    fields: str | None = None,
+) -> List[Dict[str, Any]]:
+    try:
+        page = database.get_inbox_items_page(limit, cursor, _parse_fields(fields))
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return _paginated(response, page)
 
 
 @app.get("/api/inbox/chat/{item_id}", response_model=List[ChatMessage])
@@ -1,72 +1,240 @@
 from __future__ import annotations
 
+import os
+import threading
+import time
 from datetime import datetime, timezone
+from typing import Any, Dict, List
 
+import numpy as np
+
+from database import NexusGraph
 from db_connect import neo4j_driver
+from graph_projection import projection
+from synaptic_decay import (
+    PROMOTION_THRESHOLD,
+    PRUNE_THRESHOLD,
+    effective_strength,
+    schedule_cypher,
+)
 
-DECAY_RATE = 0.95
-PROMOTION_THRESHOLD = 5.0
-PRUNE_THRESHOLD = 0.1
 MLP_CONFIDENCE = 0.95
+CONSOLIDATION_BATCH_SIZE = int(os.getenv("NEXUS_CONSOLIDATION_BATCH_SIZE", 500))
 
+BACKFILL_IDS_QUERY = """
+MATCH (concept:Conceito)
+WHERE concept.id IS NULL
+CALL {
+    WITH concept
+    SET concept.id = randomUUID()
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
 
-def run_memory_consolidation_cycle() -> None:
+# Conceitos gravados antes do decaimento analitico: ancora a forca base na
+# ultima ativacao e deriva os marcos de poda/promocao (uma unica vez).
+BACKFILL_SCHEDULE_QUERY = f"""
+MATCH (concept:Conceito)
+WHERE concept.forca_atualizada_em IS NULL
+CALL {{
+    WITH concept
+    SET concept.forca_sinaptica = coalesce(concept.forca_sinaptica, 0.0),
+        concept.forca_atualizada_em = coalesce(concept.ultima_ativacao, concept.criado_em, datetime())
+    SET {schedule_cypher("concept")}
+}} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+# Candidatos lidos pelos indices conceito_poda_em / conceito_promocao_ate, em
+# paginas por cursor (marco, id).
+CANDIDATES_QUERY = """
+MATCH (concept:Conceito)
+WHERE concept.{marker} {operator} datetime($cutoff)
+  AND concept.status_memoria = 'MCP'
+  AND ($after_marker IS NULL
+       OR concept.{marker} > $after_marker
+       OR (concept.{marker} = $after_marker AND concept.id > $after_id))
+RETURN concept.id AS id,
+       concept.{marker} AS marker,
+       concept.forca_sinaptica AS strength,
+       concept.forca_atualizada_em.epochSeconds AS updated_at,
+       (coalesce(concept.validado_nqr, false) = true
+            OR concept.ultima_validacao_nqr IS NOT NULL) AS validated
+ORDER BY concept.{marker} ASC, concept.id ASC
+LIMIT $batch_size
+"""
+PRUNE_CANDIDATES_QUERY = CANDIDATES_QUERY.format(marker="poda_em", operator="<=")
+PROMOTION_CANDIDATES_QUERY = CANDIDATES_QUERY.format(marker="promocao_ate", operator=">")
+
+PROMOTE_QUERY = f"""
+UNWIND $ids AS concept_id
+MATCH (concept:Conceito {{id: concept_id}})
+SET concept.status_memoria = 'MLP',
+    concept.confianca_intrinseca = $mlp_confidence,
+    concept.promovido_em = datetime($timestamp),
+    concept.ultima_ativacao = coalesce(concept.ultima_ativacao, datetime($timestamp))
+SET {schedule_cypher("concept")}
+RETURN count(*) AS promoted
+"""
+
+PRUNE_QUERY = """
+UNWIND $ids AS concept_id
+MATCH (concept:Conceito {id: concept_id})
+DETACH DELETE concept
+RETURN count(*) AS pruned
+"""
+
+
+class ConsolidationEngine:
     """
-    Executa um ciclo de manutencao da memoria:
-    - promove memorias MCP validadas para MLP;
-    - reduz a forca sinaptica (decaimento);
-    - remove memorias MCP muito fracas.
+    Ciclo de manutencao da memoria em lotes. Com o decaimento analitico, so os
+    candidatos (marcos `poda_em` / `promocao_ate` ja vencidos ou vigentes) sao
+    lidos, pelos seus indices; cada pagina e confirmada de forma vetorizada e
+    gravada numa transacao curta.
     """
-    timestamp = datetime.now(timezone.utc).isoformat()
-
-    with neo4j_driver.session() as session:
-        # Garante que todos os conceitos possuam um identificador consistente
-        session.run(
-            """
-            MATCH (concept:Conceito)
-            WHERE concept.id IS NULL
-            SET concept.id = randomUUID()
-            """
-        )
 
-        # Decaimento: reduz forca sinaptica em 5%
-        session.run(
-            """
-            MATCH (concept:Conceito)
-            WHERE concept.forca_sinaptica IS NOT NULL
-            SET concept.forca_sinaptica = coalesce(concept.forca_sinaptica, 0.0) * $decay
-            """,
-            decay=DECAY_RATE,
+    def __init__(self, batch_size: int = CONSOLIDATION_BATCH_SIZE) -> None:
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._metrics: Dict[str, Any] = {
+            "running": False,
+            "cycles": 0,
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_duration_seconds": None,
+            "last_error": None,
+            "batches": 0,
+            "scanned": 0,
+            "promoted": 0,
+            "pruned": 0,
+            "phase": None,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        return dict(self._metrics)
+
+    def run_cycle(self) -> Dict[str, Any]:
+        """
+        Executa um ciclo completo:
+        - garante ids e marcos de decaimento nos conceitos antigos;
+        - promove memorias MCP validadas cuja forca efetiva passa do limiar;
+        - remove memorias MCP cuja forca efetiva caiu abaixo do limiar de poda.
+        """
+        if not self._lock.acquire(blocking=False):
+            print("[Memory Jobs] Ciclo de consolidacao ja em execucao.")
+            return self.metrics()
+        started = time.monotonic()
+        self._stop.clear()
+        self._metrics.update(
+            running=True,
+            last_started_at=datetime.now(timezone.utc).isoformat(),
+            last_error=None,
+            batches=0,
+            scanned=0,
+            promoted=0,
+            pruned=0,
+            phase="backfill",
         )
+        try:
+            cutoff = datetime.now(timezone.utc)
+            with neo4j_driver.session() as session:
+                session.run(BACKFILL_IDS_QUERY, batch_size=self.batch_size).consume()
+                session.run(BACKFILL_SCHEDULE_QUERY, batch_size=self.batch_size).consume()
 
-        # Promocao: memorias MCP frequentemente acessadas e validadas pelo NQR
-        session.run(
-            """
-            MATCH (concept:Conceito)
-            WHERE concept.status_memoria = 'MCP'
-              AND coalesce(concept.forca_sinaptica, 0.0) > $promotion_threshold
-              AND (
-                    coalesce(concept.validado_nqr, false) = true
-                 OR concept.ultima_validacao_nqr IS NOT NULL
-              )
-            SET concept.status_memoria = 'MLP',
-                concept.confianca_intrinseca = $mlp_confidence,
-                concept.promovido_em = datetime($timestamp),
-                concept.ultima_ativacao = coalesce(concept.ultima_ativacao, datetime($timestamp))
-            """,
-            promotion_threshold=PROMOTION_THRESHOLD,
-            mlp_confidence=MLP_CONFIDENCE,
-            timestamp=timestamp,
+                self._metrics["phase"] = "promocao"
+                self._process(session, PROMOTION_CANDIDATES_QUERY, cutoff, self._promote)
+                self._metrics["phase"] = "poda"
+                self._process(session, PRUNE_CANDIDATES_QUERY, cutoff, self._prune)
+
+            self._metrics["cycles"] += 1
+            print(
+                f"[Memory Jobs] Consolidacao: {self._metrics['scanned']} candidatos em "
+                f"{self._metrics['batches']} lotes, {self._metrics['promoted']} promovidos, "
+                f"{self._metrics['pruned']} podados."
+            )
+        except Exception as error:  # noqa: BLE001
+            self._metrics["last_error"] = str(error)
+            print(f"[Memory Jobs] Falha no ciclo de consolidacao: {error}")
+            raise
+        finally:
+            self._metrics.update(
+                running=False,
+                phase=None,
+                last_finished_at=datetime.now(timezone.utc).isoformat(),
+                last_duration_seconds=round(time.monotonic() - started, 3),
+            )
+            self._lock.release()
+            if self._metrics["promoted"] or self._metrics["pruned"]:
+                NexusGraph.invalidate_cache()
+                # Promocoes e podas mudam o grafo em massa: recarrega a projecao.
+                projection.request_reload()
+        return self.metrics()
+
+    def _process(self, session: Any, query: str, cutoff: datetime, apply: Any) -> None:
+        after_marker = None
+        after_id = ""
+        while not self._stop.is_set():
+            rows = list(
+                session.run(
+                    query,
+                    cutoff=cutoff.isoformat(),
+                    after_marker=after_marker,
+                    after_id=after_id,
+                    batch_size=self.batch_size,
+                )
+            )
+            if not rows:
+                break
+            apply(session, rows, cutoff.timestamp())
+            after_marker, after_id = rows[-1]["marker"], rows[-1]["id"]
+            self._metrics["batches"] += 1
+            self._metrics["scanned"] += len(rows)
+            if len(rows) < self.batch_size:
+                break
+
+    def _promote(self, session: Any, rows: List[Any], now: float) -> None:
+        ids, strength, validated = self._columns(rows, now)
+        selected = ids[validated & (strength > PROMOTION_THRESHOLD)].tolist()
+        if not selected:
+            return
+        timestamp = datetime.now(timezone.utc).isoformat()
+        session.execute_write(
+            lambda tx: tx.run(
+                PROMOTE_QUERY,
+                ids=selected,
+                mlp_confidence=MLP_CONFIDENCE,
+                timestamp=timestamp,
+            ).consume()
         )
+        self._metrics["promoted"] += len(selected)
 
-        # Poda: remove memorias MCP que nao ganharam relevancia
-        session.run(
-            """
-            MATCH (concept:Conceito)
-            WHERE concept.status_memoria = 'MCP'
-              AND coalesce(concept.forca_sinaptica, 0.0) < $prune_threshold
-            DETACH DELETE concept
-            """,
-            prune_threshold=PRUNE_THRESHOLD,
+    def _prune(self, session: Any, rows: List[Any], now: float) -> None:
+        ids, strength, _ = self._columns(rows, now)
+        selected = ids[strength < PRUNE_THRESHOLD].tolist()
+        if not selected:
+            return
+        session.execute_write(lambda tx: tx.run(PRUNE_QUERY, ids=selected).consume())
+        self._metrics["pruned"] += len(selected)
+
+    @staticmethod
+    def _columns(rows: List[Any], now: float) -> tuple:
+        """Confirma a forca efetiva de cada candidato (marcos podem estar defasados)."""
+        ids = np.array([row["id"] for row in rows], dtype=object)
+        validated = np.array([bool(row["validated"]) for row in rows], dtype=bool)
+        strength = effective_strength(
+            [row["strength"] or 0.0 for row in rows],
+            [np.nan if row["updated_at"] is None else row["updated_at"] for row in rows],
+            now,
         )
+        return ids, strength, validated
+
+    def cancel(self) -> None:
+        """Interrompe o ciclo em andamento ao fim do lote atual."""
+        self._stop.set()
 
+
+consolidation_engine = ConsolidationEngine()
+
+
+def run_memory_consolidation_cycle() -> None:
+    """Executa um ciclo de manutencao da memoria (ver ConsolidationEngine)."""
+    consolidation_engine.run_cycle()
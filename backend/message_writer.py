@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from db_connect import neo4j_driver
+
+# Persistencia "write-behind" das mensagens de chat no grafo: as mensagens
+# ficam num buffer em memoria e sao gravadas em lote, numa unica transacao
+# UNWIND, a cada FLUSH_INTERVAL segundos (ou quando o lote enche).
+FLUSH_INTERVAL = float(os.getenv("NEXUS_MESSAGE_FLUSH_INTERVAL", 0.5))
+MAX_BATCH_SIZE = 200
+MAX_WRITE_ATTEMPTS = 3
+MAX_TRACKED_SESSIONS = 1024
+
+PERSIST_MESSAGES_QUERY = """
+MERGE (creator:Entity {id: 'CREATOR'})
+ON CREATE SET creator.name = 'Usuario'
+WITH creator
+UNWIND $rows AS row
+MERGE (chat_session:ChatSession {id: row.session_id})
+ON CREATE SET chat_session.title = row.session_id,
+              chat_session.created_at = row.timestamp_iso,
+              chat_session.updated_at = row.timestamp_iso
+SET chat_session.updated_at = row.timestamp_iso
+MERGE (creator)-[:PARTICIPATES_IN]->(chat_session)
+MERGE (msg:ChatMessage {id: row.id})
+SET msg.role = row.role,
+    msg.content = row.content,
+    msg.timestamp = datetime(row.timestamp_iso),
+    msg.timestamp_iso = row.timestamp_iso,
+    msg.session_id = row.session_id
+MERGE (chat_session)-[:HAS_MESSAGE]->(msg)
+WITH msg, row
+WHERE row.response_to IS NOT NULL
+MATCH (question:ChatMessage {id: row.response_to})
+MERGE (msg)-[:RESPONSE_TO]->(question)
+"""
+
+_STOP = object()
+
+
+class MessageWriter:
+    """
+    Agrupa gravacoes de ChatMessage no Neo4j. O vinculo RESPONSE_TO vem do
+    pareamento de turnos em memoria (ultima mensagem do usuario por sessao),
+    dispensando a varredura ORDER BY das mensagens da sessao.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._last_user_message: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._pending_by_session: Dict[str, int] = {}
+        self._thread: threading.Thread | None = None
+        self._written = 0
+        self._batches = 0
+        self._dropped = 0
+
+    def enqueue(
+        self,
+        message_id: str,
+        session_id: str,
+        role: str,
+        content: str,
+        timestamp_iso: str,
+    ) -> None:
+        """Agenda a gravacao da mensagem e registra o pareamento de turno."""
+        response_to: str | None = None
+        with self._lock:
+            if role == "user":
+                self._last_user_message[session_id] = message_id
+                self._last_user_message.move_to_end(session_id)
+                while len(self._last_user_message) > MAX_TRACKED_SESSIONS:
+                    self._last_user_message.popitem(last=False)
+            elif role == "assistant":
+                response_to = self._last_user_message.get(session_id)
+            self._pending_by_session[session_id] = (
+                self._pending_by_session.get(session_id, 0) + 1
+            )
+
+        self._ensure_started()
+        self._queue.put(
+            {
+                "id": message_id,
+                "session_id": session_id,
+                "role": role,
+                "content": content,
+                "timestamp_iso": timestamp_iso,
+                "response_to": response_to,
+            }
+        )
+
+    def flush(
+        self, session_id: str | None = None, timeout: float | None = None
+    ) -> bool:
+        """
+        Bloqueia ate que as mensagens enfileiradas tenham sido gravadas: todas,
+        ou so as de `session_id`. Retorna False se o `timeout` estourar.
+        """
+        if self._thread is None:
+            return True
+        if session_id is None:
+            self._queue.join()
+            return True
+        with self._drained:
+            return self._drained.wait_for(
+                lambda: not self._pending_by_session.get(session_id), timeout
+            )
+
+    def _settle(self, rows: List[Dict[str, Any]]) -> None:
+        with self._drained:
+            for row in rows:
+                remaining = self._pending_by_session.get(row["session_id"], 0) - 1
+                if remaining > 0:
+                    self._pending_by_session[row["session_id"]] = remaining
+                else:
+                    self._pending_by_session.pop(row["session_id"], None)
+            self._drained.notify_all()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Grava o que estiver pendente e encerra a thread de escrita."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+        print(
+            f"[Message Writer] Encerrado ({self._written} mensagens em "
+            f"{self._batches} lotes, {self._dropped} descartadas)."
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._queue.qsize(),
+            "written": self._written,
+            "batches": self._batches,
+            "dropped": self._dropped,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name="nexus-message-writer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                break
+            rows: List[Dict[str, Any]] = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    # Drena o que ainda estiver na fila antes de sair.
+                    while True:
+                        try:
+                            rows.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    break
+                rows.append(item)
+
+            self._write(rows)
+            self._settle(rows)
+            for _ in rows:
+                self._queue.task_done()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+            try:
+                with neo4j_driver.session() as session:
+                    session.execute_write(
+                        lambda tx: tx.run(PERSIST_MESSAGES_QUERY, rows=rows).consume()
+                    )
+                self._written += len(rows)
+                self._batches += 1
+                return
+            except Exception as error:  # noqa: BLE001
+                print(
+                    f"[Message Writer] Falha ao gravar {len(rows)} mensagens no grafo "
+                    f"(tentativa {attempt}/{MAX_WRITE_ATTEMPTS}): {error}"
+                )
+                time.sleep(0.2 * attempt)
+        self._dropped += len(rows)
+
+
+message_writer = MessageWriter()
+atexit.register(message_writer.stop)
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import agente_guardiao
+import database
+import job_queue
+
+# Cache versionado dos meta-prompts (Neo4j) com TTL. Falhas de parsing viram
+# contadores por versao; a otimizacao via LLM roda em segundo plano, no maximo
+# uma vez por OPTIMIZE_INTERVAL, e gera uma versao candidata que recebe parte
+# do trafego (A/B) ate acumular usos suficientes para ser promovida ou rejeitada.
+CACHE_TTL = float(os.getenv("NEXUS_META_PROMPT_TTL", 300))  # Segundos
+CANDIDATE_TRAFFIC = float(os.getenv("NEXUS_META_PROMPT_AB_TRAFFIC", 0.2))
+OPTIMIZE_INTERVAL = float(
+    os.getenv("NEXUS_META_PROMPT_OPTIMIZE_INTERVAL", 3600)
+)  # Segundos
+OPTIMIZE_MIN_FAILURES = 3  # Falhas acumuladas antes de pedir uma nova versao
+MAX_FAILURE_SAMPLES = 5
+MIN_TRIAL_USES = 50  # Usos da candidata antes de decidir o A/B
+OPTIMIZE_JOB = "otimizacao_prompt"
+DEFAULT_VERSION = 0  # Template embutido no codigo (nenhuma versao salva)
+
+
+class MetaPromptStore:
+    """Versoes de prompt por tarefa, metricas de uso e otimizacao desacoplada."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._pending: Dict[Tuple[str, int], List[int]] = {}
+        self._failures: Dict[str, List[str]] = {}
+        self._failure_counts: Dict[str, int] = {}  # Desde a ultima otimizacao
+        self._last_optimization: Dict[str, float] = {}
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def versions(self, task_type: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(task_type)
+        if entry is not None and time.time() - entry[0] < CACHE_TTL:
+            return entry[1]
+        try:
+            versions = database.get_meta_prompt_versions(task_type)
+        except Exception as error:  # noqa: BLE001
+            print(f"[Meta Prompt] Falha ao carregar versoes de '{task_type}': {error}")
+            versions = entry[1] if entry is not None else []
+        with self._lock:
+            self._cache[task_type] = (time.time(), versions)
+        return versions
+
+    def invalidate(self, task_type: str | None = None) -> None:
+        with self._lock:
+            if task_type is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(task_type, None)
+
+    def select(self, task_type: str, default_template: str) -> Tuple[int, str]:
+        """
+        Versao e template a usar nesta chamada: a ativa, ou a candidata em
+        CANDIDATE_TRAFFIC das chamadas enquanto o teste A/B estiver aberto.
+        """
+        versions = self.versions(task_type)
+        active = next((item for item in versions if item["status"] == "active"), None)
+        candidate = next(
+            (item for item in versions if item["status"] == "candidate"), None
+        )
+        if candidate and (active is None or random.random() < CANDIDATE_TRAFFIC):
+            return candidate["version"], candidate["prompt"]
+        if active:
+            return active["version"], active["prompt"]
+        return DEFAULT_VERSION, default_template
+
+    # ------------------------------------------------------------------
+    # Metricas e otimizacao
+    # ------------------------------------------------------------------
+    def record(
+        self,
+        task_type: str,
+        version: int,
+        success: bool,
+        template: str | None = None,
+        failure: str | None = None,
+    ) -> None:
+        """Conta um uso da versao; falhas podem disparar a otimizacao em segundo plano."""
+        with self._lock:
+            counters = self._pending.setdefault((task_type, version), [0, 0])
+            counters[0] += 1
+            if success:
+                return
+            counters[1] += 1
+            samples = self._failures.setdefault(task_type, [])
+            if failure:
+                samples.append(failure)
+                del samples[:-MAX_FAILURE_SAMPLES]
+            failures_seen = self._failure_counts.get(task_type, 0) + 1
+            self._failure_counts[task_type] = failures_seen
+            last = self._last_optimization.get(task_type, 0.0)
+            if (
+                failures_seen < OPTIMIZE_MIN_FAILURES
+                or time.time() - last < OPTIMIZE_INTERVAL
+            ):
+                return
+            if any(
+                item["status"] == "candidate"
+                for item in self._cached_versions(task_type)
+            ):
+                return
+            self._last_optimization[task_type] = time.time()
+            payload = {
+                "task_type": task_type,
+                "version": version,
+                "template": template or "",
+                "failures": list(samples),
+            }
+            samples.clear()
+            self._failure_counts[task_type] = 0
+        try:
+            job_queue.background_queue.enqueue(
+                OPTIMIZE_JOB,
+                payload,
+                dedup_key=f"{task_type}:{int(time.time())}",
+            )
+        except Exception as error:  # noqa: BLE001
+            print(
+                f"[Meta Prompt] Falha ao enfileirar otimizacao de '{task_type}': {error}"
+            )
+
+    def _cached_versions(self, task_type: str) -> List[Dict[str, Any]]:
+        entry = self._cache.get(task_type)
+        return entry[1] if entry is not None else []
+
+    def optimize(self, payload: Dict[str, Any]) -> None:
+        """Tarefa em segundo plano: pede ao Guardiao uma versao candidata do prompt."""
+        task_type = payload.get("task_type")
+        template = (payload.get("template") or "").strip()
+        if not task_type or not template:
+            return
+        self.invalidate(task_type)
+        versions = self.versions(task_type)
+        if any(item["status"] == "candidate" for item in versions):
+            return
+        failure_report = "\n".join(
+            f"- {failure}" for failure in payload.get("failures") or []
+        )
+        optimized = agente_guardiao.optimize_prompt(
+            template, failure_report or "Falhas de parsing."
+        )
+        optimized = (optimized or "").strip()
+        if not optimized or optimized == template:
+            return
+        if not any(item["status"] == "active" for item in versions):
+            # O template embutido vira a versao de referencia do teste A/B.
+            database.save_meta_prompt(task_type, template, status="active")
+        version = database.save_meta_prompt(task_type, optimized, status="candidate")
+        self.invalidate(task_type)
+        print(
+            f"[Meta Prompt] Versao candidata {version} de '{task_type}' em teste A/B."
+        )
+
+    def flush(self) -> int:
+        """Grava no Neo4j os contadores acumulados. Retorna quantos usos foram gravados."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        by_task: Dict[str, List[Dict[str, int]]] = {}
+        for (task_type, version), (uses, failures) in pending.items():
+            if version == DEFAULT_VERSION:
+                continue
+            by_task.setdefault(task_type, []).append(
+                {"version": version, "uses": uses, "failures": failures}
+            )
+        written = 0
+        for task_type, counters in by_task.items():
+            try:
+                database.record_meta_prompt_usage(task_type, counters)
+                written += sum(row["uses"] for row in counters)
+            except Exception as error:  # noqa: BLE001
+                print(
+                    f"[Meta Prompt] Falha ao gravar metricas de '{task_type}': {error}"
+                )
+                with self._lock:
+                    for row in counters:
+                        merged = self._pending.setdefault(
+                            (task_type, row["version"]), [0, 0]
+                        )
+                        merged[0] += row["uses"]
+                        merged[1] += row["failures"]
+        return written
+
+    def evaluate(self, task_type: str) -> str | None:
+        """Fecha o teste A/B quando a candidata tem usos suficientes."""
+        self.invalidate(task_type)
+        versions = self.versions(task_type)
+        active = next((item for item in versions if item["status"] == "active"), None)
+        candidate = next(
+            (item for item in versions if item["status"] == "candidate"), None
+        )
+        if candidate is None or candidate["uses"] < MIN_TRIAL_USES:
+            return None
+        candidate_rate = candidate["failures"] / candidate["uses"]
+        active_rate = (
+            active["failures"] / active["uses"] if active and active["uses"] else 1.0
+        )
+        status = "active" if candidate_rate < active_rate else "rejected"
+        database.set_meta_prompt_status(task_type, candidate["version"], status)
+        self.invalidate(task_type)
+        print(
+            f"[Meta Prompt] Versao {candidate['version']} de '{task_type}' "
+            f"{'promovida' if status == 'active' else 'rejeitada'} "
+            f"(falhas {candidate_rate:.1%} vs {active_rate:.1%})."
+        )
+        return status
+
+    def maintain(self) -> Dict[str, Any]:
+        """Tarefa periodica: grava metricas e decide os testes A/B abertos."""
+        with self._lock:
+            tasks = {task for task, _ in self._pending} | set(self._cache)
+        report: Dict[str, Any] = {"uses_written": self.flush(), "decisions": {}}
+        for task_type in sorted(tasks):
+            try:
+                decision = self.evaluate(task_type)
+            except Exception as error:  # noqa: BLE001
+                print(f"[Meta Prompt] Falha ao avaliar '{task_type}': {error}")
+                continue
+            if decision:
+                report["decisions"][task_type] = decision
+        return report
+
+    def stats(self, task_type: str) -> Dict[str, Any]:
+        with self._lock:
+            pending = {
+                version: {"uses": uses, "failures": failures}
+                for (task, version), (uses, failures) in self._pending.items()
+                if task == task_type
+            }
+            last = self._last_optimization.get(task_type)
+        return {
+            "versions": [
+                {key: value for key, value in item.items() if key != "prompt"}
+                for item in self.versions(task_type)
+            ],
+            "pending": pending,
+            "last_optimization": last,
+        }
+
+
+meta_prompt_store = MetaPromptStore()
+job_queue.background_queue.register_handler(OPTIMIZE_JOB, meta_prompt_store.optimize)
@@ -31,6 +31,32 @@ class ChatMessage(BaseModel):
     session_id: str
     role: str
     content: str
+    created_at: str = Field(default_factory=_generate_timestamp)
+
+
+# Visoes das listagens paginadas: com `fields` so parte dos campos e pedida,
+# entao todos sao opcionais e os ausentes saem da resposta
+# (response_model_exclude_unset).
+class InboxItemView(BaseModel):
+    id: str | None = None
+    content: str | None = None
+    type: str | None = None
+    created_at: str | None = None
+
+
+class ChatSessionView(BaseModel):
+    id: str | None = None
+    title: str | None = None
+    created_at: str | None = None
+    updated_at: str | None = None
+
+
+class ChatMessageView(BaseModel):
+    id: str | None = None
+    session_id: str | None = None
+    role: str | None = None
+    content: str | None = None
+    created_at: str | None = None
 
 
 class ChatInput(BaseModel):
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+
+from local_search import local_index
+
+# Plugin embutido: busca na base local (BM25 + vetores) sem rede e sem cota.
+
+
+def _tool_local_search(query: str, max_results: int = 5) -> str:
+    try:
+        results = local_index.search(query, k=max_results)
+    except Exception as error:  # noqa: BLE001
+        return f"ERRO Busca local: {error}"
+    return json.dumps(
+        [
+            {
+                "title": document.get("title") or document.get("source"),
+                "url": document.get("source"),
+                "content": document.get("content"),
+                "score": document.get("score"),
+            }
+            for document in results
+        ],
+        ensure_ascii=False,
+    )
+
+
+def register_tools(register_tool) -> None:
+    register_tool(
+        "local_search",
+        "Use para consultar documentos ingeridos na base de conhecimento local "
+        "(manuais, notas, artigos). Rapida e sem custo de API.",
+        _tool_local_search,
+        timeout=10,
+        cache_ttl=0,  # A base muda a cada ingestao; a busca local ja e barata
+        parameters={
+            "query": {
+                "type": "str",
+                "required": True,
+                "description": "Pergunta ou palavras-chave a buscar nos documentos locais.",
+            },
+            "max_results": {
+                "type": "int",
+                "required": False,
+                "description": "Numero maximo de trechos (padrao 5).",
+                "default": 5,
+            },
+        },
+    )
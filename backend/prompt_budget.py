@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Dict, List, Sequence
+
+try:  # pragma: no cover
+    import tiktoken  # type: ignore
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # pragma: no cover
+    _ENCODING = None
+
+# Montagem de prompts com orcamento de tokens por secao: trechos repetidos
+# sao descartados, trechos longos sao comprimidos de forma extrativa (frases
+# mais relevantes para a pergunta) e o que nao cabe e cortado e registrado.
+CHARS_PER_TOKEN = 4
+DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+STOPWORDS = {
+    "a",
+    "o",
+    "as",
+    "os",
+    "um",
+    "uma",
+    "de",
+    "do",
+    "da",
+    "dos",
+    "das",
+    "em",
+    "no",
+    "na",
+    "nos",
+    "nas",
+    "por",
+    "para",
+    "com",
+    "sem",
+    "que",
+    "qual",
+    "quais",
+    "como",
+    "e",
+    "ou",
+    "se",
+    "eu",
+    "voce",
+    "me",
+    "meu",
+    "minha",
+    "seu",
+    "sua",
+    "isso",
+    "esse",
+    "essa",
+    "este",
+    "esta",
+    "ao",
+    "aos",
+    "mais",
+    "muito",
+    "sobre",
+    "ja",
+    "the",
+    "of",
+    "and",
+    "to",
+    "is",
+    "what",
+    "how",
+}
+
+
+def count_tokens(text: str) -> int:
+    """Conta tokens com o tokenizer (tiktoken) quando disponivel; senao estima."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _normalize(text: str) -> str:
+    normalized = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+def fold_accents(text: str) -> str:
+    """Minusculas e sem acentos: a normalizacao usada por extract_terms."""
+    return _normalize(text)
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", _normalize(text))
+
+
+def extract_terms(
+    text: str, max_terms: int = 8, keep_accents: bool = False
+) -> List[str]:
+    """
+    Palavras-chave normalizadas (minusculas, sem acento, sem stopwords).
+    `keep_accents=True` devolve as mesmas palavras com os acentos originais,
+    para comparar com texto nao normalizado (ex.: CONTAINS no Cypher).
+    """
+    terms: List[str] = []
+    tokens = (
+        re.findall(r"[^\W_]+", (text or "").lower()) if keep_accents else _words(text)
+    )
+    for token in tokens:
+        folded = _normalize(token) if keep_accents else token
+        if len(folded) < 3 or folded in STOPWORDS or token in terms:
+            continue
+        terms.append(token)
+    return terms[:max_terms]
+
+
+def _shingles(words: Sequence[str]) -> set:
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {
+        tuple(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _unique_indices(snippets: Sequence[str]) -> List[int]:
+    kept: List[int] = []
+    kept_shingles: List[set] = []
+    for index, snippet in enumerate(snippets):
+        if not snippet or not snippet.strip():
+            continue
+        shingles = _shingles(_words(snippet))
+        duplicate = False
+        for other in kept_shingles:
+            if not shingles or not other:
+                continue
+            overlap = len(shingles & other)
+            if overlap / len(shingles | other) >= DUPLICATE_THRESHOLD or overlap == len(
+                shingles
+            ):
+                duplicate = True
+                break
+        if duplicate:
+            continue
+        kept.append(index)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def dedupe_snippets(snippets: Sequence[str]) -> List[str]:
+    """
+    Remove trechos repetidos ou quase repetidos (Jaccard de shingles acima de
+    DUPLICATE_THRESHOLD, ou trecho contido em outro ja aceito). Mantem a ordem.
+    """
+    return [snippets[index] for index in _unique_indices(snippets)]
+
+
+def compress_extractive(text: str, query: str, max_tokens: int) -> str:
+    """
+    Reduz o texto as frases que mais compartilham termos com a pergunta,
+    preservando a ordem original, ate caber em max_tokens.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    sentences = [
+        sentence.strip() for sentence in _SENTENCE_SPLIT.split(text) if sentence.strip()
+    ]
+    query_terms = {word for word in _words(query) if len(word) > 2}
+
+    scored = []
+    for position, sentence in enumerate(sentences):
+        sentence_terms = set(_words(sentence))
+        score = len(query_terms & sentence_terms)
+        # Leve preferencia pelas primeiras frases (costumam resumir o trecho).
+        scored.append((score + 1.0 / (position + 2), position, sentence))
+
+    chosen: List[tuple] = []
+    used = 0
+    for _, position, sentence in sorted(scored, key=lambda item: item[0], reverse=True):
+        cost = count_tokens(sentence)
+        if used + cost > max_tokens:
+            continue
+        chosen.append((position, sentence))
+        used += cost
+
+    if not chosen:
+        return _truncate(text, max_tokens)
+    return " ".join(sentence for _, sentence in sorted(chosen))
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    if _ENCODING is not None:
+        return _ENCODING.decode(
+            _ENCODING.encode(text, disallowed_special=())[:max_tokens]
+        )
+    return text[: max_tokens * CHARS_PER_TOKEN]
+
+
+class PromptAssembler:
+    """
+    Acumula as secoes de um prompt, cada uma com seu orcamento de tokens, e
+    registra quantos tokens foram descartados por deduplicacao e corte.
+    """
+
+    def __init__(self, label: str, query: str = "") -> None:
+        self.label = label
+        self.query = query
+        self.report: Dict[str, Dict[str, int]] = {}
+
+    def section(
+        self,
+        name: str,
+        snippets: Sequence[str],
+        max_tokens: int,
+        snippet_max_tokens: int | None = None,
+        keep_latest: bool = False,
+        separator: str = "\n",
+        labels: Sequence[str] | None = None,
+        dedupe: bool = True,
+    ) -> str:
+        """
+        Devolve o texto da secao dentro de max_tokens. Por padrao prioriza os
+        primeiros trechos (ja ordenados por relevancia); com keep_latest=True
+        prioriza os ultimos (ex.: historico da conversa). `labels`, se dado,
+        e um cabecalho por trecho, preservado mesmo quando o trecho e comprimido.
+        `dedupe=False` mantem repeticoes legitimas (ex.: turnos "USER: sim").
+        """
+        original_tokens = sum(count_tokens(snippet) for snippet in snippets if snippet)
+        unique: List[str] = []
+        if dedupe:
+            indices = _unique_indices(snippets)
+        else:
+            indices = [
+                index
+                for index, snippet in enumerate(snippets)
+                if snippet and snippet.strip()
+            ]
+        for index in indices:
+            snippet = snippets[index]
+            if snippet_max_tokens:
+                snippet = compress_extractive(snippet, self.query, snippet_max_tokens)
+            if labels is not None and index < len(labels):
+                snippet = f"{labels[index]}\n{snippet}"
+            unique.append(snippet)
+
+        ordered = list(reversed(unique)) if keep_latest else unique
+        selected: List[str] = []
+        used = 0
+        separator_tokens = count_tokens(separator) if separator.strip() else 0
+        for snippet in ordered:
+            cost = count_tokens(snippet) + separator_tokens
+            if used + cost > max_tokens:
+                remaining = max_tokens - used
+                # Primeiro trecho grande demais: comprime em vez de descartar tudo.
+                if not selected and remaining > 0:
+                    selected.append(compress_extractive(snippet, self.query, remaining))
+                    used += count_tokens(selected[-1])
+                break
+            selected.append(snippet)
+            used += cost
+        if keep_latest:
+            selected.reverse()
+
+        self.report[name] = {
+            "original": original_tokens,
+            "kept": used,
+            "dropped": max(0, original_tokens - used),
+        }
+        return separator.join(selected)
+
+    def log(self) -> None:
+        dropped = sum(item["dropped"] for item in self.report.values())
+        kept = sum(item["kept"] for item in self.report.values())
+        details = ", ".join(
+            f"{name}={item['kept']}/{item['original']}"
+            for name, item in self.report.items()
+        )
+        print(
+            f"[Prompt] {self.label}: {kept} tokens mantidos, {dropped} descartados ({details})."
+        )
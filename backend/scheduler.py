@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import re
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from db_connect import neo4j_driver
+
+# Agendador assincrono das tarefas periodicas de manutencao. Cada tarefa tem
+# um agendamento ("30m", "6h", "7d" ou horario diario "HH:MM" em UTC), jitter,
+# orcamento de tempo e uma trava (lease no Neo4j) que garante uma unica
+# execucao por vez mesmo com varios workers/processos.
+POLL_INTERVAL = 30.0  # Segundos; teto da espera entre verificacoes
+DEFAULT_JITTER_FRACTION = 0.1
+MAX_JITTER_SECONDS = 900.0
+LEASE_MARGIN_SECONDS = 60.0
+STARTUP_DELAY = 60.0  # Primeira verificacao apos o startup
+MIN_GAP_FRACTION = 0.5  # Fracao do periodo que precisa separar duas execucoes
+DISABLED = {"", "0", "off", "false", "no"}
+
+_DURATION_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhd])$")
+_DAILY_PATTERN = re.compile(r"^(\d{1,2}):(\d{2})$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+ACQUIRE_LEASE_QUERY = """
+MERGE (lease:SchedulerLease {name: $name})
+SET lease.tocado_em = datetime()
+WITH lease
+WHERE (lease.owner IS NULL OR lease.owner = $owner OR lease.expires_at < datetime())
+  AND (lease.ultima_execucao IS NULL
+       OR lease.ultima_execucao <= datetime() - duration({seconds: $min_gap}))
+SET lease.owner = $owner,
+    lease.expires_at = datetime() + duration({seconds: $ttl})
+RETURN lease.owner AS owner
+"""
+
+RENEW_LEASE_QUERY = """
+MATCH (lease:SchedulerLease {name: $name, owner: $owner})
+SET lease.expires_at = datetime() + duration({seconds: $ttl})
+RETURN lease.owner AS owner
+"""
+
+RELEASE_LEASE_QUERY = """
+MATCH (lease:SchedulerLease {name: $name, owner: $owner})
+SET lease.owner = null, lease.expires_at = null, lease.ultima_execucao = datetime()
+"""
+
+
+def parse_schedule(spec: str) -> Dict[str, Any] | None:
+    """Interpreta "30m"/"6h"/"7d" (intervalo) ou "HH:MM" (diario, UTC); None desativa."""
+    spec = (spec or "").strip().lower()
+    if spec in DISABLED:
+        return None
+    match = _DURATION_PATTERN.match(spec)
+    if match:
+        return {"interval": float(match.group(1)) * _UNITS[match.group(2)]}
+    match = _DAILY_PATTERN.match(spec)
+    if match and int(match.group(1)) < 24 and int(match.group(2)) < 60:
+        return {"hour": int(match.group(1)), "minute": int(match.group(2))}
+    raise ValueError(f"Agendamento invalido: {spec!r}")
+
+
+class MaintenanceScheduler:
+    """Executa tarefas de manutencao sincronas em threads, sem bloquear o loop."""
+
+    def __init__(self) -> None:
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._running_tasks: set = set()
+
+    def register(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        schedule: str,
+        budget: float,
+        jitter: float | None = None,
+        cancel: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        Registra uma tarefa. `budget` e o tempo maximo (segundos) de cada
+        execucao; ao estourar, `cancel` (se houver) pede a interrupcao.
+        """
+        try:
+            parsed = parse_schedule(schedule)
+        except ValueError as error:
+            print(f"[Scheduler] {name}: {error}. Tarefa desativada.")
+            parsed = None
+        if jitter is None:
+            jitter = min(
+                self._period(parsed) * DEFAULT_JITTER_FRACTION, MAX_JITTER_SECONDS
+            )
+        self._jobs[name] = {
+            "name": name,
+            "func": func,
+            "cancel": cancel,
+            "schedule": schedule,
+            "parsed": parsed,
+            "budget": float(budget),
+            "jitter": float(jitter),
+            "next_run": self._first_run(parsed, float(jitter)) if parsed else None,
+            "forced": False,
+            "running": False,
+            "runs": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "skipped": 0,
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_duration_seconds": None,
+            "last_status": None,
+            "last_result": None,
+        }
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name="nexus-scheduler")
+        enabled = [name for name, job in self._jobs.items() if job["parsed"]]
+        print(
+            f"[Scheduler] Iniciado ({self.owner}): {', '.join(enabled) or 'nenhuma tarefa'}."
+        )
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for job in self._jobs.values():
+            if job["running"] and job["cancel"] is not None:
+                job["cancel"]()
+
+    def run_now(self, name: str) -> bool:
+        """Antecipa a proxima execucao da tarefa; False se ela nao existe."""
+        job = self._jobs.get(name)
+        if job is None:
+            return False
+        job["next_run"] = time.time()
+        job["forced"] = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        report = []
+        for job in self._jobs.values():
+            entry = {
+                key: value
+                for key, value in job.items()
+                if key not in {"func", "cancel", "parsed", "next_run", "forced"}
+            }
+            entry["enabled"] = job["parsed"] is not None
+            entry["next_run_at"] = (
+                datetime.fromtimestamp(job["next_run"], timezone.utc).isoformat()
+                if job["next_run"]
+                else None
+            )
+            entry["next_run_in_seconds"] = (
+                max(0.0, round(job["next_run"] - now, 1)) if job["next_run"] else None
+            )
+            report.append(entry)
+        return report
+
+    @staticmethod
+    def _period(parsed: Dict[str, Any] | None) -> float:
+        if not parsed:
+            return 0.0
+        return parsed.get("interval", 86400.0)
+
+    @classmethod
+    def _first_run(cls, parsed: Dict[str, Any], jitter: float) -> float:
+        # Intervalos rodam logo apos o startup; a trava evita repetir uma tarefa
+        # que outro worker (ou o processo anterior) rodou ha pouco.
+        if "interval" in parsed:
+            return time.time() + STARTUP_DELAY + random.uniform(0.0, jitter)
+        return cls._next_run(parsed, jitter)
+
+    @staticmethod
+    def _next_run(
+        parsed: Dict[str, Any], jitter: float, after: float | None = None
+    ) -> float:
+        after = time.time() if after is None else after
+        if "interval" in parsed:
+            base = after + parsed["interval"]
+        else:
+            moment = datetime.fromtimestamp(after, timezone.utc)
+            target = moment.replace(
+                hour=parsed["hour"], minute=parsed["minute"], second=0, microsecond=0
+            )
+            if target.timestamp() <= after:
+                target += timedelta(days=1)
+            base = target.timestamp()
+        return base + random.uniform(0.0, jitter)
+
+    async def _loop(self) -> None:
+        while True:
+            now = time.time()
+            for job in self._jobs.values():
+                if (
+                    job["next_run"] is not None
+                    and job["next_run"] <= now
+                    and not job["running"]
+                ):
+                    job["running"] = True
+                    task = asyncio.create_task(self._run(job))
+                    self._running_tasks.add(task)
+                    task.add_done_callback(self._running_tasks.discard)
+            pending = [
+                job["next_run"]
+                for job in self._jobs.values()
+                if job["next_run"] and not job["running"]
+            ]
+            delay = min(
+                [POLL_INTERVAL] + [max(0.0, moment - now) for moment in pending]
+            )
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0.5))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        name = job["name"]
+        try:
+            ttl = int(job["budget"] + LEASE_MARGIN_SECONDS)
+            min_gap = (
+                0
+                if job["forced"]
+                else int(self._period(job["parsed"]) * MIN_GAP_FRACTION)
+            )
+            job["forced"] = False
+            try:
+                acquired = await asyncio.to_thread(
+                    self._acquire_lease, name, ttl, min_gap
+                )
+            except Exception as error:  # noqa: BLE001
+                print(
+                    f"[Scheduler] {name}: trava indisponivel ({error}); execucao adiada."
+                )
+                job["skipped"] += 1
+                job["last_status"] = "sem_trava"
+                return
+            if not acquired:
+                job["skipped"] += 1
+                job["last_status"] = (
+                    "ignorada"  # Outro worker rodando ou rodou ha pouco
+                )
+                return
+
+            started = time.monotonic()
+            job["last_started_at"] = datetime.now(timezone.utc).isoformat()
+            future = asyncio.get_running_loop().run_in_executor(None, job["func"])
+            # Mantem a trava enquanto a thread roda, inclusive apos estourar o
+            # orcamento (tarefas sem `cancel` seguem ate o fim).
+            renewal = asyncio.create_task(self._renew_while_running(name, ttl, future))
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.shield(future), timeout=job["budget"]
+                )
+                job["last_status"] = "ok"
+                job["last_result"] = None if result is None else str(result)[:500]
+            except asyncio.TimeoutError:
+                job["timeouts"] += 1
+                job["last_status"] = "tempo_esgotado"
+                print(
+                    f"[Scheduler] {name}: orcamento de {job['budget']:.0f}s estourado."
+                )
+                if job["cancel"] is not None:
+                    job["cancel"]()
+                # A thread nao pode ser morta: a trava so e liberada quando ela terminar.
+                await asyncio.gather(future, return_exceptions=True)
+            except Exception as error:  # noqa: BLE001
+                job["failures"] += 1
+                job["last_status"] = "falha"
+                job["last_result"] = str(error)[:500]
+                print(f"[Scheduler] {name}: falha na execucao: {error}")
+            finally:
+                renewal.cancel()
+                job["runs"] += 1
+                job["last_duration_seconds"] = round(time.monotonic() - started, 3)
+                job["last_finished_at"] = datetime.now(timezone.utc).isoformat()
+                try:
+                    await asyncio.to_thread(self._release_lease, name)
+                except Exception as error:  # noqa: BLE001
+                    print(f"[Scheduler] {name}: falha ao liberar a trava: {error}")
+        finally:
+            job["running"] = False
+            if job["forced"]:
+                # run_now chamado durante a execucao: roda de novo em seguida.
+                job["next_run"] = time.time()
+            else:
+                job["next_run"] = (
+                    self._next_run(job["parsed"], job["jitter"])
+                    if job["parsed"]
+                    else None
+                )
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _acquire_lease(self, name: str, ttl: int, min_gap: int) -> bool:
+        with neo4j_driver.session() as session:
+            record = session.execute_write(
+                lambda tx: tx.run(
+                    ACQUIRE_LEASE_QUERY,
+                    name=name,
+                    owner=self.owner,
+                    ttl=ttl,
+                    min_gap=min_gap,
+                ).single()
+            )
+        return bool(record and record["owner"] == self.owner)
+
+    async def _renew_while_running(
+        self, name: str, ttl: int, future: asyncio.Future
+    ) -> None:
+        interval = max(1.0, ttl / 3)
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=interval)
+            if done:
+                return
+            try:
+                renewed = await asyncio.to_thread(self._renew_lease, name, ttl)
+            except Exception as error:  # noqa: BLE001
+                print(f"[Scheduler] {name}: falha ao renovar a trava: {error}")
+                continue
+            if not renewed:
+                print(f"[Scheduler] {name}: trava perdida durante a execucao.")
+                return
+
+    def _renew_lease(self, name: str, ttl: int) -> bool:
+        with neo4j_driver.session() as session:
+            record = session.execute_write(
+                lambda tx: tx.run(
+                    RENEW_LEASE_QUERY, name=name, owner=self.owner, ttl=ttl
+                ).single()
+            )
+        return bool(record and record["owner"] == self.owner)
+
+    def _release_lease(self, name: str) -> None:
+        with neo4j_driver.session() as session:
+            session.execute_write(
+                lambda tx: tx.run(
+                    RELEASE_LEASE_QUERY, name=name, owner=self.owner
+                ).consume()
+            )
+
+
+maintenance_scheduler = MaintenanceScheduler()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List
+
+from models import ChatMessage
+
+HISTORY_WINDOW = 50
+MAX_CACHED_SESSIONS = 256
+
+
+class _SessionEntry:
+    __slots__ = ("messages", "loaded", "turns")
+
+    def __init__(self, window: int) -> None:
+        self.messages: Deque[ChatMessage] = deque(maxlen=window)
+        # True quando o buffer contem as ultimas `window` mensagens da sessao.
+        self.loaded = False
+        # Turnos desde o ultimo resumo agendado (ver count_turn).
+        self.turns = 0
+
+
+class SessionHistoryCache:
+    """
+    Buffer circular, por sessao, com os turnos mais recentes do chat.
+    E alimentado por escrita (write-through) em add_chat_message e, em caso
+    de falta, carrega apenas a janela pedida do armazenamento ordenado por
+    timestamp. Assim o custo por turno e O(janela), nao O(tamanho da sessao).
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str, int], List[ChatMessage]],
+        window: int = HISTORY_WINDOW,
+        max_sessions: int = MAX_CACHED_SESSIONS,
+    ) -> None:
+        self._loader = loader
+        self.window = window
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, session_id: str) -> _SessionEntry:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = _SessionEntry(self.window)
+            self._sessions[session_id] = entry
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return entry
+
+    def mark_new(self, session_id: str) -> None:
+        """Sessao recem-criada: nao ha historico a carregar."""
+        with self._lock:
+            self._entry(session_id).loaded = True
+
+    def append(self, message: ChatMessage) -> None:
+        with self._lock:
+            entry = self._entry(message.session_id)
+            if any(cached.id == message.id for cached in entry.messages):
+                return
+            if entry.messages and entry.messages[-1].created_at > message.created_at:
+                ordered = sorted(
+                    [*entry.messages, message], key=lambda item: item.created_at
+                )
+                entry.messages.clear()
+                entry.messages.extend(ordered[-self.window :])
+            else:
+                entry.messages.append(message)
+
+    def get_recent(self, session_id: str, limit: int) -> List[ChatMessage]:
+        """Retorna as ultimas `limit` mensagens da sessao em ordem cronologica."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and limit <= self.window:
+                self._sessions.move_to_end(session_id)
+                if entry.loaded or len(entry.messages) >= limit:
+                    return list(entry.messages)[-limit:]
+
+        fetched = self._loader(session_id, max(limit, self.window))
+
+        with self._lock:
+            entry = self._entry(session_id)
+            merged: Dict[str, ChatMessage] = {
+                message.id: message for message in fetched
+            }
+            # Mensagens ainda nao gravadas (write-behind) so existem no buffer.
+            for message in entry.messages:
+                merged[message.id] = message
+            ordered = sorted(merged.values(), key=lambda item: item.created_at)
+            entry.messages.clear()
+            entry.messages.extend(ordered[-self.window :])
+            entry.loaded = True
+            return ordered[-limit:]
+
+    def count_turn(self, session_id: str, every: int) -> bool:
+        """Conta um turno da sessao; True a cada `every` turnos (e zera a contagem)."""
+        with self._lock:
+            entry = self._entry(session_id)
+            entry.turns += 1
+            if entry.turns < every:
+                return False
+            entry.turns = 0
+            return True
+
+    def invalidate(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import math
+import os
+import time
+from typing import Any
+
+import numpy as np
+
+# A forca sinaptica decai de forma analitica: o no guarda a forca base
+# (forca_sinaptica) e o instante em que ela foi gravada (forca_atualizada_em);
+# a forca efetiva e base * DECAY_RATE ^ (periodos decorridos). Nada e
+# reescrito so para decair.
+DECAY_RATE = 0.95
+DECAY_PERIOD_SECONDS = float(os.getenv("NEXUS_DECAY_PERIOD_HOURS", 24)) * 3600
+PROMOTION_THRESHOLD = 5.0
+PRUNE_THRESHOLD = 0.1
+
+_LOG_DECAY = math.log(DECAY_RATE)
+
+
+def effective_strength(strength: Any, updated_at: Any, now: float | None = None) -> Any:
+    """
+    Forca efetiva no instante `now` (epoch em segundos). Aceita escalares ou
+    arrays; sem data de atualizacao (NaN), nao ha decaimento.
+    """
+    now = time.time() if now is None else now
+    strength = np.asarray(strength, dtype=np.float64)
+    updated = np.asarray(updated_at, dtype=np.float64)
+    elapsed = np.where(np.isnan(updated), 0.0, np.maximum(now - updated, 0.0))
+    return strength * np.power(DECAY_RATE, elapsed / DECAY_PERIOD_SECONDS)
+
+
+def _crossing_cypher(var: str, threshold: float) -> str:
+    return (
+        f"{var}.forca_atualizada_em + duration({{seconds: toInteger("
+        f"{DECAY_PERIOD_SECONDS!r} * log({threshold!r} / {var}.forca_sinaptica) / {_LOG_DECAY!r}"
+        f")}})"
+    )
+
+
+def effective_strength_cypher(var: str) -> str:
+    """Expressao Cypher da forca efetiva do no `var` no momento da leitura."""
+    return (
+        f"coalesce({var}.forca_sinaptica, 0.0) * {DECAY_RATE!r} ^ ("
+        f"toFloat(datetime().epochSeconds - coalesce({var}.forca_atualizada_em, datetime()).epochSeconds)"
+        f" / {DECAY_PERIOD_SECONDS!r})"
+    )
+
+
+def schedule_cypher(var: str) -> str:
+    """
+    Itens de SET que derivam, da forca base, os instantes indexados usados pela
+    consolidacao: `poda_em` (a forca efetiva cai abaixo de PRUNE_THRESHOLD) e
+    `promocao_ate` (a forca efetiva ainda supera PROMOTION_THRESHOLD). So
+    memorias MCP recebem esses marcos.
+    """
+    return (
+        f"{var}.poda_em = CASE\n"
+        f"    WHEN {var}.status_memoria <> 'MCP' THEN null\n"
+        f"    WHEN coalesce({var}.forca_sinaptica, 0.0) <= {PRUNE_THRESHOLD!r} THEN {var}.forca_atualizada_em\n"
+        f"    ELSE {_crossing_cypher(var, PRUNE_THRESHOLD)}\n"
+        f"END,\n"
+        f"{var}.promocao_ate = CASE\n"
+        f"    WHEN {var}.status_memoria = 'MCP' AND coalesce({var}.forca_sinaptica, 0.0) > {PROMOTION_THRESHOLD!r}\n"
+        f"    THEN {_crossing_cypher(var, PROMOTION_THRESHOLD)}\n"
+        f"    ELSE null\n"
+        f"END"
+    )
@@ -0,0 +1,16 @@
+import os
+import sys
+import types
+from unittest import mock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Os testes nao abrem conexoes: db_connect vira um modulo com clientes falsos
+# antes de qualquer import do backend.
+_db_connect = types.ModuleType("db_connect")
+_db_connect.neo4j_driver = mock.MagicMock(name="neo4j_driver")
+_db_connect.chroma_client = mock.MagicMock(name="chroma_client")
+_db_connect.close_neo4j_connection = lambda: None
+sys.modules.setdefault("db_connect", _db_connect)
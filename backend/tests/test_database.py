@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("pydantic")
+
+from database import decode_cursor, encode_cursor  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "sort_value, item_id",
+    [
+        ("2024-05-01T12:00:00+00:00", "abc"),
+        (1714564800.5, "id-com-acentuação"),
+        (None, "x"),
+        ("", "0"),
+    ],
+)
+def test_cursor_round_trip(sort_value, item_id):
+    cursor = encode_cursor(sort_value, item_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (sort_value, item_id)
+
+
+def test_empty_cursor_starts_from_the_beginning():
+    assert decode_cursor(None) == (None, None)
+    assert decode_cursor("") == (None, None)
+
+
+@pytest.mark.parametrize("cursor", ["@@@", "bm90LWpzb24", "WzFd"])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,214 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import graph_projection  # noqa: E402
+from graph_projection import GraphProjection, node_matches  # noqa: E402
+
+
+def build(nodes, edges):
+    """
+    Projecao pronta a partir de {chave: props} e de arestas
+    (origem, destino, peso[, tipo]).
+    """
+    projection = GraphProjection()
+    projection._reset()
+    for key, props in nodes.items():
+        projection._add_node(key, props, bulk=True)
+    projection._mcp = np.array(
+        [props.get("status_memoria") == "MCP" for props in projection._props],
+        dtype=bool,
+    )
+    csr_edges = []
+    for edge in edges:
+        source, target, weight = edge[:3]
+        rel_type = projection._rel_type_id(edge[3] if len(edge) > 3 else "REL")
+        source_index, target_index = (
+            projection._index[source],
+            projection._index[target],
+        )
+        projection._edge_keys.add((source_index, target_index, rel_type))
+        csr_edges.append((source_index, target_index, weight, rel_type, 1.0))
+    projection._build_csr(csr_edges)
+    projection.ready = True
+    return projection
+
+
+def search(projection, terms, critical=False, limit=5, max_depth=5, mcp_penalty=0.0):
+    return projection.search(
+        "SELF",
+        terms,
+        critical=critical,
+        limit=limit,
+        max_depth=max_depth,
+        mcp_penalty=mcp_penalty,
+        max_weight=100.0,
+    )
+
+
+def test_search_returns_cheapest_path_first():
+    projection = build(
+        {
+            "SELF": {"name": "Nexus"},
+            "a": {"name": "Ponte"},
+            "b": {"name": "Python"},
+            "c": {"name": "Python avancado"},
+        },
+        [("SELF", "a", 1.0), ("a", "b", 1.0), ("SELF", "b", 5.0), ("SELF", "c", 3.0)],
+    )
+    results = search(projection, ["python"])
+    assert [item["target"] for item in results] == ["b", "c"]
+    assert results[0]["path_weight"] == pytest.approx(2.0)
+    assert results[0]["path_nodes"] == ["SELF", "a", "b"]
+    assert [rel["type"] for rel in results[0]["path_rels"]] == ["REL", "REL"]
+
+
+def test_search_respects_limit_and_max_depth():
+    projection = build(
+        {
+            "SELF": {"name": "Nexus"},
+            "a": {"name": "a"},
+            "b": {"name": "b"},
+            "alvo": {"name": "alvo distante"},
+        },
+        [("SELF", "a", 1.0), ("a", "b", 1.0), ("b", "alvo", 1.0)],
+    )
+    assert search(projection, ["distante"], max_depth=2) == []
+    assert [
+        item["target"] for item in search(projection, ["distante"], max_depth=3)
+    ] == ["alvo"]
+    assert len(search(projection, ["a", "b", "distante"], limit=2)) == 2
+
+
+def test_search_tracks_mcp_state_along_the_path():
+    projection = build(
+        {
+            "SELF": {"name": "Nexus"},
+            "mcp": {"name": "atalho", "status_memoria": "MCP"},
+            "mlp": {"name": "desvio", "status_memoria": "MLP"},
+            "alvo": {"name": "alvo"},
+        },
+        [
+            ("SELF", "mcp", 1.0),
+            ("mcp", "alvo", 1.0),
+            ("SELF", "mlp", 2.0),
+            ("mlp", "alvo", 2.0),
+        ],
+    )
+    # Sem penalidade o atalho pelo no MCP vence.
+    assert search(projection, ["alvo"])[0]["path_nodes"] == ["SELF", "mcp", "alvo"]
+    # A penalidade e cobrada uma vez por caminho que toca um no MCP.
+    penalized = search(projection, ["alvo"], mcp_penalty=1.5)[0]
+    assert penalized["path_weight"] == pytest.approx(3.5)
+    assert search(projection, ["alvo"], mcp_penalty=3.0)[0]["path_nodes"] == [
+        "SELF",
+        "mlp",
+        "alvo",
+    ]
+    # Consultas criticas nunca passam por memoria MCP.
+    critical = search(projection, ["alvo"], critical=True)[0]
+    assert critical["path_nodes"] == ["SELF", "mlp", "alvo"]
+    assert search(projection, ["atalho"], critical=True) == []
+
+
+def test_search_matches_like_node_matches():
+    nodes = {
+        "SELF": {"name": "Nexus"},
+        "a": {"name": "Programação funcional"},
+        "b": {"title": "Pythonista"},
+        "c": {"description": "Sobre CAFÉ e leite"},
+        "d": {"name": "Outro assunto"},
+    }
+    projection = build(nodes, [("SELF", key, 1.0) for key in "abcd"])
+    for terms in (["programacao"], ["python"], ["cafe"], ["leite", "outro"]):
+        expected = {key for key in "abcd" if node_matches(nodes[key], terms)}
+        found = {item["target"] for item in search(projection, terms)}
+        assert found == expected and found
+
+
+def test_k_best_paths_enumerates_simple_paths_by_cost():
+    projection = build(
+        {key: {"name": key} for key in ("SELF", "a", "b", "c", "alvo")},
+        [
+            ("SELF", "a", 1.0),
+            ("a", "alvo", 1.0),
+            ("SELF", "b", 1.0),
+            ("b", "alvo", 2.0),
+            ("SELF", "c", 2.0),
+            ("c", "alvo", 2.0),
+            ("a", "b", 0.5),
+        ],
+    )
+    paths = projection.k_best_paths("SELF", "alvo", k=3)
+    assert [path["path_nodes"] for path in paths] == [
+        ["SELF", "a", "alvo"],
+        ["SELF", "b", "alvo"],
+        ["SELF", "a", "b", "alvo"],
+    ]
+    assert [path["path_weight"] for path in paths] == pytest.approx([2.0, 3.0, 3.5])
+
+    every_path = projection.k_best_paths("SELF", "alvo", k=10)
+    assert len(every_path) == 4
+    assert every_path[-1]["path_nodes"] == ["SELF", "c", "alvo"]
+    assert projection.k_best_paths("SELF", "desconhecido", k=3) == []
+
+
+def test_k_best_paths_applies_mcp_penalty_and_critical_filter():
+    projection = build(
+        {
+            "SELF": {"name": "Nexus"},
+            "mcp": {"name": "mcp", "status_memoria": "MCP"},
+            "mlp": {"name": "mlp"},
+            "alvo": {"name": "alvo"},
+        },
+        [
+            ("SELF", "mcp", 1.0),
+            ("mcp", "alvo", 1.0),
+            ("SELF", "mlp", 2.0),
+            ("mlp", "alvo", 1.0),
+        ],
+    )
+    paths = projection.k_best_paths("SELF", "alvo", k=2, mcp_penalty=5.0)
+    assert [path["path_nodes"][1] for path in paths] == ["mlp", "mcp"]
+    assert [path["path_weight"] for path in paths] == pytest.approx([3.0, 7.0])
+    critical = projection.k_best_paths("SELF", "alvo", k=2, critical=True)
+    assert [path["path_nodes"] for path in critical] == [["SELF", "mlp", "alvo"]]
+
+
+def test_delta_edges_are_searchable_and_compacted(monkeypatch):
+    monkeypatch.setattr(graph_projection, "COMPACT_THRESHOLD", 3)
+    projection = build(
+        {"SELF": {"name": "Nexus"}, "a": {"name": "a"}}, [("SELF", "a", 1.0)]
+    )
+
+    projection.add_triple("a", {"name": "a"}, "REL", "b", {"name": "Beta"}, 1.0, 0.5)
+    projection.add_triple("b", {"name": "Beta"}, "REL", "c", {"name": "Gama"}, 1.0, 1.0)
+    assert projection._extra_count == 2
+    # O no novo ainda esta fora do indptr, mas ja e alcancavel pelo delta.
+    assert search(projection, ["gama"])[0]["path_nodes"] == ["SELF", "a", "b", "c"]
+
+    # Aresta repetida nao entra duas vezes no delta.
+    projection.add_triple("b", {"name": "Beta"}, "REL", "c", {"name": "Gama"}, 1.0, 1.0)
+    assert projection._extra_count == 2
+
+    projection.add_triple(
+        "SELF", {"name": "Nexus"}, "REL", "c", {"name": "Gama"}, 1.0, 0.1
+    )
+    assert projection._extra == {} and projection._extra_count == 0
+    assert len(projection._indptr) == len(projection._keys) + 1
+    assert len(projection._indices) == 4
+    result = search(projection, ["gama"])[0]
+    assert result["path_nodes"] == ["SELF", "a", "b", "c"]
+    assert result["path_weight"] == pytest.approx(4.0)
+    assert [
+        path["path_weight"] for path in projection.k_best_paths("SELF", "c", k=2)
+    ] == (pytest.approx([4.0, 10.0]))
+
+
+def test_update_node_refreshes_search_text():
+    projection = build(
+        {"SELF": {"name": "Nexus"}, "a": {"name": "antigo"}}, [("SELF", "a", 1.0)]
+    )
+    assert search(projection, ["novo"]) == []
+    projection.update_node("a", name="Nome novo")
+    assert [item["target"] for item in search(projection, ["novo"])] == ["a"]
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("numpy")
+
+import hybrid_retriever  # noqa: E402
+from hybrid_retriever import CONFIDENCE_WEIGHT, RRF_K, fuse  # noqa: E402
+
+
+def test_fuse_sums_reciprocal_ranks_across_legs():
+    fused = fuse(
+        {
+            "graph": [{"id": "a", "content": "A"}, {"id": "b", "content": "B"}],
+            "vector": [{"id": "b", "content": "B"}, {"id": "c", "content": "C"}],
+        }
+    )
+    assert [doc["id"] for doc in fused] == ["b", "a", "c"]
+    scores = {doc["id"]: doc["score_hibrido"] for doc in fused}
+    assert scores["b"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert scores["a"] == pytest.approx(1 / (RRF_K + 1))
+    assert scores["c"] == pytest.approx(1 / (RRF_K + 2))
+    assert {doc["id"]: doc["legs"] for doc in fused}["b"] == ["graph", "vector"]
+
+
+def test_fuse_keeps_first_leg_fields_and_highest_confidence():
+    fused = fuse(
+        {
+            "graph": [{"id": "a", "content": "do grafo", "confianca_intrinseca": 0.2}],
+            "keyword": [
+                {"id": "a", "content": "da busca", "confianca_intrinseca": 0.8}
+            ],
+        }
+    )
+    assert len(fused) == 1
+    assert fused[0]["content"] == "do grafo"
+    assert fused[0]["confianca_intrinseca"] == 0.8
+    expected = 2 / (RRF_K + 1) + CONFIDENCE_WEIGHT * 0.8 / (RRF_K + 1)
+    assert fused[0]["score_hibrido"] == pytest.approx(expected)
+
+
+def test_fuse_dedupes_documents_without_id_by_content():
+    fused = fuse(
+        {
+            "keyword": [{"content": "mesmo texto"}],
+            "vector": [{"content": "mesmo texto"}, {"content": "outro"}],
+        }
+    )
+    assert [doc["content"] for doc in fused] == ["mesmo texto", "outro"]
+    assert fused[0]["legs"] == ["keyword", "vector"]
+
+
+def test_fuse_applies_leg_weights(monkeypatch):
+    monkeypatch.setitem(hybrid_retriever.LEG_WEIGHTS, "vector", 3.0)
+    fused = fuse(
+        {
+            "graph": [{"id": "a"}],
+            "vector": [{"id": "x"}, {"id": "b"}],
+        }
+    )
+    assert [doc["id"] for doc in fused] == ["x", "b", "a"]
+
+
+def test_fuse_empty():
+    assert fuse({}) == []
+    assert fuse({"graph": [], "vector": []}) == []
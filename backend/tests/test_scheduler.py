@@ -0,0 +1,31 @@
+import pytest
+
+from scheduler import parse_schedule
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("30m", {"interval": 1800.0}),
+        ("6h", {"interval": 21600.0}),
+        ("7d", {"interval": 604800.0}),
+        ("45s", {"interval": 45.0}),
+        ("1.5h", {"interval": 5400.0}),
+        (" 2 H ", {"interval": 7200.0}),
+        ("03:30", {"hour": 3, "minute": 30}),
+        ("9:05", {"hour": 9, "minute": 5}),
+    ],
+)
+def test_parse_schedule(spec, expected):
+    assert parse_schedule(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["", "off", "OFF", "0", "false", "no", None])
+def test_parse_schedule_disabled(spec):
+    assert parse_schedule(spec) is None
+
+
+@pytest.mark.parametrize("spec", ["24:00", "12:60", "10x", "h", "-5m", "cada hora"])
+def test_parse_schedule_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_schedule(spec)
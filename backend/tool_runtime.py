@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+
+import ferramentas
+
+# Execucao das ferramentas num event loop dedicado: timeout por ferramenta,
+# varias chamadas em paralelo, cache TTL por (ferramenta, argumentos
+# normalizados) e chamadas identicas simultaneas compartilhando o resultado.
+# Ferramentas sincronas rodam num pool de threads; corrotinas rodam no loop
+# e sao canceladas de fato quando o tempo estoura.
+DEFAULT_TIMEOUT = float(os.getenv("NEXUS_TOOL_TIMEOUT", 20))  # Segundos
+DEFAULT_CACHE_TTL = float(
+    os.getenv("NEXUS_TOOL_CACHE_TTL", 300)
+)  # Segundos; 0 desativa
+WORKERS = int(os.getenv("NEXUS_TOOL_WORKERS", 8))
+CACHE_SIZE = 512
+
+
+class ToolTimeoutError(RuntimeError):
+    """A ferramenta nao respondeu dentro do tempo limite."""
+
+
+def _normalize_arguments(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return {
+            key: _normalize_arguments(item)
+            for key, item in value.items()
+            if item is not None
+        }
+    if isinstance(value, (list, tuple)):
+        return [_normalize_arguments(item) for item in value]
+    return value
+
+
+def _cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    normalized = json.dumps(
+        _normalize_arguments(arguments), sort_keys=True, default=str
+    )
+    return f"{ferramentas.REGISTRY_VERSION}:{tool_name}:{normalized}"
+
+
+class ToolRuntime:
+    """Runtime assincrono das ferramentas com ponte sincrona para os endpoints."""
+
+    def __init__(self, workers: int = WORKERS) -> None:
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._counters = {
+            "calls": 0,
+            "cache_hits": 0,
+            "shared": 0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="nexus-tool"
+                )
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="nexus-tool-runtime",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            loop, thread, executor = self._loop, self._thread, self._executor
+            self._loop = self._thread = self._executor = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, coroutine) -> Future:
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError(
+                "Chamada sincrona de ferramenta dentro do loop do runtime."
+            )
+        return asyncio.run_coroutine_threadsafe(coroutine, loop)
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+    def _cache_get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if time.time() >= expires_at:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self._counters["cache_hits"] += 1
+            return result
+
+    def _cache_put(self, key: str, result: str, ttl: float) -> None:
+        with self._lock:
+            self._cache[key] = (time.time() + ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Execucao (dentro do loop do runtime)
+    # ------------------------------------------------------------------
+    async def execute(
+        self, tool_name: str, arguments: Dict[str, Any] | None = None
+    ) -> str:
+        tool = ferramentas.AVAILABLE_TOOLS.get(tool_name)
+        if not tool:
+            raise ValueError(f"A ferramenta '{tool_name}' não está disponível.")
+        arguments = arguments or {}
+        ttl = tool.get("cache_ttl")
+        ttl = DEFAULT_CACHE_TTL if ttl is None else ttl
+        key = _cache_key(tool_name, arguments)
+        with self._lock:
+            self._counters["calls"] += 1
+        if ttl > 0:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+        shared = self._inflight.get(key)
+        if shared is not None:
+            with self._lock:
+                self._counters["shared"] += 1
+            return await asyncio.shield(shared)
+
+        future = asyncio.get_running_loop().create_future()
+        # Evita o aviso de excecao nao lida quando ninguem compartilhou a chamada.
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = future
+        try:
+            result = await self._invoke(tool_name, tool, arguments)
+        except BaseException as error:
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if ttl > 0 and not result.startswith("ERRO"):
+            self._cache_put(key, result, ttl)
+        future.set_result(result)
+        return result
+
+    async def _invoke(
+        self, tool_name: str, tool: Dict[str, Any], arguments: Dict[str, Any]
+    ) -> str:
+        function = tool["function"]
+        timeout = tool.get("timeout") or DEFAULT_TIMEOUT
+
+        async def call() -> Any:
+            if inspect.iscoroutinefunction(function):
+                return await function(**arguments)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._executor, functools.partial(function, **arguments)
+            )
+            # Ferramentas com limite de uso embrulham corrotinas numa funcao sincrona.
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        try:
+            result = await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError as error:
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise ToolTimeoutError(
+                f"A ferramenta '{tool_name}' excedeu o tempo limite de {timeout:g}s."
+            ) from error
+        except TypeError as error:
+            raise ValueError(f"Argumentos inválidos: {error}") from error
+        except Exception as error:  # noqa: BLE001
+            with self._lock:
+                self._counters["errors"] += 1
+            raise RuntimeError(f"Erro ao executar '{tool_name}': {error}") from error
+        return result if isinstance(result, str) else str(result)
+
+    # ------------------------------------------------------------------
+    # API publica
+    # ------------------------------------------------------------------
+    def run(self, tool_name: str, arguments: Dict[str, Any] | None = None) -> str:
+        """Executa uma ferramenta a partir de codigo sincrono (threads dos endpoints)."""
+        return self._submit(self.execute(tool_name, arguments)).result()
+
+    def run_many(self, calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """
+        Executa varias chamadas em paralelo. Cada posicao do retorno traz o
+        resultado ou a excecao da chamada correspondente.
+        """
+        if not calls:
+            return []
+
+        async def gather() -> List[Any]:
+            return await asyncio.gather(
+                *(self.execute(name, arguments) for name, arguments in calls),
+                return_exceptions=True,
+            )
+
+        return self._submit(gather()).result()
+
+    async def arun(
+        self, tool_name: str, arguments: Dict[str, Any] | None = None
+    ) -> str:
+        """Versao para codigo assincrono rodando em outro event loop (ex.: FastAPI)."""
+        return await asyncio.wrap_future(
+            self._submit(self.execute(tool_name, arguments))
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "cached": len(self._cache),
+                "inflight": len(self._inflight),
+                "workers": self.workers,
+            }
+
+
+tool_runtime = ToolRuntime()